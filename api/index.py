@@ -1,437 +1,130 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from youtube_transcript_api import YouTubeTranscriptApi
-import re
 from http.server import BaseHTTPRequestHandler
-import json
-import requests
-import time
-import random
 import urllib.parse
+import os
+import sys
+import traceback
 
-app = Flask(__name__)
-CORS(app)
+# Make the shared transcript_service package importable from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def extract_video_id(url_or_id):
-    """Extract video ID from YouTube URL or use the ID directly"""
-    if 'youtube.com' in url_or_id or 'youtu.be' in url_or_id:
-        # Handle different YouTube URL formats
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?#]+)',
-            r'youtube\.com\/v\/([^&\n?#]+)'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url_or_id)
-            if match:
-                return match.group(1)
-        return None
-    else:
-        # Assume it's already a video ID
-        return url_or_id
+# Only the lightweight routing core is imported here: Flask, requests and
+# youtube_transcript_api load on first use, not on every cold start
+from transcript_service.metrics import finish_request, start_timing
+from transcript_service.routes import (
+    CORS_ALLOW_HEADERS,
+    CORS_EXPOSE_HEADERS,
+    Request,
+    dispatch,
+    render,
+    route_name,
+)
 
-def get_transcript_with_free_methods(video_id, max_retries=3):
-    """Try multiple free methods to get transcript"""
-    
-    # Method 1: Try direct API with delays and different user agents
-    user_agents = [
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    ]
-    
-    for attempt in range(max_retries):
-        try:
-            api = YouTubeTranscriptApi()
-            transcript = api.fetch(video_id, ['en'])
-            return transcript
-        except Exception as e:
-            if "blocked" in str(e).lower() or "ip" in str(e).lower():
-                # Add delay between retries
-                time.sleep(random.uniform(2, 5))
-                continue
-            else:
-                raise e
-    
-    # Method 2: Try with different language codes
-    try:
-        api = YouTubeTranscriptApi()
-        transcript = api.fetch(video_id, ['en', 'en-US', 'en-GB'])
-        return transcript
-    except Exception as e:
-        pass
-    
-    # Method 3: Try to get any available transcript
-    try:
-        api = YouTubeTranscriptApi()
-        transcript_list = api.list_transcripts(video_id)
-        transcript = transcript_list.find_transcript(['en', 'en-US', 'en-GB'])
-        return transcript.fetch()
-    except Exception as e:
-        pass
-    
-    # Method 4: Try alternative approach - check if video has captions
-    try:
-        # This is a fallback that might work in some cases
-        api = YouTubeTranscriptApi()
-        transcript_list = api.list_transcripts(video_id)
-        # Try any available transcript
-        for transcript in transcript_list:
-            try:
-                return transcript.fetch()
-            except:
-                continue
-    except Exception as e:
-        pass
-    
-    # Method 5: Return helpful error with suggestions
-    raise Exception(f"Could not retrieve transcript. This is likely due to YouTube blocking serverless function IPs. Try deploying to a VPS or using the video in a browser to confirm transcript availability.")
+def __getattr__(name):
+    # The Flask app used to live here; build it only if someone asks for it
+    if name == 'app':
+        from app import app
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-def get_transcript_with_web_scraping(video_id):
-    """Alternative method using web scraping (free)"""
-    try:
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            # Look for transcript data in the page
-            content = response.text
-            # This is a simplified approach - in practice you'd need to parse the actual transcript data
-            if 'transcript' in content.lower() or 'caption' in content.lower():
-                return {"message": "Video appears to have transcripts available, but serverless functions are blocked by YouTube"}
-        
-        return {"message": "Could not access video transcript via web scraping"}
-        
-    except Exception as e:
-        return {"message": f"Web scraping failed: {str(e)}"}
+# Vercel serverless function handler
+class handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so streamed transcripts can use chunked transfer encoding
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._handle('GET')
 
-@app.route('/transcript', methods=['GET'])
-def get_transcript():
-    """Get transcript for a YouTube video"""
-    video_id_or_url = request.args.get('video_id')
-    
-    if not video_id_or_url:
-        return jsonify({
-            'error': 'Missing video_id parameter',
-            'usage': 'GET /transcript?video_id=YOUR_VIDEO_ID_OR_URL'
-        }), 400
-    
-    try:
-        # Extract video ID from URL or use directly
-        video_id = extract_video_id(video_id_or_url)
-        
-        if not video_id:
-            return jsonify({
-                'error': 'Invalid YouTube URL or video ID'
-            }), 400
-        
-        # Try to get transcript with free methods
-        transcript = get_transcript_with_free_methods(video_id)
-        
-        # Format the response
-        formatted_transcript = []
-        for snippet in transcript.snippets:
-            formatted_transcript.append({
-                'text': snippet.text,
-                'start': snippet.start,
-                'duration': snippet.duration
-            })
-        
-        return jsonify({
-            'video_id': video_id,
-            'transcript': formatted_transcript,
-            'total_entries': len(formatted_transcript)
-        })
-        
-    except Exception as e:
-        # Try web scraping as fallback
-        web_result = get_transcript_with_web_scraping(video_id)
-        
-        return jsonify({
-            'error': f'Failed to get transcript: {str(e)}',
-            'note': 'YouTube blocks requests from serverless functions (Vercel, Netlify, etc.)',
-            'free_solutions': [
-                'Deploy to Railway/Render (free tier with real IP)',
-                'Deploy to a VPS ($5/month)',
-                'Use GitHub Actions as free server',
-                'Use RapidAPI free tier',
-                'Check if video has transcripts in browser first'
-            ],
-            'web_scraping_result': web_result,
-            'video_url': f'https://www.youtube.com/watch?v={video_id}'
-        }), 500
+    def do_POST(self):
+        self._handle('POST')
 
-@app.route('/transcript/text', methods=['GET'])
-def get_transcript_text():
-    """Get transcript as plain text"""
-    video_id_or_url = request.args.get('video_id')
-    
-    if not video_id_or_url:
-        return jsonify({
-            'error': 'Missing video_id parameter',
-            'usage': 'GET /transcript/text?video_id=YOUR_VIDEO_ID_OR_URL'
-        }), 400
-    
-    try:
-        # Extract video ID from URL or use directly
-        video_id = extract_video_id(video_id_or_url)
-        
-        if not video_id:
-            return jsonify({
-                'error': 'Invalid YouTube URL or video ID'
-            }), 400
-        
-        # Try to get transcript with free methods
-        transcript = get_transcript_with_free_methods(video_id)
-        
-        # Combine all text
-        full_text = ' '.join([snippet.text for snippet in transcript.snippets])
-        
-        return jsonify({
-            'video_id': video_id,
-            'text': full_text
-        })
-        
-    except Exception as e:
-        # Try web scraping as fallback
-        web_result = get_transcript_with_web_scraping(video_id)
-        
-        return jsonify({
-            'error': f'Failed to get transcript: {str(e)}',
-            'note': 'YouTube blocks requests from serverless functions (Vercel, Netlify, etc.)',
-            'free_solutions': [
-                'Deploy to Railway/Render (free tier with real IP)',
-                'Deploy to a VPS ($5/month)',
-                'Use GitHub Actions as free server',
-                'Use RapidAPI free tier',
-                'Check if video has transcripts in browser first'
-            ],
-            'web_scraping_result': web_result,
-            'video_url': f'https://www.youtube.com/watch?v={video_id}'
-        }), 500
+    def _handle(self, method):
+        start_timing()
+        try:
+            request = self._request(method)
+        except ValueError:
+            # The body cannot be delimited, so neither can the next request
+            self.close_connection = True
+            request = Request(method, urllib.parse.urlparse(self.path).path, headers=dict(self.headers.items()))
+            self._send_response(*render(({'error': 'Invalid Content-Length header'}, 400), request))
+            return
+        try:
+            response = render(dispatch(request), request)
+        except Exception:
+            # Answer like Flask would rather than dropping the connection
+            traceback.print_exc()
+            response = render(({'error': 'Internal server error'}, 500), request)
+        self._send_response(*response)
 
-@app.route('/', methods=['GET'])
-def home():
-    """API documentation"""
-    return jsonify({
-        'message': 'YouTube Transcript API (Free Version)',
-        'endpoints': {
-            '/transcript': {
-                'method': 'GET',
-                'params': 'video_id (YouTube video ID or URL)',
-                'description': 'Get transcript with timing information'
-            },
-            '/transcript/text': {
-                'method': 'GET', 
-                'params': 'video_id (YouTube video ID or URL)',
-                'description': 'Get transcript as plain text'
-            }
-        },
-        'examples': {
-            'by_video_id': '/transcript?video_id=dQw4w9WgXcQ',
-            'by_url': '/transcript?video_id=https://www.youtube.com/watch?v=dQw4w9WgXcQ'
-        },
-        'note': 'Due to YouTube blocking serverless function IPs, this API may not work reliably.',
-        'free_alternatives': [
-            'Deploy to Railway/Render (free tier)',
-            'Use RapidAPI free tier',
-            'Deploy to VPS ($5/month)',
-            'Use GitHub Actions as free server'
-        ]
-    })
+    def _request(self, method):
+        """Parse the request line, headers and body; ValueError for a bad Content-Length"""
+        parsed_url = urllib.parse.urlparse(self.path)
+        query_params = urllib.parse.parse_qs(parsed_url.query)
 
-# Vercel serverless function handler
-class handler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        # Parse the path and query parameters
-        from urllib.parse import urlparse, parse_qs
-        
-        parsed_url = urlparse(self.path)
-        path = parsed_url.path
-        query_params = parse_qs(parsed_url.query)
-        
         # Convert query params to single values
         args = {k: v[0] if v else None for k, v in query_params.items()}
-        
-        # Create a mock request object
-        class MockRequest:
-            def __init__(self, path, args):
-                self.path = path
-                self.args = args
-            
-            def args_get(self, key):
-                return self.args.get(key)
-        
-        mock_request = MockRequest(path, args)
-        
-        # Route the request
-        if path == '/transcript':
-            response = get_transcript_handler(mock_request)
-        elif path == '/transcript/text':
-            response = get_transcript_text_handler(mock_request)
-        elif path == '/':
-            response = home_handler()
-        else:
-            response = {'error': 'Not found'}, 404
-        
-        # Send response
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+
+        body = b''
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError(f'Negative Content-Length: {length}')
+            body = self.rfile.read(length)
+
+        return Request(method, parsed_url.path, args, dict(self.headers.items()), body)
+
+    def _send_response(self, status_code, headers, body):
+        if not isinstance(body, bytes):
+            self._send_stream(status_code, headers, body)
+            return
+
+        self.send_response(status_code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self._send_server_timing(status_code)
+        self._send_cors_headers()
         self.end_headers()
-        
-        if isinstance(response, tuple):
-            data, status_code = response
-            self.send_response(status_code)
+
+        self.wfile.write(body)
+
+    def _send_stream(self, status_code, headers, chunks):
+        # HTTP/1.1 clients get a chunked body; HTTP/1.0 clients read until close
+        chunked = self.request_version == 'HTTP/1.1'
+
+        self.send_response(status_code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self._send_server_timing(status_code)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
         else:
-            data = response
-        
-        self.wfile.write(json.dumps(data).encode())
-    
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.close_connection = True
+        self._send_cors_headers()
         self.end_headers()
 
-def get_transcript_handler(request):
-    """Handler for /transcript endpoint"""
-    video_id_or_url = request.args_get('video_id')
-    
-    if not video_id_or_url:
-        return {
-            'error': 'Missing video_id parameter',
-            'usage': 'GET /transcript?video_id=YOUR_VIDEO_ID_OR_URL'
-        }, 400
-    
-    try:
-        # Extract video ID from URL or use directly
-        video_id = extract_video_id(video_id_or_url)
-        
-        if not video_id:
-            return {
-                'error': 'Invalid YouTube URL or video ID'
-            }, 400
-        
-        # Try to get transcript with free methods
-        transcript = get_transcript_with_free_methods(video_id)
-        
-        # Format the response
-        formatted_transcript = []
-        for snippet in transcript.snippets:
-            formatted_transcript.append({
-                'text': snippet.text,
-                'start': snippet.start,
-                'duration': snippet.duration
-            })
-        
-        return {
-            'video_id': video_id,
-            'transcript': formatted_transcript,
-            'total_entries': len(formatted_transcript)
-        }
-        
-    except Exception as e:
-        # Try web scraping as fallback
-        web_result = get_transcript_with_web_scraping(video_id)
-        
-        return {
-            'error': f'Failed to get transcript: {str(e)}',
-            'note': 'YouTube blocks requests from serverless functions (Vercel, Netlify, etc.)',
-            'free_solutions': [
-                'Deploy to Railway/Render (free tier with real IP)',
-                'Deploy to a VPS ($5/month)',
-                'Use GitHub Actions as free server',
-                'Use RapidAPI free tier',
-                'Check if video has transcripts in browser first'
-            ],
-            'web_scraping_result': web_result,
-            'video_url': f'https://www.youtube.com/watch?v={video_id}'
-        }, 500
+        for chunk in chunks:
+            if not chunk:
+                # An empty chunk would end a chunked body early
+                continue
+            if chunked:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            else:
+                self.wfile.write(chunk)
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
 
-def get_transcript_text_handler(request):
-    """Handler for /transcript/text endpoint"""
-    video_id_or_url = request.args_get('video_id')
-    
-    if not video_id_or_url:
-        return {
-            'error': 'Missing video_id parameter',
-            'usage': 'GET /transcript/text?video_id=YOUR_VIDEO_ID_OR_URL'
-        }, 400
-    
-    try:
-        # Extract video ID from URL or use directly
-        video_id = extract_video_id(video_id_or_url)
-        
-        if not video_id:
-            return {
-                'error': 'Invalid YouTube URL or video ID'
-            }, 400
-        
-        # Try to get transcript with free methods
-        transcript = get_transcript_with_free_methods(video_id)
-        
-        # Combine all text
-        full_text = ' '.join([snippet.text for snippet in transcript.snippets])
-        
-        return {
-            'video_id': video_id,
-            'text': full_text
-        }
-        
-    except Exception as e:
-        # Try web scraping as fallback
-        web_result = get_transcript_with_web_scraping(video_id)
-        
-        return {
-            'error': f'Failed to get transcript: {str(e)}',
-            'note': 'YouTube blocks requests from serverless functions (Vercel, Netlify, etc.)',
-            'free_solutions': [
-                'Deploy to Railway/Render (free tier with real IP)',
-                'Deploy to a VPS ($5/month)',
-                'Use GitHub Actions as free server',
-                'Use RapidAPI free tier',
-                'Check if video has transcripts in browser first'
-            ],
-            'web_scraping_result': web_result,
-            'video_url': f'https://www.youtube.com/watch?v={video_id}'
-        }, 500
+    def _send_server_timing(self, status_code):
+        timing = finish_request(route_name(urllib.parse.urlparse(self.path).path), status_code)
+        if timing:
+            self.send_header('Server-Timing', timing)
 
-def home_handler():
-    """Handler for / endpoint"""
-    return {
-        'message': 'YouTube Transcript API (Free Version)',
-        'endpoints': {
-            '/transcript': {
-                'method': 'GET',
-                'params': 'video_id (YouTube video ID or URL)',
-                'description': 'Get transcript with timing information'
-            },
-            '/transcript/text': {
-                'method': 'GET', 
-                'params': 'video_id (YouTube video ID or URL)',
-                'description': 'Get transcript as plain text'
-            }
-        },
-        'examples': {
-            'by_video_id': '/transcript?video_id=dQw4w9WgXcQ',
-            'by_url': '/transcript?video_id=https://www.youtube.com/watch?v=dQw4w9WgXcQ'
-        },
-        'note': 'Due to YouTube blocking serverless function IPs, this API may not work reliably.',
-        'free_alternatives': [
-            'Deploy to Railway/Render (free tier)',
-            'Use RapidAPI free tier',
-            'Deploy to VPS ($5/month)',
-            'Use GitHub Actions as free server'
-        ]
-    } 
\ No newline at end of file
+    def _send_cors_headers(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', ', '.join(CORS_ALLOW_HEADERS))
+        self.send_header('Access-Control-Expose-Headers', ', '.join(CORS_EXPOSE_HEADERS))
+
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self._send_cors_headers()
+        self.end_headers()
@@ -0,0 +1,98 @@
+"""ASGI entry point for the transcript endpoints
+
+Serve with any ASGI server, e.g. ``uvicorn asgi:app``. Transcript fetches
+are awaited on the shared fetch engine, so requests waiting on retry
+backoff do not tie up a thread each. Rendering, compression and streamed
+body chunks are produced on worker threads, never on the event loop.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from transcript_service.metrics import finish_request, start_timing
+from transcript_service.routes import (
+    CORS_ALLOW_HEADERS,
+    CORS_EXPOSE_HEADERS,
+    Request,
+    dispatch_async,
+    render,
+    resume_jobs,
+    route_name,
+)
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+    (b'access-control-allow-headers', ', '.join(CORS_ALLOW_HEADERS).encode()),
+    (b'access-control-expose-headers', ', '.join(CORS_EXPOSE_HEADERS).encode()),
+]
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send(send, path, status_code, headers, body):
+    headers = dict(headers)
+    headers['Server-Timing'] = finish_request(route_name(path), status_code)
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()] + CORS_HEADERS
+    })
+    if isinstance(body, bytes):
+        await send({'type': 'http.response.body', 'body': body})
+        return
+    chunks = iter(body)
+    while True:
+        # Each chunk is serialized (and compressed) as it is pulled
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Pick up prefetch jobs left unfinished by the previous process
+            await asyncio.to_thread(resume_jobs)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    method = scope['method']
+    path = scope['path']
+
+    if method == 'OPTIONS':
+        await send({'type': 'http.response.start', 'status': 200, 'headers': CORS_HEADERS})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    start_timing()
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope.get('headers') or []}
+
+    query_params = parse_qs(scope.get('query_string', b'').decode())
+    # Convert query params to single values
+    args = {k: v[0] if v else None for k, v in query_params.items()}
+
+    body = await _read_body(receive) if method == 'POST' else b''
+    request = Request(method, path, args, headers, body)
+    response = await dispatch_async(request)
+    await _send(send, path, *await asyncio.to_thread(render, response, request))
@@ -0,0 +1,146 @@
+"""Cold start benchmark: time to import each entry point in a fresh interpreter
+
+Every run is a new ``python`` process, so nothing is cached in
+``sys.modules``. Reported per entry point: median and min import time over
+the runs, the whole process wall time and which heavy dependencies the
+import pulled in.
+
+    python benchmarks/bench_import.py --runs 20 --baseline HEAD~1 --output bench_import.json
+
+``--baseline REV`` exports that revision with ``git archive`` and measures
+it the same way, to show the change against an older tree.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = ('api.index', 'app', 'asgi')
+HEAVY_MODULES = ('flask', 'youtube_transcript_api', 'requests', 'asyncio', 'sqlite3')
+
+# Runs in the child: import one module and report how long it took
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'import_ms': elapsed * 1000,
+    'loaded': [name for name in sys.argv[2:] if name in sys.modules]
+}))
+"""
+
+
+def measure(tree, module, runs, env):
+    imports = []
+    walls = []
+    loaded = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE, module] + list(HEAVY_MODULES),
+            cwd=tree, env=env, capture_output=True, text=True
+        )
+        walls.append((time.perf_counter() - started) * 1000)
+        if completed.returncode != 0:
+            return {'module': module, 'error': completed.stderr.strip().splitlines()[-1]}
+        result = json.loads(completed.stdout)
+        imports.append(result['import_ms'])
+        loaded = result['loaded']
+    return {
+        'module': module,
+        'import_ms_median': round(statistics.median(imports), 2),
+        'import_ms_min': round(min(imports), 2),
+        'process_ms_median': round(statistics.median(walls), 2),
+        'heavy_modules_loaded': loaded
+    }
+
+
+def export_revision(revision):
+    tree = tempfile.mkdtemp(prefix='bench-import-')
+    archive = subprocess.run(['git', 'archive', revision], cwd=ROOT, capture_output=True, check=True)
+    subprocess.run(['tar', '-x', '-C', tree], input=archive.stdout, check=True)
+    return tree
+
+
+def git_revision(revision='HEAD'):
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', revision], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_tree(label, tree, modules, runs):
+    env = dict(os.environ)
+    # Keep the cache and search index of the runs out of the real cache dir
+    env['TRANSCRIPT_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench-import-cache-')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [tree, env.get('PYTHONPATH')]))
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    results = []
+    for module in modules:
+        # One untimed import first so both trees are measured with warm .pyc files
+        measure(tree, module, 1, dict(env, PYTHONDONTWRITEBYTECODE=''))
+        result = measure(tree, module, runs, env)
+        results.append(result)
+        if 'error' in result:
+            print(f"{label:>8} {module:>10}: failed: {result['error']}")
+        else:
+            print(
+                f"{label:>8} {module:>10}: import {result['import_ms_median']:>7.1f} ms "
+                f"(min {result['import_ms_min']:.1f})  process {result['process_ms_median']:>7.1f} ms  "
+                f"loads {', '.join(result['heavy_modules_loaded']) or '-'}"
+            )
+    shutil.rmtree(env['TRANSCRIPT_CACHE_DIR'], ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure entry point import (cold start) time')
+    parser.add_argument('--modules', nargs='+', default=list(ENTRY_POINTS))
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters per module')
+    parser.add_argument('--baseline', help='git revision to compare against, e.g. HEAD~1')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    report = {
+        'benchmark': 'import',
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'revision': git_revision(),
+        'results': run_tree('current', ROOT, args.modules, args.runs)
+    }
+
+    if args.baseline:
+        tree = export_revision(args.baseline)
+        try:
+            report['baseline'] = {
+                'revision': git_revision(args.baseline),
+                'results': run_tree('baseline', tree, args.modules, args.runs)
+            }
+        finally:
+            shutil.rmtree(tree, ignore_errors=True)
+
+        for current, baseline in zip(report['results'], report['baseline']['results']):
+            if 'error' in current or 'error' in baseline:
+                continue
+            saved = baseline['import_ms_median'] - current['import_ms_median']
+            print(f"{current['module']:>17}: {saved:+.1f} ms faster than {args.baseline}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
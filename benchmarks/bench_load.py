@@ -0,0 +1,232 @@
+"""Load benchmark: the Flask app and the Vercel handler against a fake YouTube
+
+Starts ``fake_youtube.FakeYouTube`` in this process, then serves each
+target on a local port in its own child process (so peak RSS is per
+target) and drives it with concurrent clients. Every target starts from an
+empty transcript cache.
+
+    python benchmarks/bench_load.py --requests 2000 --concurrency 32 --videos 100 \\
+        --latency 0.05 --block-rate 0.02 --snippets 500 --output bench_load.json
+
+Reported per target: p50/p90/p99/max latency, throughput, status codes,
+upstream (fake YouTube) requests per client request and peak RSS.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_youtube import FakeYouTube
+
+TARGETS = ('flask', 'handler')
+
+
+def serve_flask():
+    """app.py's Flask app on a threaded WSGI server"""
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    return make_server('127.0.0.1', 0, app, threaded=True)
+
+
+def serve_handler():
+    """api/index.py's handler class on a threaded HTTP server"""
+    from http.server import ThreadingHTTPServer
+    from api.index import handler
+
+    class QuietHandler(handler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), QuietHandler)
+    server.daemon_threads = True
+    return server
+
+
+SERVERS = {'flask': serve_flask, 'handler': serve_handler}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def request_once(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    started = time.perf_counter()
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except (OSError, http.client.HTTPException):
+        status = 'error'
+    finally:
+        connection.close()
+    return status, time.perf_counter() - started
+
+
+def drive(port, options):
+    """Send the request mix with a fixed number of concurrent clients"""
+    rng = random.Random(options['seed'])
+    paths = [
+        f"{options['path']}?video_id=bench{rng.randrange(options['videos'])}"
+        for _ in range(options['requests'])
+    ]
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def run(path):
+        status, elapsed = request_once(port, path)
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+        list(pool.map(run, paths))
+    wall = time.perf_counter() - started
+    return sorted(latencies), statuses, wall
+
+
+def run_target(target, fake_url, options, results):
+    """Child process body: configure, start the target server and load it"""
+    os.environ['YOUTUBE_BASE_URL'] = fake_url
+    os.environ['TRANSCRIPT_CACHE_DIR'] = tempfile.mkdtemp(prefix=f'bench-{target}-')
+    # Keep retry backoff short so blocked runs finish in benchmark time
+    os.environ.setdefault('FETCH_BACKOFF_MIN', str(options['backoff']))
+    os.environ.setdefault('FETCH_BACKOFF_MAX', str(options['backoff'] * 2))
+    if options['upstream_rate']:
+        # The adaptive limiter paces upstream calls (5/s by default); raise
+        # it to measure the service rather than the limiter
+        os.environ['UPSTREAM_RATE'] = str(options['upstream_rate'])
+        os.environ['UPSTREAM_BURST'] = str(max(1, int(options['upstream_rate'])))
+        # The load generator is one anonymous client; do not let its own
+        # fetch quota cap the measurement
+        os.environ.setdefault('QUOTA_RATE', '0')
+
+    import resource
+
+    server = SERVERS[target]()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    latencies, statuses, wall = drive(server.server_address[1], options)
+    server.shutdown()
+
+    ms = lambda seconds: None if seconds is None else round(seconds * 1000, 2)
+    results.put({
+        'target': target,
+        'requests': len(latencies),
+        'status_codes': {str(status): count for status, count in statuses.items()},
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p90_ms': ms(percentile(latencies, 0.90)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'wall_seconds': round(wall, 3),
+        # ru_maxrss is KiB on Linux
+        'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    })
+
+
+def wait_for_result(process, queue):
+    # Do not hang if the child dies before reporting (e.g. an import error)
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            if not process.is_alive():
+                raise SystemExit(f'{process.name} exited with code {process.exitcode}')
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the transcript endpoints')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--videos', type=int, default=50, help='distinct video IDs in the request mix')
+    parser.add_argument('--path', default='/transcript', help='endpoint to request')
+    parser.add_argument('--latency', type=float, default=0.02, help='fake YouTube latency per request, seconds')
+    parser.add_argument('--block-rate', type=float, default=0.0, help='fraction of upstream requests answered with 429')
+    parser.add_argument('--snippets', type=int, default=200, help='snippets per transcript')
+    parser.add_argument('--backoff', type=float, default=0.05, help='retry backoff in seconds while benchmarking')
+    parser.add_argument('--upstream-rate', type=float, help='override UPSTREAM_RATE (requests/second) in the service')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    options = {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'videos': args.videos,
+        'path': args.path,
+        'backoff': args.backoff,
+        'upstream_rate': args.upstream_rate,
+        'seed': args.seed
+    }
+    fake = FakeYouTube(latency=args.latency, block_rate=args.block_rate, snippets=args.snippets).start()
+    context = multiprocessing.get_context('spawn')
+
+    results = []
+    for target in args.targets:
+        fake.reset()
+        queue = context.Queue()
+        process = context.Process(target=run_target, args=(target, fake.base_url, options, queue))
+        process.start()
+        result = wait_for_result(process, queue)
+        process.join()
+
+        upstream = fake.stats()
+        result['upstream_requests'] = upstream['upstream_requests']
+        result['upstream_blocked'] = upstream.get('blocked', 0)
+        result['upstream_per_request'] = round(upstream['upstream_requests'] / result['requests'], 3)
+        results.append(result)
+        print(
+            f"{target:>8}: p50 {result['p50_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms  "
+            f"{result['throughput_rps']:>8.1f} req/s  "
+            f"upstream/req {result['upstream_per_request']:.3f}  "
+            f"peak RSS {result['peak_rss_kib'] / 1024:.1f} MiB  {result['status_codes']}"
+        )
+    fake.stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'load',
+                'revision': git_revision(),
+                'config': dict(options, latency=args.latency, block_rate=args.block_rate,
+                               snippets=args.snippets),
+                'results': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
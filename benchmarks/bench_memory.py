@@ -0,0 +1,94 @@
+"""Memory benchmark: CompactTranscript vs the list-of-dicts layout
+
+Builds the same synthetic transcript in each layout and measures the
+retained allocation with tracemalloc.
+
+    python benchmarks/bench_memory.py --snippets 1000 10000 50000 --output bench_memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_service.compact import CompactTranscript
+
+try:
+    from youtube_transcript_api import FetchedTranscript, FetchedTranscriptSnippet
+except ImportError:
+    FetchedTranscript = None
+
+
+def synthetic_snippets(count):
+    for i in range(count):
+        yield (f'line {i} of a long livestream transcript with some words', i * 2.5, 2.4)
+
+
+def build_dicts(count):
+    # The layout the endpoints used to build per request
+    return [
+        {'text': text, 'start': start, 'duration': duration}
+        for text, start, duration in synthetic_snippets(count)
+    ]
+
+
+def build_fetched(count):
+    if FetchedTranscript is None:
+        return None
+    return FetchedTranscript(
+        snippets=[
+            FetchedTranscriptSnippet(text=text, start=start, duration=duration)
+            for text, start, duration in synthetic_snippets(count)
+        ],
+        video_id='bench', language='English', language_code='en', is_generated=False
+    )
+
+
+def build_compact(count):
+    return CompactTranscript('bench', 'English', 'en', False, synthetic_snippets(count))
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    value = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if value is None:
+        return None
+    del value
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare transcript memory layouts')
+    parser.add_argument('--snippets', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for count in args.snippets:
+        row = {'snippets': count}
+        for name, build in (('list_of_dicts', build_dicts), ('fetched_transcript', build_fetched),
+                            ('compact', build_compact)):
+            row[name + '_bytes'] = measure(build, count)
+        row['compact_vs_dicts'] = round(row['compact_bytes'] / row['list_of_dicts_bytes'], 3)
+        results.append(row)
+        fetched = row['fetched_transcript_bytes']
+        print(
+            f"{count:>8} snippets: dicts {row['list_of_dicts_bytes'] / 1024:>9.1f} KiB  "
+            + (f"fetched {fetched / 1024:>9.1f} KiB  " if fetched is not None else '')
+            + f"compact {row['compact_bytes'] / 1024:>9.1f} KiB  "
+            f"({row['compact_vs_dicts']:.0%} of dicts)"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'memory', 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
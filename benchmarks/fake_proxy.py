@@ -0,0 +1,166 @@
+"""Local stand-in for an egress proxy
+
+A plain-HTTP forwarding proxy with configurable latency and blocking, for
+exercising the egress pool against ``benchmarks/fake_youtube.py``. A
+"blocked" proxy answers 429 itself, the way YouTube treats a burned exit
+IP. Only absolute-URI ``http://`` requests are forwarded (no CONNECT),
+which is all the fake YouTube needs.
+
+    python benchmarks/fake_youtube.py --port 9000 &
+    python benchmarks/fake_proxy.py --port 8081 &
+    python benchmarks/fake_proxy.py --port 8082 --block-rate 1 &
+    YOUTUBE_BASE_URL=http://127.0.0.1:9000 \\
+    EGRESS_PROXIES=http://127.0.0.1:8081,http://127.0.0.1:8082 python app.py
+
+As with the fake YouTube, ``POST /__control`` (``latency``,
+``block_rate``) changes knobs at runtime and ``GET /__stats`` reads the
+counters; both are addressed to the proxy itself, not through it.
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Hop-by-hop headers are not forwarded
+HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authorization', 'proxy-connection',
+    'te', 'trailer', 'transfer-encoding', 'upgrade'
+}
+
+
+class FakeProxy:
+    """A threaded forwarding proxy with tunable latency and blocking"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, block_rate=0.0):
+        self.latency = latency
+        self.block_rate = block_rate
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _make_handler(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == '/__stats':
+                    self._reply(200, json.dumps(proxy.stats()).encode(), 'application/json')
+                    return
+                self._forward()
+
+            def do_POST(self):
+                if self.path == '/__control':
+                    length = int(self.headers.get('Content-Length') or 0)
+                    settings = json.loads(self.rfile.read(length) or b'{}')
+                    for name in ('latency', 'block_rate'):
+                        if name in settings:
+                            setattr(proxy, name, settings[name])
+                    self._reply(200, json.dumps(proxy.stats()).encode(), 'application/json')
+                    return
+                self._forward()
+
+            def _forward(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else None
+                target = urlsplit(self.path)
+                if target.scheme != 'http':
+                    proxy.count('rejected')
+                    self._reply(501, b'Only absolute http:// URLs are proxied', 'text/plain')
+                    return
+
+                proxy.count('requests')
+                if proxy.latency:
+                    time.sleep(proxy.latency)
+                if proxy.block_rate and random.random() < proxy.block_rate:
+                    proxy.count('blocked')
+                    self._reply(429, b'Too Many Requests', 'text/plain')
+                    return
+
+                headers = {
+                    name: value for name, value in self.headers.items()
+                    if name.lower() not in HOP_HEADERS
+                }
+                path = target.path + (f'?{target.query}' if target.query else '')
+                connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                try:
+                    connection.request(self.command, path, body=body, headers=headers)
+                    response = connection.getresponse()
+                    data = response.read()
+                except OSError as e:
+                    proxy.count('upstream_errors')
+                    self._reply(502, str(e).encode(), 'text/plain')
+                    return
+                finally:
+                    connection.close()
+
+                proxy.count('forwarded')
+                self.send_response(response.status)
+                for name, value in response.getheaders():
+                    if name.lower() not in HOP_HEADERS and name.lower() != 'content-length':
+                        self.send_header(name, value)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _reply(self, status, data, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type + '; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--block-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    args = parser.parse_args()
+
+    proxy = FakeProxy(args.host, args.port, args.latency, args.block_rate)
+    print(f'Fake proxy listening on {proxy.url}')
+    try:
+        proxy._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
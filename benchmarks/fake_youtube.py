@@ -0,0 +1,287 @@
+"""Local stand-in for the YouTube endpoints the transcript fetchers use
+
+Serves the watch page, the innertube player endpoint and timedtext
+tracks, with configurable latency, blocking and transcript size. Point
+the service at it with ``YOUTUBE_BASE_URL=http://127.0.0.1:<port>``.
+
+Video IDs starting with ``nocaps`` have transcripts disabled; IDs starting
+with ``gen`` only have an auto-generated track. IDs containing ``noplayer``
+get a 500 from the innertube player endpoint, so only the watch page route
+works for them, and IDs containing ``potoken`` list watch page tracks that
+need a PO token. Playlist pages and channel video tabs list
+``playlist_size`` made-up video IDs derived from the playlist or channel
+name, ``LISTING_PAGE_SIZE`` at a time: the rest come from the innertube
+browse endpoint, following continuation tokens like the real site. Watch pages carry ``page_padding`` bytes of filler after the player
+response, like the large ``ytInitialData`` blob of a real page.
+
+    python benchmarks/fake_youtube.py --port 9000 --latency 0.05 --block-rate 0.1
+
+Runtime knobs can be changed with ``POST /__control`` (a JSON object with
+any of ``latency``, ``block_rate``, ``snippets``, ``playlist_size``,
+``page_padding``), and request counters are read from ``GET /__stats``.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+ORIGIN = 'https://www.youtube.com'
+LISTING_PAGE_SIZE = 100
+
+WATCH_PAGE = '''<!DOCTYPE html><html><head><title>{video_id} - YouTube</title></head>
+<body><script>ytcfg.set({{"INNERTUBE_API_KEY": "fake-innertube-key"}});</script>
+<script>var ytInitialPlayerResponse = {player};</script>
+<script>var ytInitialData = "{padding}";</script></body></html>'''
+
+
+def player_response(video_id, web=False):
+    """Innertube player JSON with caption tracks for video_id
+
+    web is the variant embedded in the watch page, whose track URLs need a
+    PO token for ``potoken`` IDs.
+    """
+    if video_id.startswith('nocaps'):
+        return {'playabilityStatus': {'status': 'OK'}, 'videoDetails': {'videoId': video_id}}
+
+    track_url = f'{ORIGIN}/api/timedtext?v={video_id}&lang=en'
+    if web and 'potoken' in video_id:
+        track_url += '&exp=xpe'
+    tracks = [{
+        'baseUrl': track_url + '&kind=asr',
+        'name': {'runs': [{'text': 'English (auto-generated)'}]},
+        'languageCode': 'en',
+        'kind': 'asr',
+        'isTranslatable': True
+    }]
+    if not video_id.startswith('gen'):
+        tracks.insert(0, {
+            'baseUrl': track_url,
+            'name': {'runs': [{'text': 'English'}]},
+            'languageCode': 'en',
+            'isTranslatable': True
+        })
+    return {
+        'playabilityStatus': {'status': 'OK'},
+        'videoDetails': {'videoId': video_id},
+        'captions': {
+            'playerCaptionsTracklistRenderer': {
+                'captionTracks': tracks,
+                'translationLanguages': [
+                    {'languageCode': 'de', 'languageName': {'runs': [{'text': 'German'}]}},
+                    {'languageCode': 'es', 'languageName': {'runs': [{'text': 'Spanish'}]}}
+                ]
+            }
+        }
+    }
+
+
+def listing_entries(source, size, start=0):
+    """One page of a listing of size videos, from start, and a
+    continuation item if more follow"""
+    entries = []
+    for i in range(start, min(start + LISTING_PAGE_SIZE, size)):
+        video_id = hashlib.md5(f'{source}:{i}'.encode()).hexdigest()[:11]
+        entries.append({'playlistVideoRenderer': {'videoId': video_id, 'index': {'simpleText': str(i + 1)}}})
+    if start + LISTING_PAGE_SIZE < size:
+        entries.append({'continuationItemRenderer': {
+            'trigger': 'CONTINUATION_TRIGGER_ON_ITEM_SHOWN',
+            'continuationEndpoint': {
+                'commandMetadata': {'webCommandMetadata': {'apiUrl': '/youtubei/v1/browse'}},
+                'continuationCommand': {'token': f'{source}|{start + LISTING_PAGE_SIZE}'}
+            }
+        }})
+    return entries
+
+
+def listing_page(source, size):
+    """Playlist page / channel videos tab with the first page of entries"""
+    data = json.dumps({'contents': listing_entries(source, size)}, separators=(',', ':'))
+    return (
+        '<!DOCTYPE html><html><body><script>ytcfg.set({"INNERTUBE_API_KEY":"fake-innertube-key",'
+        '"INNERTUBE_CLIENT_VERSION":"2.20240101.00.00"});</script>'
+        f'<script>var ytInitialData = {data};</script></body></html>'
+    )
+
+
+def browse_continuation(token, size):
+    """Browse endpoint JSON for a continuation token of listing_entries"""
+    source, start = token.rsplit('|', 1)
+    items = listing_entries(source, size, int(start))
+    return {'onResponseReceivedActions': [{'appendContinuationItemsAction': {'continuationItems': items}}]}
+
+
+def timedtext(video_id, snippets):
+    """Timedtext XML with the given number of snippets"""
+    lines = ['<?xml version="1.0" encoding="utf-8" ?><transcript>']
+    for i in range(snippets):
+        lines.append('<text start="%.2f" dur="%.2f">%s</text>' % (
+            i * 2.5, 2.4, escape(f'{video_id} line {i} about transcripts & captions')
+        ))
+    lines.append('</transcript>')
+    return '\n'.join(lines)
+
+
+class FakeYouTube:
+    """A threaded fake YouTube server with tunable latency and blocking"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, block_rate=0.0, snippets=200,
+                 playlist_size=20, page_padding=0):
+        self.latency = latency
+        self.page_padding = page_padding
+        self.block_rate = block_rate
+        self.snippets = snippets
+        self.playlist_size = playlist_size
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['upstream_requests'] = sum(
+            stats.get(name, 0) for name in ('watch', 'player', 'timedtext', 'listing', 'other')
+        )
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Clients may hang up part way through a watch page
+                    pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/__stats':
+                    self._reply(200, json.dumps(fake.stats()), 'application/json')
+                    return
+                if url.path == '/watch':
+                    self._upstream('watch', lambda: self._watch(query.get('v', [''])[0]))
+                elif url.path == '/playlist' or url.path.endswith('/videos'):
+                    source = query.get('list', [url.path])[0]
+                    self._upstream('listing', lambda: self._reply(
+                        200, listing_page(source, fake.playlist_size), 'text/html'
+                    ))
+                elif url.path == '/api/timedtext':
+                    video_id = query.get('v', [''])[0]
+                    self._upstream('timedtext', lambda: self._reply(
+                        200, timedtext(video_id, fake.snippets), 'text/xml'
+                    ))
+                else:
+                    self._upstream('other', lambda: self._reply(404, 'Not found', 'text/plain'))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                if url.path == '/__control':
+                    settings = json.loads(body or b'{}')
+                    for name in ('latency', 'block_rate', 'snippets', 'playlist_size', 'page_padding'):
+                        if name in settings:
+                            setattr(fake, name, settings[name])
+                    self._reply(200, json.dumps(fake.stats()), 'application/json')
+                    return
+                if url.path == '/youtubei/v1/player':
+                    video_id = json.loads(body or b'{}').get('videoId', '')
+                    if 'noplayer' in video_id:
+                        self._upstream('player', lambda: self._reply(500, 'Internal error', 'text/plain'))
+                        return
+                    self._upstream('player', lambda: self._reply(
+                        200, json.dumps(player_response(video_id)), 'application/json'
+                    ))
+                elif url.path == '/youtubei/v1/browse':
+                    token = json.loads(body or b'{}').get('continuation', '')
+                    self._upstream('listing', lambda: self._reply(
+                        200, json.dumps(browse_continuation(token, fake.playlist_size), separators=(',', ':')),
+                        'application/json'
+                    ))
+                else:
+                    self._upstream('other', lambda: self._reply(404, 'Not found', 'text/plain'))
+
+            def _upstream(self, name, respond):
+                fake.count(name)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if fake.block_rate and random.random() < fake.block_rate:
+                    fake.count('blocked')
+                    self._reply(429, 'Too Many Requests', 'text/plain')
+                    return
+                respond()
+
+            def _watch(self, video_id):
+                player = json.dumps(player_response(video_id, web=True))
+                page = WATCH_PAGE.format(video_id=video_id, player=player, padding='x' * fake.page_padding)
+                self._reply(200, page, 'text/html')
+
+            def _reply(self, status, body, content_type):
+                data = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type + '; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--block-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--snippets', type=int, default=200, help='snippets per transcript')
+    parser.add_argument('--page-padding', type=int, default=0, help='filler bytes after the player response')
+    args = parser.parse_args()
+
+    fake = FakeYouTube(args.host, args.port, args.latency, args.block_rate, args.snippets,
+                       page_padding=args.page_padding)
+    print(f'Fake YouTube listening on {fake.base_url}')
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""Bulk export of transcripts to sharded JSONL files
+
+Reads video IDs or URLs (one per line) from files or stdin, fetches them
+across a pool of worker processes and streams one JSON object per video
+into numbered shards:
+
+    python export.py videos.txt --output dump/ --workers 8 --gzip
+    cat videos.txt | python export.py --output dump/
+
+A shard is written under a ``.partial`` name and renamed once it holds
+``--shard-size`` transcripts; only then are its videos appended to
+``checkpoint.jsonl`` in the output directory. Running the same command
+again skips every checkpointed video, so a killed export resumes with at
+most one shard's worth of work repeated. Videos without transcripts are
+checkpointed as unavailable; videos that failed for any other reason
+(blocking, network errors) are not, and are retried on the next run.
+
+Each worker process has its own fetch engine, rate limiter and egress
+pool; ``--rate`` is the upstream request rate shared out between them.
+"""
+import argparse
+import gzip
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from transcript_service.errors import summarize_error
+from transcript_service.formatters import snippet_dicts
+from transcript_service.routes import extract_video_id
+
+CHECKPOINT_NAME = 'checkpoint.jsonl'
+SHARD_PREFIX = 'transcripts-'
+PARTIAL_SUFFIX = '.partial'
+
+OK = 'ok'
+UNAVAILABLE = 'unavailable'
+ERROR = 'error'
+
+
+def read_video_ids(paths):
+    """Normalized, de-duplicated video IDs from input files ("-" is stdin),
+    and the input lines that are not a video ID or URL
+    """
+    video_ids = {}
+    invalid = []
+    for path in paths:
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for line in stream:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                video_id = extract_video_id(line)
+                if video_id:
+                    video_ids[video_id.strip()] = None
+                else:
+                    invalid.append(line)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+    return list(video_ids), invalid
+
+
+def read_checkpoint(output):
+    """Videos already exported or known to be unavailable, and the next shard number"""
+    done = set()
+    next_shard = 0
+    path = os.path.join(output, CHECKPOINT_NAME)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A run killed mid-append leaves a torn last line
+                    continue
+                done.update(entry['video_ids'])
+                done.update(entry['unavailable'])
+                if entry.get('shard') is not None:
+                    next_shard = max(next_shard, entry['shard'] + 1)
+    return done, next_shard
+
+
+class ShardWriter:
+    """Writes JSONL shards and checkpoints each one once it is complete"""
+
+    def __init__(self, output, next_shard=0, shard_size=1000, compress=False):
+        self.output = output
+        self.shard = next_shard
+        self.shard_size = shard_size
+        self.compress = compress
+        self._file = None
+        self._path = None
+        self._video_ids = []
+        self._unavailable = {}
+        self._checkpoint = open(os.path.join(output, CHECKPOINT_NAME), 'a', encoding='utf-8')
+        # Shards left half-written by a killed run were never checkpointed
+        for name in os.listdir(output):
+            if name.startswith(SHARD_PREFIX) and name.endswith(PARTIAL_SUFFIX):
+                os.remove(os.path.join(output, name))
+
+    def _shard_name(self):
+        return f'{SHARD_PREFIX}{self.shard:05d}.jsonl' + ('.gz' if self.compress else '')
+
+    def write(self, video_id, line):
+        if self._file is None:
+            self._path = os.path.join(self.output, self._shard_name())
+            partial = self._path + PARTIAL_SUFFIX
+            self._file = gzip.open(partial, 'wb') if self.compress else open(partial, 'wb')
+        self._file.write(line)
+        self._video_ids.append(video_id)
+        if len(self._video_ids) >= self.shard_size:
+            self.flush()
+
+    def unavailable(self, video_id, error):
+        self._unavailable[video_id] = error
+
+    def flush(self):
+        """Close the current shard, if any, and checkpoint its videos"""
+        if self._file is None and not self._unavailable:
+            return
+        entry = {'shard': None, 'file': None}
+        if self._file is not None:
+            self._file.close()
+            os.replace(self._path + PARTIAL_SUFFIX, self._path)
+            self._file = None
+            entry = {'shard': self.shard, 'file': os.path.basename(self._path)}
+            self.shard += 1
+        entry['video_ids'] = self._video_ids
+        entry['unavailable'] = self._unavailable
+        self._checkpoint.write(json.dumps(entry) + '\n')
+        self._checkpoint.flush()
+        os.fsync(self._checkpoint.fileno())
+        self._video_ids = []
+        self._unavailable = {}
+
+    def close(self):
+        self.flush()
+        self._checkpoint.close()
+
+
+def _init_worker(rate):
+    # Runs before the worker first imports the fetch engine, whose rate
+    # limiter reads UPSTREAM_RATE at import time
+    os.environ['UPSTREAM_RATE'] = str(rate)
+    # Ctrl-C reaches the whole process group; the parent alone decides
+    # how to shut down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def export_one(video_id, language, kind, use_cache, attempts):
+    """Fetch one transcript in a worker process
+
+    Returns ``(video_id, status, payload)``: the encoded JSONL line for
+    ``ok``, an error message for ``unavailable`` and ``error``.
+    """
+    from transcript_service.cache import TranscriptUnavailable, is_negative
+    from transcript_service.routes import get_cached_transcript, get_transcript_with_free_methods
+    from transcript_service.upstream import UpstreamUnavailable
+
+    fetch = get_cached_transcript if use_cache else get_transcript_with_free_methods
+    for attempt in range(attempts):
+        try:
+            transcript = fetch(video_id, language, kind)
+            break
+        except UpstreamUnavailable as e:
+            error = e
+            # The breaker is open; wait until it lets a probe through
+            if attempt < attempts - 1:
+                time.sleep(e.retry_after)
+        except Exception as e:
+            if isinstance(e, TranscriptUnavailable) or is_negative(e):
+                return video_id, UNAVAILABLE, summarize_error(e)
+            error = e
+    else:
+        return video_id, ERROR, summarize_error(error)
+
+    record = {
+        'video_id': video_id,
+        'language': transcript.language,
+        'language_code': transcript.language_code,
+        'is_generated': transcript.is_generated,
+        'transcript': snippet_dicts(transcript.snippets)
+    }
+    return video_id, OK, json.dumps(record, ensure_ascii=False).encode() + b'\n'
+
+
+class Progress:
+    """Periodic throughput and error-rate reports on stderr"""
+
+    def __init__(self, total, interval):
+        self.total = total
+        self.interval = interval
+        self.counts = {OK: 0, UNAVAILABLE: 0, ERROR: 0}
+        self.started = self._last = time.monotonic()
+        self._last_done = 0
+
+    @property
+    def done(self):
+        return sum(self.counts.values())
+
+    def add(self, status):
+        self.counts[status] += 1
+        if time.monotonic() - self._last >= self.interval:
+            self.report()
+
+    def report(self, final=False):
+        now = time.monotonic()
+        done = self.done
+        overall = done / max(now - self.started, 1e-9)
+        recent = (done - self._last_done) / max(now - self._last, 1e-9)
+        self._last, self._last_done = now, done
+        line = (
+            f'{done}/{self.total} videos, {self.counts[OK]} ok, '
+            f'{self.counts[UNAVAILABLE]} unavailable, {self.counts[ERROR]} errors '
+            f'({self.counts[ERROR] / done if done else 0:.1%} error rate), '
+            f'{recent:.1f}/s now, {overall:.1f}/s overall'
+        )
+        if not final and overall > 0:
+            line += f', ETA {(self.total - done) / overall:.0f}s'
+        print(line, file=sys.stderr, flush=True)
+
+
+def run(args):
+    os.makedirs(args.output, exist_ok=True)
+    video_ids, invalid = read_video_ids(args.inputs)
+    for line in invalid:
+        print(f'Skipping invalid video ID or URL: {line}', file=sys.stderr)
+    done, next_shard = read_checkpoint(args.output)
+    pending = [video_id for video_id in video_ids if video_id not in done]
+    print(
+        f'{len(video_ids)} videos, {len(video_ids) - len(pending)} already exported, '
+        f'{len(pending)} to go',
+        file=sys.stderr
+    )
+
+    writer = ShardWriter(args.output, next_shard, args.shard_size, args.gzip)
+    progress = Progress(len(pending), args.report_every)
+    rate = args.rate / args.workers
+    queue = iter(pending)
+    inflight = set()
+    executor = ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(rate,))
+    try:
+        while True:
+            # Keep a bounded window of submitted videos rather than
+            # queueing the whole list up front
+            while len(inflight) < args.workers * 4:
+                video_id = next(queue, None)
+                if video_id is None:
+                    break
+                inflight.add(executor.submit(
+                    export_one, video_id, args.language, args.kind, not args.no_cache, args.attempts
+                ))
+            if not inflight:
+                break
+            finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                video_id, status, payload = future.result()
+                if status == OK:
+                    writer.write(video_id, payload)
+                elif status == UNAVAILABLE:
+                    writer.unavailable(video_id, payload)
+                elif args.verbose:
+                    print(f'{video_id}: {payload}', file=sys.stderr)
+                progress.add(status)
+    except KeyboardInterrupt:
+        # Finish the checkpoint even if the signal is repeated
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        print('Interrupted; checkpointing what has been written', file=sys.stderr)
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 130
+    finally:
+        writer.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+        progress.report(final=True)
+    return 1 if progress.counts[ERROR] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help='files with one video ID or URL per line ("-" or nothing for stdin)')
+    parser.add_argument('--output', '-o', required=True, help='directory for shards and the checkpoint')
+    parser.add_argument('--workers', type=int, default=4, help='worker processes')
+    parser.add_argument('--shard-size', type=int, default=1000, help='transcripts per shard')
+    parser.add_argument('--gzip', action='store_true', help='write .jsonl.gz shards')
+    parser.add_argument('--language', default='en')
+    parser.add_argument('--kind', default='any', choices=('any', 'manual', 'generated'))
+    parser.add_argument('--rate', type=float, default=float(os.environ.get('UPSTREAM_RATE', 5)),
+                        help='YouTube requests per second across all workers')
+    parser.add_argument('--attempts', type=int, default=3, help='tries per video within one run')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='fetch straight from YouTube instead of going through the transcript cache')
+    parser.add_argument('--report-every', type=float, default=10, help='seconds between progress reports')
+    parser.add_argument('--verbose', '-v', action='store_true', help='print each failed video')
+    args = parser.parse_args(argv)
+    # A plain kill checkpoints like Ctrl-C does
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
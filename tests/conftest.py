@@ -0,0 +1,44 @@
+"""Shared fixtures; the test run keeps its caches, indexes and queues out
+of the real cache directory"""
+import json
+import os
+import tempfile
+
+import pytest
+
+os.environ['TRANSCRIPT_CACHE_DIR'] = tempfile.mkdtemp(prefix='transcript-tests-')
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+
+
+def make_transcript(texts, video_id=VIDEO_ID, spacing=2.0):
+    """A CompactTranscript with one snippet per text, spacing seconds apart"""
+    from transcript_service.compact import CompactTranscript
+    return CompactTranscript(
+        video_id, 'English', 'en', False,
+        ((text, i * spacing, spacing) for i, text in enumerate(texts))
+    )
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Serve a transcript through the shared routes without any fetching
+
+    Returns get(path, args, headers) -> (status, headers, body), with a
+    JSON body decoded; install a transcript with get.transcript = ...
+    """
+    from transcript_service import routes
+
+    def get(path, args=None, headers=None):
+        request = routes.Request('GET', path, args or {}, headers or {})
+        status, response_headers, body = routes.render(routes.dispatch(request), request)
+        if not isinstance(body, bytes):
+            body = b''.join(body)
+        if body and response_headers.get('Content-Type') == 'application/json' \
+                and 'Content-Encoding' not in response_headers:
+            body = json.loads(body)
+        return status, response_headers, body
+
+    get.transcript = make_transcript([f'line {i}' for i in range(10)])
+    monkeypatch.setattr(routes, 'get_cached_transcript', lambda video_id, *args: get.transcript)
+    return get
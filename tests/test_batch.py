@@ -0,0 +1,52 @@
+"""Batch fetching: per-batch windows on the shared pool and the deadline"""
+import threading
+import time
+
+from conftest import make_transcript
+
+from transcript_service import batch
+
+
+def _video_ids(prefix, count):
+    return [f'{prefix}{i:010d}' for i in range(count)]
+
+
+def test_large_batch_does_not_starve_a_small_one(monkeypatch):
+    monkeypatch.setattr(batch, 'BATCH_PER_REQUEST', 2)
+    in_flight = {'big': 0, 'most': 0}
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def fetch(video_id):
+        if video_id.startswith('b'):
+            with lock:
+                in_flight['big'] += 1
+                in_flight['most'] = max(in_flight['most'], in_flight['big'])
+            release.wait(5)
+            with lock:
+                in_flight['big'] -= 1
+        return make_transcript(['hello'], video_id)
+
+    big = threading.Thread(target=batch.run_batch, args=(_video_ids('b', 20), lambda item: item, fetch))
+    big.start()
+    try:
+        time.sleep(0.05)
+        small = batch.run_batch(_video_ids('s', 3), lambda item: item, fetch, deadline=2)
+    finally:
+        release.set()
+        big.join()
+    assert len(small['results']) == 3 and not small['errors']
+    assert in_flight['most'] == 2
+
+
+def test_videos_left_at_the_deadline_time_out(monkeypatch):
+    monkeypatch.setattr(batch, 'BATCH_PER_REQUEST', 1)
+
+    def fetch(video_id):
+        time.sleep(0.2)
+        return make_transcript(['hello'], video_id)
+
+    outcome = batch.run_batch(_video_ids('t', 3), lambda item: item, fetch, deadline=0.1)
+    assert outcome['results'] == []
+    assert [error['video_id'] for error in outcome['errors']] == _video_ids('t', 3)
+    assert all('batch deadline' in error['error'] for error in outcome['errors'])
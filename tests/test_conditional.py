@@ -0,0 +1,50 @@
+"""ETags, conditional GET and compressed responses"""
+import gzip
+
+from conftest import VIDEO_ID, make_transcript
+from transcript_service.conditional import negotiate_encoding
+
+
+def test_matching_etag_gets_304(serve):
+    status, headers, body = serve('/transcript', {'video_id': VIDEO_ID})
+    etag = headers['ETag']
+    assert status == 200 and etag.startswith('W/"')
+    assert headers['Cache-Control'].startswith('public')
+
+    status, headers, body = serve('/transcript', {'video_id': VIDEO_ID}, {'If-None-Match': etag})
+    assert status == 304 and body == b''
+    assert headers['ETag'] == etag
+
+    # Weak comparison, and any of several candidates
+    status, _, _ = serve('/transcript', {'video_id': VIDEO_ID}, {'If-None-Match': f'"other", {etag[2:]}'})
+    assert status == 304
+
+
+def test_etag_follows_content_and_representation(serve):
+    _, headers, _ = serve('/transcript', {'video_id': VIDEO_ID})
+    etag = headers['ETag']
+    _, headers, _ = serve('/transcript', {'video_id': VIDEO_ID, 'format': 'srt'})
+    assert headers['ETag'] != etag
+    _, headers, _ = serve('/transcript', {'video_id': VIDEO_ID, 'limit': '2'})
+    assert headers['ETag'] != etag
+
+    serve.transcript = make_transcript(['a different line'])
+    status, headers, _ = serve('/transcript', {'video_id': VIDEO_ID}, {'If-None-Match': etag})
+    assert status == 200 and headers['ETag'] != etag
+
+
+def test_gzip_body_matches_identity(serve):
+    serve.transcript = make_transcript([f'a fairly long line of transcript text {i}' for i in range(200)])
+    _, _, plain = serve('/transcript', {'video_id': VIDEO_ID})
+    status, headers, body = serve('/transcript', {'video_id': VIDEO_ID}, {'Accept-Encoding': 'gzip'})
+    assert status == 200 and headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(body).decode().startswith('{"video_id": "%s"' % VIDEO_ID)
+    assert len(body) < len(gzip.decompress(body))
+    assert plain['total_entries'] == 200
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding('gzip;q=0, identity') is None
+    assert negotiate_encoding('deflate, gzip;q=0.5') == 'gzip'
+    assert negotiate_encoding('*;q=0.1') in ('br', 'gzip')
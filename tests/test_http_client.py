@@ -0,0 +1,58 @@
+"""Pooled sessions: default timeouts on calls that set none"""
+import socket
+import threading
+import time
+
+import pytest
+
+from transcript_service.egress import is_exit_failure
+from transcript_service.http_client import build_session
+
+
+@pytest.fixture
+def blackhole_proxy():
+    """A proxy that accepts connections and never answers"""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    accepted = []
+    stop = threading.Event()
+
+    def accept():
+        server.settimeout(0.1)
+        while not stop.is_set():
+            try:
+                accepted.append(server.accept()[0])
+            except socket.timeout:
+                pass
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % server.getsockname()[1]
+    stop.set()
+    thread.join()
+    for connection in accepted:
+        connection.close()
+    server.close()
+
+
+def test_library_call_through_silent_proxy_times_out(blackhole_proxy):
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    session = build_session(blackhole_proxy, timeout=(0.5, 0.5))
+    api = YouTubeTranscriptApi(http_client=session)
+    started = time.monotonic()
+    # The library passes no timeout of its own
+    with pytest.raises(Exception) as raised:
+        api.list('aaaaaaaaaaa')
+    assert time.monotonic() - started < 5
+    assert is_exit_failure(raised.value)
+
+
+def test_explicit_timeout_wins(blackhole_proxy):
+    session = build_session(blackhole_proxy, timeout=(30, 30))
+    started = time.monotonic()
+    with pytest.raises(Exception) as raised:
+        session.get('http://www.youtube.com/watch?v=aaaaaaaaaaa', timeout=0.3)
+    assert time.monotonic() - started < 5
+    assert is_exit_failure(raised.value)
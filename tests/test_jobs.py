@@ -0,0 +1,132 @@
+"""Prefetch job queue: leases, recovery, listings and completion"""
+import time
+
+import pytest
+
+from transcript_service.jobs import DONE, RUNNING, JobQueue, list_videos
+
+VIDEOS = ['aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc']
+
+
+def _queue(tmp_path, fetched, **kwargs):
+    kwargs.setdefault('delay', 0)
+    return JobQueue(fetched.append, path=str(tmp_path / 'jobs.sqlite3'), **kwargs)
+
+
+def _wait_for(queue, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = queue.status(job_id)
+        if result['status'] == status:
+            return result
+        time.sleep(0.01)
+    raise AssertionError(queue.status(job_id))
+
+
+def test_opening_the_queue_leaves_live_work_alone(tmp_path):
+    first = _queue(tmp_path, [])
+    job_id = first.submit([('video', video_id) for video_id in VIDEOS[:2]])
+    assert first._claim()[2] == VIDEOS[0]
+
+    # Another process opening the same file must not reset the item
+    # the first one is still fetching
+    second = _queue(tmp_path, [])
+    assert second._claim()[2] == VIDEOS[1]
+    assert second._claim() is None
+    assert second.status(job_id)['running'] == 2
+
+
+def test_expired_lease_is_reclaimed_once(tmp_path):
+    first = _queue(tmp_path, [], lease=0.05)
+    job_id = first.submit([('video', VIDEOS[0])])
+    first._claim()
+    time.sleep(0.1)
+
+    fetched = []
+    second = _queue(tmp_path, fetched)
+    assert second._fetch_next()
+    assert fetched == [VIDEOS[0]]
+    # The first worker coming back late does not overwrite the outcome
+    assert not first._update_item(job_id, 0, RUNNING, None)
+    status = second.status(job_id)
+    assert status['status'] == DONE and status['done'] == 1
+
+
+def test_workers_resume_a_crashed_queue(tmp_path):
+    crashed = _queue(tmp_path, [], lease=0.05)
+    job_id = crashed.submit([('video', video_id) for video_id in VIDEOS])
+    crashed._claim()
+    time.sleep(0.1)
+
+    fetched = []
+    queue = _queue(tmp_path, fetched, workers=2)
+    queue.start()
+    try:
+        status = _wait_for(queue, job_id, DONE)
+    finally:
+        queue.close()
+    assert sorted(fetched) == VIDEOS
+    assert status['done'] == 3 and status['failed'] == 0
+
+
+def test_close_waits_for_the_workers(tmp_path):
+    queue = _queue(tmp_path, [], workers=2)
+    queue.start()
+    assert not queue.wait(0.01)
+    queue.close(timeout=5)
+    assert queue.wait(0)
+    assert not any(thread.is_alive() for thread in queue._threads + [queue._lease_thread])
+
+
+def test_listing_errors_do_not_stop_other_sources(tmp_path):
+    def expand(kind, value):
+        if value == 'PLbroken000':
+            raise ValueError('YouTube answered 404 for playlist PLbroken000')
+        return VIDEOS[:2], False
+
+    fetched = []
+    queue = _queue(tmp_path, fetched, expand=expand)
+    job_id = queue.submit([('playlist', 'PLbroken000'), ('playlist', 'PLworking00')])
+    queue.start()
+    try:
+        status = _wait_for(queue, job_id, DONE)
+    finally:
+        queue.close()
+    assert sorted(fetched) == VIDEOS[:2]
+    assert status['source_errors'][0]['value'] == 'PLbroken000'
+    assert status['listings'] == [{'source': 'playlist', 'value': 'PLworking00', 'listed': 2, 'truncated': False}]
+
+
+@pytest.fixture
+def fake_youtube(monkeypatch):
+    import requests
+
+    from benchmarks.fake_youtube import FakeYouTube
+    from transcript_service import engine, http_client
+
+    fake = FakeYouTube(playlist_size=250).start()
+    session = requests.Session()
+    # Listing calls go straight to the fake, without the engine's pool
+    monkeypatch.setattr(http_client, 'YOUTUBE_ORIGIN', fake.base_url)
+    monkeypatch.setattr(engine, 'call_upstream', lambda method, key, func, *args: func(session, *args))
+    yield fake
+    fake.stop()
+
+
+def test_listing_follows_continuations(fake_youtube):
+    video_ids, truncated = list_videos('playlist', 'PLlongplaylist')
+    assert len(video_ids) == 250 and len(set(video_ids)) == 250
+    assert not truncated
+    assert fake_youtube.counters['listing'] == 3
+
+
+def test_listing_reports_truncation(fake_youtube, tmp_path):
+    video_ids, truncated = list_videos('playlist', 'PLlongplaylist', max_pages=2)
+    assert len(video_ids) == 200 and truncated
+
+    queue = _queue(tmp_path, [], expand=lambda kind, value: list_videos(kind, value, max_pages=2))
+    job_id = queue.submit([('playlist', 'PLlongplaylist')])
+    assert queue._expand_next()
+    status = queue.status(job_id)
+    assert status['total'] == 200 and status['truncated']
+    assert status['listings'][0]['listed'] == 200
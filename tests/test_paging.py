@@ -0,0 +1,66 @@
+"""Time ranges and cursor pagination"""
+import pytest
+
+from conftest import VIDEO_ID, make_transcript
+from transcript_service.paging import RangeError, apply_window, parse_window
+
+TRANSCRIPT = make_transcript([f'line {i}' for i in range(10)])
+
+
+def _pages(args):
+    """Follow next cursors from the first page; returns each page's starts"""
+    pages = []
+    cursor = None
+    while True:
+        page_args = dict(args, cursor=cursor) if cursor else args
+        page, cursor = apply_window(TRANSCRIPT, parse_window(page_args))
+        pages.append([snippet.start for snippet in page.snippets])
+        if cursor is None:
+            return pages
+
+
+def test_cursors_walk_every_snippet_once():
+    assert _pages({'limit': '3'}) == [[0, 2, 4], [6, 8, 10], [12, 14, 16], [18]]
+
+
+def test_cursors_stay_inside_the_time_range():
+    # Snippets starting at or after from and before to
+    assert _pages({'from': '5', 'to': '13', 'limit': '2'}) == [[6, 8], [10, 12]]
+
+
+def test_no_window_returns_the_whole_transcript():
+    assert parse_window({}) is None
+    assert apply_window(TRANSCRIPT, None) == (TRANSCRIPT, None)
+
+
+@pytest.mark.parametrize('args', [
+    {'cursor': 'not-a-cursor'},
+    {'limit': '0'},
+    {'limit': 'ten'},
+    {'from': '-1'},
+    {'from': 'soon'},
+    {'from': 'nan'},
+    {'to': 'inf'},
+    {'from': '-Infinity'},
+    {'from': '10', 'to': '5'},
+])
+def test_bad_window_is_rejected(args):
+    with pytest.raises(RangeError):
+        parse_window(args)
+
+
+def test_routes_report_next_cursor(serve):
+    status, _, body = serve('/transcript', {'video_id': VIDEO_ID, 'limit': '4'})
+    assert status == 200
+    assert [entry['text'] for entry in body['transcript']] == ['line 0', 'line 1', 'line 2', 'line 3']
+
+    status, _, body = serve('/transcript', {'video_id': VIDEO_ID, 'limit': '4', 'cursor': body['next_cursor']})
+    assert [entry['text'] for entry in body['transcript']] == ['line 4', 'line 5', 'line 6', 'line 7']
+
+    status, headers, body = serve('/transcript', {'video_id': VIDEO_ID, 'from': '2', 'format': 'text', 'limit': '2'})
+    assert status == 200 and headers['X-Next-Cursor']
+
+
+def test_routes_reject_bad_range(serve):
+    status, _, body = serve('/transcript', {'video_id': VIDEO_ID, 'cursor': '!!'})
+    assert status == 400 and body['error'] == 'Invalid cursor'
@@ -0,0 +1,56 @@
+"""Per-client quotas: only the request that goes upstream is charged"""
+import asyncio
+
+import pytest
+
+from transcript_service import engine, quota
+from transcript_service.quota import Client, QuotaExceeded
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Replace the upstream fetch with a slow fake that counts its calls"""
+    calls = []
+
+    async def fetch_with_fallback(video_id, language, kind, max_retries):
+        calls.append(video_id)
+        await asyncio.sleep(0.05)
+        return f'transcript of {video_id}'
+
+    monkeypatch.setattr(engine, 'fetch_with_fallback', fetch_with_fallback)
+    return calls
+
+
+async def _fetch_as(client, video_id):
+    quota._client.set(client)
+    return await engine.fetch_transcript(video_id)
+
+
+def test_coalesced_callers_cost_one_token(upstream):
+    client = Client('reports', 1, rate=0.001, burst=5)
+
+    async def scenario():
+        return await asyncio.gather(*(_fetch_as(client, 'aaaaaaaaaaa') for _ in range(10)))
+
+    results = asyncio.run(scenario())
+    assert results == ['transcript of aaaaaaaaaaa'] * 10
+    assert upstream == ['aaaaaaaaaaa']
+    stats = client.stats()
+    assert stats['fetches'] == 1 and stats['throttled'] == 0
+    assert round(stats['tokens']) == 4
+
+
+def test_caller_outlives_a_refused_leader(upstream):
+    broke = Client('broke', 1, rate=0.001, burst=0.5)
+    funded = Client('funded', 1, rate=0.001, burst=5)
+
+    async def scenario():
+        return await asyncio.gather(
+            _fetch_as(broke, 'bbbbbbbbbbb'), _fetch_as(funded, 'bbbbbbbbbbb'), return_exceptions=True
+        )
+
+    refused, served = asyncio.run(scenario())
+    assert isinstance(refused, QuotaExceeded) and refused.client == 'broke'
+    assert served == 'transcript of bbbbbbbbbbb'
+    assert upstream == ['bbbbbbbbbbb']
+    assert funded.stats()['fetches'] == 1
@@ -0,0 +1,49 @@
+"""Fetch retries: an explicit count is honoured and never means zero attempts"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from transcript_service import engine, routes
+
+
+class _Pool:
+    def __len__(self):
+        return 1
+
+    def pick(self, video_id, avoid=()):
+        return SimpleNamespace(api=SimpleNamespace(list=None))
+
+
+@pytest.fixture
+def failing_upstream(monkeypatch):
+    """Every upstream call fails with a non-retryable error"""
+    calls = []
+
+    async def upstream(method, egress, func, *args, cost=1):
+        calls.append(method)
+        raise ValueError('upstream said no')
+
+    monkeypatch.setattr(engine, 'get_pool', _Pool)
+    monkeypatch.setattr(engine, '_upstream', upstream)
+    monkeypatch.setattr(engine.track_lists, 'lookup', lambda video_id: None)
+    return calls
+
+
+def test_zero_retries_still_makes_one_attempt(failing_upstream):
+    with pytest.raises(ValueError):
+        asyncio.run(engine.fetch_with_plan('aaaaaaaaaaa', max_retries=0))
+    assert failing_upstream == ['track_list']
+
+
+def test_explicit_zero_is_passed_through(monkeypatch):
+    seen = []
+
+    async def fetch_transcript(video_id, language, kind, max_retries):
+        seen.append(max_retries)
+        return 'transcript'
+
+    monkeypatch.setattr(engine, 'fetch_transcript', fetch_transcript)
+    assert routes.get_transcript_with_free_methods('aaaaaaaaaaa', max_retries=0) == 'transcript'
+    routes.get_transcript_with_free_methods('aaaaaaaaaaa')
+    assert seen == [0, engine.FETCH_MAX_RETRIES]
@@ -0,0 +1,64 @@
+"""Fair scheduler: weighted round-robin admission of queued fetches"""
+import asyncio
+
+import pytest
+
+from transcript_service.scheduler import FairScheduler
+
+
+def test_scheduler_weighted_round_robin_order():
+    async def scenario():
+        scheduler = FairScheduler(slots=1)
+        order = []
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+
+        async def job(client):
+            order.append(client)
+
+        holder = asyncio.create_task(scheduler.run('holder', 1, hold))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(scheduler.run('heavy', 3, lambda: job('heavy'))) for _ in range(4)]
+        waiters += [asyncio.create_task(scheduler.run('light', 1, lambda: job('light'))) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.stats()['waiting'] == 6
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return scheduler, order
+
+    scheduler, order = asyncio.run(scenario())
+    assert order == ['heavy', 'heavy', 'light', 'heavy', 'heavy', 'light']
+    stats = scheduler.stats()
+    assert stats['active'] == 0 and stats['waiting'] == 0
+    assert stats['clients']['heavy'] == {'admitted': 4, 'waiting': 0}
+
+
+def test_scheduler_skips_cancelled_waiter():
+    async def scenario():
+        scheduler = FairScheduler(slots=1)
+        order = []
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+
+        async def job(client):
+            order.append(client)
+
+        holder = asyncio.create_task(scheduler.run('holder', 1, hold))
+        await asyncio.sleep(0)
+        gone = asyncio.create_task(scheduler.run('gone', 1, lambda: job('gone')))
+        kept = asyncio.create_task(scheduler.run('kept', 1, lambda: job('kept')))
+        await asyncio.sleep(0)
+        gone.cancel()
+        release.set()
+        await asyncio.gather(holder, kept)
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+        return scheduler, order
+
+    scheduler, order = asyncio.run(scenario())
+    assert order == ['kept']
+    assert scheduler.stats()['active'] == 0
@@ -0,0 +1,54 @@
+"""Full-text search: words, phrases and phrases across snippets"""
+import pytest
+
+from conftest import make_transcript
+from transcript_service.search import SearchError, SearchIndex, parse_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(path=str(tmp_path / 'search.sqlite3'))
+    index.add(make_transcript(
+        ['Never gonna give you up', 'never gonna let you down', 'Never gonna run around'],
+        video_id='aaaaaaaaaaa'
+    ))
+    index.add(make_transcript(['you give up on the run', 'gonna be fine'], video_id='bbbbbbbbbbb'))
+    return index
+
+
+def _hits(index, query, video_id=None):
+    return sorted((hit['video_id'], hit['start']) for hit in index.search(parse_query(query), video_id))
+
+
+def test_words_match_in_any_order(index):
+    assert _hits(index, 'up give') == [('aaaaaaaaaaa', 0.0), ('bbbbbbbbbbb', 0.0)]
+
+
+def test_phrase_needs_consecutive_words(index):
+    assert _hits(index, '"give you up"') == [('aaaaaaaaaaa', 0.0)]
+    assert _hits(index, '"you give"') == [('bbbbbbbbbbb', 0.0)]
+    assert _hits(index, '"up give"') == []
+
+
+def test_phrase_spanning_snippets_is_reported_where_it_starts(index):
+    # "...give you up" | "never gonna let..."
+    assert _hits(index, '"up never gonna"') == [('aaaaaaaaaaa', 0.0)]
+
+
+def test_phrase_and_word_together(index):
+    assert _hits(index, '"never gonna" run') == [('aaaaaaaaaaa', 4.0)]
+
+
+def test_search_one_video(index):
+    assert _hits(index, 'gonna', video_id='bbbbbbbbbbb') == [('bbbbbbbbbbb', 2.0)]
+
+
+def test_reindexing_replaces_the_old_text(index):
+    index.add(make_transcript(['something else entirely'], video_id='aaaaaaaaaaa'))
+    assert _hits(index, '"give you up"') == []
+    assert _hits(index, 'entirely') == [('aaaaaaaaaaa', 0.0)]
+
+
+def test_query_needs_a_word():
+    with pytest.raises(SearchError):
+        parse_query(' "" !! ')
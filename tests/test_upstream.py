@@ -0,0 +1,101 @@
+"""Upstream protection: circuit breaker state changes"""
+import pytest
+
+from transcript_service import upstream
+from transcript_service.upstream import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, UpstreamUnavailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream.time, 'monotonic', clock)
+    return clock
+
+
+def _call(breaker, blocked):
+    breaker.after_call(breaker.before_call(), blocked)
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=10, max_open_seconds=60)
+    _call(breaker, True)
+    _call(breaker, True)
+    assert breaker.state == CLOSED
+    _call(breaker, True)
+    assert breaker.state == OPEN
+    with pytest.raises(UpstreamUnavailable) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == 10
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=10)
+    _call(breaker, True)
+    _call(breaker, False)
+    _call(breaker, True)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_probe_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=10, half_open_probes=1)
+    _call(breaker, True)
+    clock.now += 10
+    generation = breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+    breaker.after_call(generation, False)
+    assert breaker.state == CLOSED
+    _call(breaker, False)
+
+
+def test_breaker_failed_probe_doubles_open_time(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=10, max_open_seconds=25)
+    _call(breaker, True)
+    clock.now += 10
+    _call(breaker, True)
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == 20
+    clock.now += 20
+    _call(breaker, True)
+    # Capped at max_open_seconds
+    assert breaker.retry_after() == 25
+
+
+def test_breaker_unfinished_probe_frees_its_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=10)
+    _call(breaker, True)
+    clock.now += 10
+    _call(breaker, None)
+    assert breaker.state == HALF_OPEN
+    _call(breaker, False)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_ignores_calls_from_an_earlier_state(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=10, half_open_probes=1)
+    slow = breaker.before_call()
+    _call(breaker, True)
+    assert breaker.state == OPEN
+    # A success admitted while closed does not close an open breaker
+    breaker.after_call(slow, False)
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    probe = breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Nor does it free the probe slot when it finishes during half-open
+    breaker.after_call(slow, None)
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+    breaker.after_call(probe, False)
+    assert breaker.state == CLOSED
@@ -0,0 +1,58 @@
+"""Watch page route: the streaming caption track scanner"""
+import json
+
+from transcript_service.watchpage import CaptionTrackScanner
+
+TRACKS = [
+    {
+        'baseUrl': 'https://www.youtube.com/api/timedtext?v=abc&lang=es&x="]\\"[',
+        'name': {'simpleText': 'Español ✓ [auto] ]'},
+        'languageCode': 'es',
+    },
+    {'baseUrl': 'https://www.youtube.com/api/timedtext?v=abc&lang=en', 'languageCode': 'en', 'kind': 'asr'},
+]
+
+
+def _page(player):
+    return (
+        '<html><head><title>Vidéo — ★</title></head><body>'
+        '<script>var ytInitialPlayerResponse = ' + json.dumps(player, ensure_ascii=False) + ';</script>'
+        '<div>' + 'filler ' * 50 + '</div></body></html>'
+    ).encode()
+
+
+def _feed(page, cuts):
+    scanner = CaptionTrackScanner()
+    done = False
+    for start, end in zip((0,) + cuts, cuts + (len(page),)):
+        done = scanner.feed(page[start:end])
+        if done:
+            break
+    return done, scanner
+
+
+def test_scanner_finds_tracks_across_any_split():
+    page = _page({'captions': {'playerCaptionsTracklistRenderer': {'captionTracks': TRACKS}}})
+    for cut in range(1, len(page)):
+        done, scanner = _feed(page, (cut,))
+        assert done and scanner.tracks == TRACKS, cut
+
+
+def test_scanner_finds_tracks_byte_by_byte():
+    page = _page({'captions': {'playerCaptionsTracklistRenderer': {'captionTracks': TRACKS}}})
+    done, scanner = _feed(page, tuple(range(1, len(page))))
+    assert done and scanner.tracks == TRACKS
+
+
+def test_scanner_player_without_captions():
+    page = _page({'videoDetails': {'title': 'no "captionTracks" here'}})
+    for cut in range(1, len(page)):
+        done, scanner = _feed(page, (cut,))
+        assert done and scanner.tracks == [], cut
+
+
+def test_scanner_bot_check_page():
+    page = b'<html><form><div class="g-recaptcha" data-sitekey="x"></div></form></html>'
+    for cut in range(1, len(page)):
+        done, scanner = _feed(page, (cut,))
+        assert done and scanner.blocked and scanner.tracks is None, cut
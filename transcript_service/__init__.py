@@ -0,0 +1 @@
+"""Shared building blocks for the YouTube Transcript API entry points"""
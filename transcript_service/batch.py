@@ -0,0 +1,135 @@
+"""Concurrent fetching for the batch transcript endpoint"""
+import contextvars
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .formatters import snippet_dicts
+from .metrics import count_upstream_requests
+
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 8))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 500))
+BATCH_DEADLINE = float(os.environ.get('BATCH_DEADLINE', 25))
+BATCH_PER_REQUEST = max(int(os.environ.get('BATCH_PER_REQUEST', 4)), 1)
+
+# One process-wide pool bounds upstream concurrency across all batches.
+# Each batch keeps at most BATCH_PER_REQUEST videos in it at a time, so a
+# large batch cannot queue ahead of every other request's videos. When a
+# batch misses its deadline, its queued videos are cancelled and the rest
+# are never submitted; fetches already running finish and still fill the
+# cache, they just are not waited for.
+_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='batch')
+
+
+class BatchError(ValueError):
+    """Raised for a malformed batch request"""
+
+
+def parse_batch_request(payload):
+    """Pull the list of video IDs/URLs out of a batch request body"""
+    if isinstance(payload, dict):
+        items = payload.get('video_ids')
+    else:
+        items = payload
+    if not isinstance(items, list) or not items:
+        raise BatchError('Body must be a JSON object with a non-empty "video_ids" list')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise BatchError(f'Too many videos in one batch (max {BATCH_MAX_ITEMS})')
+    if not all(isinstance(item, str) for item in items):
+        raise BatchError('Every entry in "video_ids" must be a string')
+    return items
+
+
+def _fetch_one(video_id, fetch):
+    upstream = count_upstream_requests()
+    transcript = fetch(video_id)
+    formatted_transcript = snippet_dicts(transcript.snippets)
+    return {
+        'video_id': video_id,
+        'transcript': formatted_transcript,
+        'total_entries': len(formatted_transcript),
+        'upstream_requests': upstream.count
+    }
+
+
+def _error_entry(item, video_id, error):
+    entry = {
+        'input': item,
+        'video_id': video_id,
+        'error': f'Failed to get transcript: {str(error)}'
+    }
+    # Quota and circuit breaker refusals say when to try again, as the
+    # single-video endpoints do with their status and Retry-After
+    from .quota import QuotaExceeded
+    from .upstream import UpstreamUnavailable
+    if isinstance(error, QuotaExceeded):
+        entry.update(status=429, retry_after=error.retry_after)
+    elif isinstance(error, UpstreamUnavailable):
+        entry.update(status=503, retry_after=error.retry_after)
+    return entry
+
+
+def run_batch(items, extract_video_id, fetch, deadline=BATCH_DEADLINE):
+    """Fetch transcripts for many videos in parallel under one deadline"""
+    started = time.monotonic()
+    results = []
+    errors = []
+
+    # Normalize and dedupe, keeping the first input seen for each video
+    pending = {}
+    for item in items:
+        video_id = extract_video_id(item.strip())
+        if not video_id:
+            errors.append({'input': item, 'error': 'Invalid YouTube URL or video ID'})
+        elif video_id not in pending:
+            pending[video_id] = item
+
+    # Submit through a window: the next video goes in as one finishes.
+    # Pool threads do not inherit the request's context; each fetch gets a
+    # copy so it is charged to the requesting API client
+    waiting = iter(pending)
+    futures = {}
+    running = set()
+    ends = time.monotonic() + deadline
+    while True:
+        remaining = ends - time.monotonic()
+        if remaining <= 0:
+            break
+        while len(running) < BATCH_PER_REQUEST:
+            video_id = next(waiting, None)
+            if video_id is None:
+                break
+            future = _executor.submit(contextvars.copy_context().run, _fetch_one, video_id, fetch)
+            futures[video_id] = future
+            running.add(future)
+        if not running:
+            break
+        _, running = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+
+    for video_id, item in pending.items():
+        future = futures.get(video_id)
+        if future is None or future in running:
+            if future is not None:
+                # Only succeeds for videos that have not started
+                future.cancel()
+            errors.append({
+                'input': item,
+                'video_id': video_id,
+                'error': f'Timed out after the {deadline:g}s batch deadline'
+            })
+            continue
+        try:
+            result = future.result()
+        except Exception as e:
+            errors.append(_error_entry(item, video_id, e))
+        else:
+            result['input'] = item
+            results.append(result)
+
+    return {
+        'results': results,
+        'errors': errors,
+        'total_requested': len(items),
+        'unique_videos': len(pending),
+        'elapsed_seconds': round(time.monotonic() - started, 3)
+    }
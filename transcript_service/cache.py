@@ -0,0 +1,309 @@
+"""Tiered transcript cache: a bounded in-process LRU in front of a SQLite store
+
+Transcripts past their TTL are still served for up to
+``TRANSCRIPT_CACHE_STALE_TTL`` seconds (stale-while-revalidate) while the
+refresher fetches them again in the background; ``watch_freshness`` lets
+a request find out that it was answered from a stale entry.
+"""
+import contextvars
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from .compact import CompactTranscript
+from .refresh import Refresher
+
+CACHE_DIR = os.environ.get(
+    'TRANSCRIPT_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'youtube-transcript-cache')
+)
+CACHE_TTL = int(os.environ.get('TRANSCRIPT_CACHE_TTL', 24 * 60 * 60))
+NEGATIVE_CACHE_TTL = int(os.environ.get('TRANSCRIPT_CACHE_NEGATIVE_TTL', 15 * 60))
+CACHE_MAX_ENTRIES = int(os.environ.get('TRANSCRIPT_CACHE_MAX_ENTRIES', 256))
+# How long past its TTL a transcript may be served while it is refreshed;
+# 0 turns stale-while-revalidate off
+STALE_TTL = int(os.environ.get('TRANSCRIPT_CACHE_STALE_TTL', 7 * 24 * 60 * 60))
+
+
+# Purge expired rows from the disk store every N writes
+PURGE_INTERVAL = 100
+
+
+_freshness = contextvars.ContextVar('transcript_freshness', default=None)
+
+
+class TranscriptUnavailable(Exception):
+    """Raised when a cached negative result is served"""
+
+
+class Freshness:
+    """Whether the transcript served in this context came from a stale entry"""
+    __slots__ = ('stale_for',)
+
+    def __init__(self):
+        # Seconds past the entry's TTL, or None when it was fresh
+        self.stale_for = None
+
+    @property
+    def stale(self):
+        return self.stale_for is not None
+
+
+def watch_freshness():
+    """Start recording the freshness of transcripts served in the current context"""
+    freshness = Freshness()
+    _freshness.set(freshness)
+    return freshness
+
+
+def is_negative(error):
+    """Whether error means "this video has no usable transcript" rather than
+    "we could not reach YouTube"; only these are cached as negative results
+    """
+    # Imported here so reading the cache never loads the YouTube client
+    from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+    return isinstance(error, (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable))
+
+
+def make_key(video_id, language='en', kind='any'):
+    """Build the cache key for a video, language preference and transcript kind"""
+    return f'{video_id}:{language}:{kind}'
+
+
+class _Entry:
+    __slots__ = ('value', 'error', 'expires_at')
+
+    def __init__(self, value, error, expires_at):
+        self.value = value
+        self.error = error
+        self.expires_at = expires_at
+
+    def unwrap(self):
+        if self.error is not None:
+            raise TranscriptUnavailable(self.error)
+        return self.value
+
+
+class TranscriptCache:
+    """In-memory LRU with TTL, backed by a compressed on-disk store"""
+
+    def __init__(self, path=None, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL,
+                 negative_ttl=NEGATIVE_CACHE_TTL, stale_ttl=STALE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._refresher = Refresher() if stale_ttl > 0 else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'negative_hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+        self._db = self._open_store(path or os.path.join(CACHE_DIR, 'transcripts.sqlite3'))
+
+    def _open_store(self, path):
+        # The disk tier is best effort: read-only filesystems (e.g. serverless
+        # bundles) just run with the memory tier
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS transcripts ('
+                'key TEXT PRIMARY KEY, payload BLOB, error TEXT, expires_at REAL)'
+            )
+            return db
+        except (sqlite3.Error, OSError):
+            return None
+
+    def _servable(self, entry, now):
+        # Fresh, or a transcript still inside its stale window; "no
+        # transcript" results are never served stale
+        if entry.expires_at > now:
+            return True
+        return entry.error is None and entry.expires_at + self.stale_ttl > now
+
+    def get(self, key):
+        """Return a fresh or stale cache entry for key, or None on a miss"""
+        now = time.time()
+        if self._refresher is not None:
+            self._refresher.touch(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._servable(entry, now):
+                    self._entries.move_to_end(key)
+                    self._count_hit('memory_hits', entry, now)
+                    return entry
+                del self._entries[key]
+                self._stats['expirations'] += 1
+
+            entry = self._load(key, now)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._count_hit('disk_hits', entry, now)
+            self._remember(key, entry)
+            return entry
+
+    def set(self, key, transcript):
+        """Store a fetched CompactTranscript"""
+        entry = _Entry(transcript, None, time.time() + self.ttl)
+        payload = zlib.compress(transcript.to_bytes())
+        self._put(key, entry, payload)
+
+    def set_negative(self, key, error):
+        """Store a "no transcript" result with the shorter negative TTL"""
+        entry = _Entry(None, str(error), time.time() + self.negative_ttl)
+        self._put(key, entry, None)
+
+    def _revalidate(self, key, entry, fetch):
+        # A stale entry is served as is; the refresh runs in the background
+        stale_for = time.time() - entry.expires_at
+        if stale_for < 0:
+            return
+        freshness = _freshness.get()
+        if freshness is not None:
+            freshness.stale_for = stale_for
+        self._refresher.schedule(key, lambda: self._refresh(key, fetch))
+
+    def _refresh(self, key, fetch):
+        try:
+            transcript = fetch()
+        except Exception as e:
+            # Captions can be taken down after upload
+            if is_negative(e):
+                self.set_negative(key, e)
+                return
+            raise
+        self.set(key, transcript)
+
+    def get_or_fetch(self, key, fetch):
+        """Return the cached transcript for key, calling fetch() on a miss
+
+        A stale entry is returned at once and fetch() is scheduled on the
+        background refresher instead.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self._revalidate(key, entry, fetch)
+            return entry.unwrap()
+        try:
+            transcript = fetch()
+        except Exception as e:
+            if is_negative(e):
+                self.set_negative(key, e)
+            raise
+        self.set(key, transcript)
+        return transcript
+
+    async def aget_or_fetch(self, key, fetch):
+        """Async variant of get_or_fetch for a coroutine-returning fetch()
+
+        Lookups and stores run on a worker thread: they take the cache lock
+        and may read, decompress, compress and write SQLite rows, none of
+        which may hold up the caller's event loop.
+        """
+        import asyncio
+
+        entry = await asyncio.to_thread(self.get, key)
+        if entry is not None:
+            # Refresher threads run the coroutine on a loop of their own
+            self._revalidate(key, entry, lambda: _run_coroutine(fetch()))
+            return entry.unwrap()
+        try:
+            transcript = await fetch()
+        except Exception as e:
+            if is_negative(e):
+                await asyncio.to_thread(self.set_negative, key, e)
+            raise
+        await asyncio.to_thread(self.set, key, transcript)
+        return transcript
+
+    def stats(self):
+        """Return hit/miss/eviction counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+        stats['disk_enabled'] = self._db is not None
+        if self._refresher is not None:
+            stats['refresh'] = self._refresher.stats()
+        return stats
+
+    def _count_hit(self, tier, entry, now):
+        self._stats[tier] += 1
+        if entry.error is not None:
+            self._stats['negative_hits'] += 1
+        elif entry.expires_at <= now:
+            self._stats['stale_hits'] += 1
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _put(self, key, entry, payload):
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?)',
+                    (key, payload, entry.error, entry.expires_at)
+                )
+                self._writes += 1
+                if self._writes % PURGE_INTERVAL == 0:
+                    now = time.time()
+                    cursor = self._db.execute(
+                        'DELETE FROM transcripts WHERE expires_at <= ? '
+                        'AND (error IS NOT NULL OR expires_at <= ?)',
+                        (now, now - self.stale_ttl)
+                    )
+                    self._stats['expirations'] += cursor.rowcount
+            except sqlite3.Error:
+                pass
+
+    def _load(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                'SELECT payload, error, expires_at FROM transcripts WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        payload, error, expires_at = row
+        if expires_at <= now and (error is not None or expires_at + self.stale_ttl <= now):
+            self._stats['expirations'] += 1
+            return None
+        value = None
+        if payload is not None:
+            try:
+                value = CompactTranscript.from_bytes(zlib.decompress(payload))
+            except (zlib.error, struct.error, ValueError, KeyError):
+                # Unreadable or older-format row: treat as a miss
+                return None
+        return _Entry(value, error, expires_at)
+
+
+def _run_coroutine(coro):
+    import asyncio
+    return asyncio.run(coro)
@@ -0,0 +1,203 @@
+"""Compact in-memory transcript representation
+
+Starts and durations live in ``array('d')`` columns and all snippet text
+in one UTF-8 buffer addressed by an ``array('I')`` of offsets, so a
+transcript costs a handful of objects instead of one object (or dict) per
+snippet. ``snippets`` is a read-only view yielding lightweight
+``Snippet`` tuples with the same ``text``/``start``/``duration``
+attributes as the library's snippet objects.
+
+Snippets are kept ordered by start time, so the ``starts`` column doubles
+as the start-time index: a time window is two binary searches, and a
+slice is a zero-copy view over the same columns.
+"""
+import bisect
+import hashlib
+import json
+import struct
+from array import array
+from collections import namedtuple
+
+Snippet = namedtuple('Snippet', 'text start duration')
+
+_HEADER = struct.Struct('<I')
+
+
+class SnippetView:
+    """Sequence view over a range of the snippets of a CompactTranscript"""
+    __slots__ = ('_transcript', '_lo', '_hi')
+
+    def __init__(self, transcript, lo=0, hi=None):
+        self._transcript = transcript
+        self._lo = lo
+        self._hi = len(transcript.starts) if hi is None else hi
+
+    def __len__(self):
+        return self._hi - self._lo
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('snippet index out of range')
+        transcript = self._transcript
+        index += self._lo
+        return Snippet(transcript.text(index), transcript.starts[index], transcript.durations[index])
+
+    def __iter__(self):
+        transcript = self._transcript
+        buffer = transcript._buffer
+        offsets = transcript._offsets
+        starts = transcript.starts
+        durations = transcript.durations
+        for index in range(self._lo, self._hi):
+            text = buffer[offsets[index]:offsets[index + 1]].decode()
+            yield Snippet(text, starts[index], durations[index])
+
+
+class TranscriptSlice:
+    """A contiguous range of a CompactTranscript, sharing its columns"""
+    __slots__ = ('transcript', 'lo', 'hi')
+
+    def __init__(self, transcript, lo, hi):
+        self.transcript = transcript
+        self.lo = lo
+        self.hi = hi
+
+    def __getattr__(self, name):
+        # Metadata (video_id, language, ...) comes from the full transcript
+        return getattr(self.transcript, name)
+
+    @property
+    def snippets(self):
+        return SnippetView(self.transcript, self.lo, self.hi)
+
+    def __len__(self):
+        return self.hi - self.lo
+
+
+class CompactTranscript:
+    """A fetched transcript stored as columns"""
+    __slots__ = (
+        'video_id', 'language', 'language_code', 'is_generated',
+        'starts', 'durations', '_buffer', '_offsets', '_digest', 'encoded'
+    )
+
+    def __init__(self, video_id, language, language_code, is_generated, snippets=()):
+        self.video_id = video_id
+        self.language = language
+        self.language_code = language_code
+        self.is_generated = is_generated
+        self._digest = None
+        # Serialized/compressed response bodies, keyed by (ETag, encoding)
+        self.encoded = None
+        self.starts = array('d')
+        self.durations = array('d')
+        self._offsets = array('I', [0])
+        parts = []
+        position = 0
+        for text, start, duration in snippets:
+            encoded = text.encode()
+            parts.append(encoded)
+            position += len(encoded)
+            self._offsets.append(position)
+            self.starts.append(start)
+            self.durations.append(duration)
+        self._buffer = b''.join(parts)
+
+        starts = self.starts
+        if any(starts[i] > starts[i + 1] for i in range(len(starts) - 1)):
+            self._sort_by_start()
+
+    def _sort_by_start(self):
+        # Rare: YouTube tracks are practically always in order already
+        order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+        parts = [self._buffer[self._offsets[i]:self._offsets[i + 1]] for i in order]
+        self.starts = array('d', (self.starts[i] for i in order))
+        self.durations = array('d', (self.durations[i] for i in order))
+        self._offsets = array('I', [0])
+        position = 0
+        for part in parts:
+            position += len(part)
+            self._offsets.append(position)
+        self._buffer = b''.join(parts)
+
+    @classmethod
+    def from_fetched(cls, fetched):
+        """Build from the library's FetchedTranscript"""
+        return cls(
+            fetched.video_id,
+            fetched.language,
+            fetched.language_code,
+            fetched.is_generated,
+            ((snippet.text, snippet.start, snippet.duration) for snippet in fetched.snippets)
+        )
+
+    @property
+    def snippets(self):
+        return SnippetView(self)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def text(self, index):
+        """Text of one snippet"""
+        return self._buffer[self._offsets[index]:self._offsets[index + 1]].decode()
+
+    def content_hash(self):
+        """Digest of the transcript's metadata and snippets, computed once"""
+        if self._digest is None:
+            self._digest = hashlib.blake2b(self.to_bytes(), digest_size=16).digest()
+        return self._digest
+
+    def window(self, start=None, end=None):
+        """Index range [lo, hi) of the snippets starting within [start, end)
+
+        Two binary searches over the start-time column: O(log n).
+        """
+        lo = 0 if start is None else bisect.bisect_left(self.starts, start)
+        hi = len(self.starts) if end is None else bisect.bisect_left(self.starts, end)
+        return lo, max(lo, hi)
+
+    def slice(self, lo, hi):
+        """Zero-copy view of snippets [lo, hi)"""
+        return TranscriptSlice(self, lo, hi)
+
+    def to_bytes(self):
+        """Serialize to a compact binary blob (native byte order)"""
+        header = json.dumps({
+            'video_id': self.video_id,
+            'language': self.language,
+            'language_code': self.language_code,
+            'is_generated': self.is_generated,
+            'count': len(self.starts)
+        }).encode()
+        return b''.join([
+            _HEADER.pack(len(header)), header,
+            self.starts.tobytes(), self.durations.tobytes(), self._offsets.tobytes(),
+            self._buffer
+        ])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild from to_bytes() output"""
+        view = memoryview(data)
+        (header_length,) = _HEADER.unpack_from(view)
+        position = _HEADER.size
+        header = json.loads(bytes(view[position:position + header_length]))
+        position += header_length
+
+        transcript = cls(
+            header['video_id'], header['language'], header['language_code'], header['is_generated']
+        )
+        count = header['count']
+        for column, length in (('starts', count), ('durations', count), ('_offsets', count + 1)):
+            values = array('d' if column != '_offsets' else 'I')
+            size = length * values.itemsize
+            values.frombytes(view[position:position + size])
+            position += size
+            setattr(transcript, column, values)
+        transcript._buffer = bytes(view[position:])
+        return transcript
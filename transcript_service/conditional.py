@@ -0,0 +1,208 @@
+"""Conditional GET, Cache-Control and response compression
+
+A transcript response's ETag is derived from the transcript's content hash
+and the representation asked for (path, query and negotiated format), so it
+stays the same across requests and server instances for as long as the
+transcript does. ``If-None-Match`` then short-circuits to a 304 before
+anything is serialized.
+
+Bodies are compressed with gzip, or brotli when the optional ``brotli``
+package is installed, as negotiated from ``Accept-Encoding``. Compressed
+transcript bodies are kept on the cached transcript itself, up to
+``ENCODED_BYTES_PER_TRANSCRIPT``, so a repeat hit neither re-serializes
+nor re-compresses. Identity bodies are not kept: they are as large as
+the JSON itself and would undo the compact transcript's savings.
+
+A transcript served stale from the cache (while it is refreshed in the
+background) is marked ``X-Cache-Status: stale``, with ``X-Stale-For``
+giving the seconds past its TTL, and sent with ``max-age=0``, so
+downstream caches revalidate instead of keeping it.
+"""
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 3600))
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+# Bytes of compressed bodies remembered per transcript (pages, formats
+# and encodings together)
+ENCODED_BYTES_PER_TRANSCRIPT = int(os.environ.get('ENCODED_BYTES_PER_TRANSCRIPT', 256 * 1024))
+
+JSON_MIMETYPE = 'application/json'
+
+_brotli = False
+# Guards every transcript's remembered bodies; held only for dict updates
+_encoded_lock = threading.Lock()
+
+
+class EncodedBody:
+    """A response body that is already serialized, and possibly compressed"""
+    __slots__ = ('body', 'content_type', 'encoding')
+
+    def __init__(self, body, content_type=JSON_MIMETYPE, encoding=None):
+        self.body = body
+        self.content_type = content_type
+        self.encoding = encoding
+
+
+def _load_brotli():
+    # Optional dependency, looked up once on first negotiation
+    global _brotli
+    if _brotli is False:
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        _brotli = brotli
+    return _brotli
+
+
+def transcript_etag(transcript, request, representation):
+    """Weak ETag for one representation of a transcript
+
+    Weak because the JSON body also reports how many upstream requests the
+    response took, which differs between a cache miss and a hit.
+    """
+    variant = repr((request.path, representation, sorted(request.args.items()))).encode()
+    digest = hashlib.blake2b(transcript.content_hash() + variant, digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def cache_headers(etag, stale_for=None, private=False):
+    """Validator and freshness headers for a cacheable response
+
+    stale_for is how many seconds past its TTL the transcript is, when it
+    was served stale. private keeps shared caches (CDNs, proxies) from
+    storing a response that was only served to an API key holder.
+    """
+    scope = 'private' if private else 'public'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'{scope}, max-age={HTTP_CACHE_MAX_AGE}',
+        'Vary': 'Accept, Accept-Encoding'
+    }
+    if stale_for is not None:
+        headers['Cache-Control'] = f'{scope}, max-age=0'
+        headers['X-Cache-Status'] = 'stale'
+        # Not Age: HTTP caches read that as time since the origin made
+        # the response and would compute freshness from it
+        headers['X-Stale-For'] = str(int(stale_for))
+    return headers
+
+
+def is_not_modified(request, etag):
+    """Whether the request's If-None-Match matches etag (weak comparison)"""
+    header = request.header('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified_response(etag, stale_for=None, private=False):
+    return None, 304, cache_headers(etag, stale_for, private)
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick br, gzip or None (identity) from an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding] = weight
+
+    default = weights.get('*', 0.0)
+    best = None
+    best_weight = 0.0
+    # Server preference breaks ties: brotli compresses text better than gzip
+    for coding in ('br', 'gzip'):
+        if coding == 'br' and _load_brotli() is None:
+            continue
+        weight = weights.get(coding, default)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return _load_brotli().compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    return body
+
+
+def compress_chunks(chunks, encoding):
+    """Compress a streamed body chunk by chunk, flushing after each chunk
+    so clients still receive snippets as they are produced
+    """
+    if encoding == 'br':
+        compressor = _load_brotli().Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def encode(body, encoding):
+    """EncodedBody for serialized bytes, compressed when worth it"""
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        return EncodedBody(compress(body, encoding), encoding=encoding)
+    return EncodedBody(body)
+
+
+def cached_body(transcript, etag, encoding):
+    """The EncodedBody remembered for this ETag and encoding, if any"""
+    with _encoded_lock:
+        bodies = transcript.encoded
+        if bodies is None:
+            return None
+        return bodies.get((etag, encoding))
+
+
+def encode_and_remember(transcript, etag, encoding, data):
+    """Serialize and compress data, remembering the result on the transcript
+    when it was compressed and fits the per-transcript byte budget
+    """
+    body = encode(json.dumps(data).encode(), encoding)
+    size = len(body.body)
+    if body.encoding is None or size > ENCODED_BYTES_PER_TRANSCRIPT:
+        return body
+    with _encoded_lock:
+        bodies = transcript.encoded
+        if bodies is None:
+            bodies = transcript.encoded = {}
+        bodies.pop((etag, encoding), None)
+        total = sum(len(kept.body) for kept in bodies.values())
+        # Oldest first
+        while bodies and total + size > ENCODED_BYTES_PER_TRANSCRIPT:
+            total -= len(bodies.pop(next(iter(bodies))).body)
+        bodies[(etag, encoding)] = body
+    return body
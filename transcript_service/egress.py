@@ -0,0 +1,225 @@
+"""Egress pool: the proxies and user agents YouTube calls go out through
+
+Each exit is a proxy (or ``direct``) paired with a user agent. It owns its
+own keep-alive session and library client, so cookies and connections
+stay with the exit that made them, and keeps a live health score built
+from its recent success rate, latency and blocks.
+
+Calls are routed by weighted rendezvous hashing on a key (the video ID):
+the same video keeps going out through the same exit for as long as that
+exit stays healthy, and traffic drifts towards the healthier exits as
+scores change. An exit that gets blocked, or keeps failing, is cooled
+down and skipped; the cooldown doubles on each consecutive block.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+
+from .http_client import build_session
+from .metrics import registry
+
+# Comma separated proxy URLs; "direct" is an exit without a proxy
+EGRESS_PROXIES = os.environ.get('EGRESS_PROXIES', 'direct')
+# "|" separated, as user agent strings contain commas; empty keeps the
+# library's default headers
+EGRESS_USER_AGENTS = os.environ.get('EGRESS_USER_AGENTS', '')
+EGRESS_COOLDOWN = float(os.environ.get('EGRESS_COOLDOWN', 60))
+EGRESS_MAX_COOLDOWN = float(os.environ.get('EGRESS_MAX_COOLDOWN', 1800))
+# Consecutive non-block failures (refused or timed out connections) that
+# also cool an exit down
+EGRESS_MAX_FAILURES = int(os.environ.get('EGRESS_MAX_FAILURES', 3))
+EGRESS_BLOCK_WINDOW = float(os.environ.get('EGRESS_BLOCK_WINDOW', 600))
+# Latency at which an exit's score is halved
+EGRESS_LATENCY_TARGET = float(os.environ.get('EGRESS_LATENCY_TARGET', 1.0))
+EGRESS_HEALTH_ALPHA = float(os.environ.get('EGRESS_HEALTH_ALPHA', 0.2))
+
+DIRECT = 'direct'
+# Outcomes that prove the exit reached YouTube and was served
+_SERVED = ('success', 'unavailable')
+
+registry.describe('transcript_egress_calls_total', 'counter', 'Upstream calls, by egress exit and outcome')
+
+_lock = threading.Lock()
+_pool = None
+
+
+def is_exit_failure(error):
+    """Whether an error means the exit itself failed (proxy down or too slow)"""
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def _label(proxy):
+    # Never report proxy credentials
+    if proxy is None:
+        return DIRECT
+    parts = urlsplit(proxy)
+    return f'{parts.hostname}:{parts.port}' if parts.port else parts.hostname or proxy
+
+
+class Exit:
+    """One proxy and user agent, with its session and health"""
+
+    def __init__(self, name, proxy=None, user_agent=None):
+        self.name = name
+        self.proxy = proxy
+        self.user_agent = user_agent
+        self.session = build_session(proxy, user_agent)
+        self.success_rate = 1.0
+        self.latency = None
+        self.cooldown_until = 0.0
+        self.consecutive_blocks = 0
+        self.consecutive_failures = 0
+        self.blocks = deque()
+        self.calls = {'selected': 0, 'success': 0, 'unavailable': 0, 'blocked': 0, 'error': 0}
+        self._api = None
+
+    @property
+    def api(self):
+        """YouTubeTranscriptApi client bound to this exit's session"""
+        if self._api is None:
+            from youtube_transcript_api import YouTubeTranscriptApi
+            self._api = YouTubeTranscriptApi(http_client=self.session)
+        return self._api
+
+    def cooling_for(self, now):
+        return max(self.cooldown_until - now, 0.0)
+
+    def score(self, now):
+        """Health in (0, 1]: success rate, slowed by latency and recent blocks"""
+        while self.blocks and self.blocks[0] < now - EGRESS_BLOCK_WINDOW:
+            self.blocks.popleft()
+        score = self.success_rate / (1 + len(self.blocks))
+        if self.latency is not None:
+            score /= 1 + self.latency / EGRESS_LATENCY_TARGET
+        return max(score, 0.001)
+
+    def record(self, outcome, seconds, now):
+        self.calls[outcome] = self.calls.get(outcome, 0) + 1
+        served = outcome in _SERVED
+        self.success_rate += EGRESS_HEALTH_ALPHA * (served - self.success_rate)
+        if seconds is not None:
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += EGRESS_HEALTH_ALPHA * (seconds - self.latency)
+
+        if outcome == 'blocked':
+            self.blocks.append(now)
+            self.consecutive_blocks += 1
+            self._cool_down(now, EGRESS_COOLDOWN * 2 ** (self.consecutive_blocks - 1))
+        elif outcome == 'error':
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= EGRESS_MAX_FAILURES:
+                self.consecutive_failures = 0
+                self._cool_down(now, EGRESS_COOLDOWN)
+        else:
+            self.consecutive_blocks = 0
+            self.consecutive_failures = 0
+
+    def _cool_down(self, now, seconds):
+        self.cooldown_until = max(self.cooldown_until, now + min(seconds, EGRESS_MAX_COOLDOWN))
+
+    def stats(self, now):
+        return {
+            'proxy': _label(self.proxy),
+            'user_agent': self.user_agent,
+            'score': round(self.score(now), 3),
+            'success_rate': round(self.success_rate, 3),
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'recent_blocks': len(self.blocks),
+            'cooling_down_for': round(self.cooling_for(now), 1),
+            'calls': dict(self.calls)
+        }
+
+
+def _rank(key, egress, weight):
+    # Weighted rendezvous hashing: every key has a stable preference order
+    # over the exits, and an exit's share of keys follows its weight
+    digest = hashlib.blake2b(f'{key}\0{egress.name}'.encode(), digest_size=8).digest()
+    unit = (int.from_bytes(digest, 'big') + 0.5) / 2 ** 64
+    return -weight / math.log(unit)
+
+
+class EgressPool:
+    """Health-scored set of exits with sticky per-key selection"""
+
+    def __init__(self, proxies=EGRESS_PROXIES, user_agents=EGRESS_USER_AGENTS):
+        proxies = [p.strip() for p in proxies.split(',') if p.strip()] or [DIRECT]
+        agents = [a.strip() for a in user_agents.split('|') if a.strip()]
+        self.exits = []
+        names = set()
+        # Proxies and user agents are paired cyclically, so a pool of one
+        # proxy and three user agents still has three exits to rotate over
+        for index in range(max(len(proxies), len(agents) or 1)):
+            proxy = proxies[index % len(proxies)]
+            proxy = None if proxy.lower() == DIRECT else proxy
+            name = _label(proxy)
+            if name in names:
+                name = f'{name}#{index}'
+            names.add(name)
+            agent = agents[index % len(agents)] if agents else None
+            self.exits.append(Exit(name, proxy, agent))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.exits)
+
+    def pick(self, key, avoid=()):
+        """The exit for key: the highest ranked among the exits that are
+        not cooling down and not in avoid
+
+        When every exit is ruled out, cooling exits are used after all
+        rather than failing; whether to stop calling YouTube altogether is
+        the circuit breaker's decision.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.exits if e not in avoid and not e.cooling_for(now)]
+            if not candidates:
+                candidates = [e for e in self.exits if e not in avoid] or self.exits
+                soonest = min(e.cooldown_until for e in candidates)
+                candidates = [e for e in candidates if e.cooldown_until == soonest]
+            chosen = max(candidates, key=lambda e: _rank(key, e, e.score(now)))
+            chosen.calls['selected'] += 1
+        return chosen
+
+    def has_fresh(self, avoid=()):
+        """Whether an exit outside avoid is ready to take a call right away"""
+        now = time.monotonic()
+        return any(e not in avoid and not e.cooling_for(now) for e in self.exits)
+
+    def record(self, egress, outcome, seconds=None):
+        """Feed one call's outcome (success, unavailable, blocked or error)
+        and duration back into the exit's health
+        """
+        with self._lock:
+            egress.record(outcome, seconds, time.monotonic())
+        registry.inc('transcript_egress_calls_total', (('exit', egress.name), ('outcome', outcome)))
+
+    def sessions(self):
+        return [e.session for e in self.exits]
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            exits = {e.name: e.stats(now) for e in self.exits}
+        return {
+            'exits': exits,
+            'available': sum(1 for stats in exits.values() if not stats['cooling_down_for'])
+        }
+
+
+def get_pool():
+    """Return the process-wide egress pool"""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = EgressPool()
+    return _pool
@@ -0,0 +1,272 @@
+"""Asyncio fetch engine
+
+All transcript fetches run as coroutines on one background event loop.
+Retry backoff is an ``asyncio.sleep`` timer, so a video waiting to retry
+holds no thread at all; the blocking library calls run on a bounded I/O
+pool only for the duration of the actual network round trip.
+
+Sync callers (Flask routes, the Vercel handler) go through ``run()``;
+async callers on another loop (the ASGI app) go through ``arun()``.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from youtube_transcript_api import NoTranscriptFound
+
+from .cache import is_negative
+from .compact import CompactTranscript
+from .egress import get_pool, is_exit_failure
+from .metrics import record_attempt, span
+from .planner import TrackListCache, select_track
+from .quota import BACKGROUND, QuotaExceeded, current_client
+from .scheduler import FairScheduler
+from .search import get_search_index
+from .singleflight import SingleFlight
+from .upstream import AdaptiveRateLimiter, CircuitBreaker, UpstreamUnavailable, is_blocked
+from .watchpage import fetch_caption_tracks, fetch_track
+
+FETCH_MAX_RETRIES = int(os.environ.get('FETCH_MAX_RETRIES', 3))
+FETCH_IO_WORKERS = int(os.environ.get('FETCH_IO_WORKERS', 16))
+BACKOFF_MIN = float(os.environ.get('FETCH_BACKOFF_MIN', 2))
+BACKOFF_MAX = float(os.environ.get('FETCH_BACKOFF_MAX', 5))
+# Try the watch page's own caption tracks when the library path fails
+WATCH_PAGE_FALLBACK = os.environ.get('WATCH_PAGE_FALLBACK', '1') != '0'
+
+
+class FetchEngine:
+    """Owns the background event loop that every fetch runs on"""
+
+    def __init__(self, io_workers=FETCH_IO_WORKERS):
+        self.io_workers = io_workers
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(
+                    ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix='fetch-io')
+                )
+                thread = threading.Thread(
+                    target=loop.run_forever, name='fetch-engine', daemon=True
+                )
+                thread.start()
+                self._loop = loop
+        return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the engine loop and return a concurrent Future"""
+        context = contextvars.copy_context()
+        return asyncio.run_coroutine_threadsafe(_in_context(context, coro), self._ensure_loop())
+
+    def run(self, coro, timeout=None):
+        """Sync adapter: run a coroutine on the engine loop and wait for it"""
+        return self.submit(coro).result(timeout)
+
+    async def arun(self, coro):
+        """Await a coroutine on the engine loop from any other event loop"""
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+
+engine = FetchEngine()
+track_lists = TrackListCache()
+inflight = SingleFlight()
+scheduler = FairScheduler()
+limiter = AdaptiveRateLimiter()
+breaker = CircuitBreaker()
+
+
+async def _call(func, *args):
+    # The library is synchronous; run it on the engine's I/O pool, carrying
+    # the caller's context along so per-request counters still apply
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, func, *args)
+
+
+async def _in_context(context, coro):
+    # Tasks start from the engine thread's context; restore the submitting
+    # caller's context variables inside this task
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+async def _upstream(method, egress, func, *args, cost=1):
+    # Every YouTube call passes the circuit breaker and the rate limiter,
+    # and reports back whether it was blocked, to them and to the egress
+    # exit it went out through
+    generation = breaker.before_call()
+    blocked = None
+    outcome = None
+    started = None
+    try:
+        with span('rate_limit'):
+            await limiter.acquire(cost)
+        started = time.monotonic()
+        with span(method):
+            result = await _call(func, *args)
+        blocked = False
+        outcome = 'success'
+        return result
+    except Exception as e:
+        blocked = is_blocked(e)
+        if blocked:
+            outcome = 'blocked'
+        else:
+            outcome = 'unavailable' if is_negative(e) else 'error'
+        raise
+    finally:
+        breaker.after_call(generation, blocked)
+        if blocked is not None:
+            limiter.record(blocked)
+        if outcome is not None:
+            record_attempt(method, outcome)
+            get_pool().record(egress, outcome, time.monotonic() - started if started else None)
+
+
+def call_upstream(method, key, func, *args):
+    """Sync adapter for a one-off YouTube call outside a transcript fetch
+
+    func(session, *args) goes out through the egress exit picked for key,
+    past the circuit breaker and rate limiter like every other call.
+    """
+    egress = get_pool().pick(key)
+    return engine.run(_upstream(method, egress, func, egress.session, *args))
+
+
+async def fetch_with_plan(video_id, language='en', kind='any', max_retries=FETCH_MAX_RETRIES):
+    """List the video's tracks once, pick the best one in memory and fetch it
+
+    A blocked or failed attempt is retried through another egress exit;
+    backoff only applies once no untried exit is ready.
+    """
+    pool = get_pool()
+    tried = set()
+    # At least one attempt, so the loop always ends in a return or a raise
+    attempts = max(max_retries, 1)
+    for attempt in range(attempts):
+        egress = None
+        try:
+            # A listing is bound to the session of the exit that fetched it
+            listing = track_lists.lookup(video_id)
+            if listing is None or listing[0] in tried:
+                egress = pool.pick(video_id, avoid=tried)
+                # Listing costs a watch page and a player request
+                transcript_list = await _upstream('track_list', egress, egress.api.list, video_id, cost=2)
+                listing = (egress, transcript_list)
+                track_lists.store(video_id, listing)
+            egress, transcript_list = listing
+            track = select_track(transcript_list, language, kind)
+            if track is None:
+                raise NoTranscriptFound(video_id, [language], transcript_list)
+            fetched = await _upstream('track_fetch', egress, track.fetch)
+            transcript = CompactTranscript.from_fetched(fetched)
+            # Every fetched transcript becomes searchable; indexing happens
+            # on the index's own writer thread
+            get_search_index().add_later(transcript)
+            return transcript
+        except Exception as e:
+            blocked = is_blocked(e)
+            # A dead exit is worth retrying only if there is another one
+            if not blocked and not (is_exit_failure(e) and len(pool) > 1):
+                raise
+            if egress is not None:
+                tried.add(egress)
+            if attempt == attempts - 1:
+                if not blocked:
+                    raise
+                raise Exception("Could not retrieve transcript. This is likely due to YouTube blocking serverless function IPs. Try deploying to a VPS or using the video in a browser to confirm transcript availability.") from e
+            if pool.has_fresh(avoid=tried):
+                continue
+            # Back off on a timer instead of sleeping a worker thread
+            with span('backoff'):
+                await asyncio.sleep(random.uniform(BACKOFF_MIN, BACKOFF_MAX))
+
+
+async def fetch_from_watch_page(video_id, language='en', kind='any'):
+    """Second route: caption tracks read off the watch page, fetched directly"""
+    egress = get_pool().pick(video_id)
+    tracks = await _upstream('watch_page', egress, fetch_caption_tracks, egress.session, video_id)
+    track = select_track(tracks, language, kind)
+    if track is None:
+        raise NoTranscriptFound(video_id, [language], tracks)
+    transcript = await _upstream('watch_page_track', egress, fetch_track, egress.session, track)
+    get_search_index().add_later(transcript)
+    return transcript
+
+
+async def fetch_with_fallback(video_id, language='en', kind='any', max_retries=FETCH_MAX_RETRIES):
+    """The library path, then the watch page route if that fails for any
+    reason other than the video having no transcript
+    """
+    try:
+        return await fetch_with_plan(video_id, language, kind, max_retries)
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        if not WATCH_PAGE_FALLBACK or is_negative(e):
+            raise
+        try:
+            return await fetch_from_watch_page(video_id, language, kind)
+        except Exception as fallback_error:
+            # The watch page saying there are no captions is authoritative;
+            # otherwise the library path's error is the one to report
+            if is_negative(fallback_error):
+                raise
+            e.fallback_error = fallback_error
+            raise e
+
+
+async def fetch_transcript(video_id, language='en', kind='any', max_retries=FETCH_MAX_RETRIES):
+    """Fetch a transcript, sharing one upstream fetch among concurrent callers
+
+    Only the caller that starts the upstream fetch has its quota charged;
+    callers that join a fetch already in flight cost nothing. The fetch
+    then waits for a slot from the fair scheduler under the leader's
+    weight.
+    """
+    video_id = video_id.strip()
+    client = current_client()
+    name, weight = (client.name, client.weight) if client is not None else (BACKGROUND, 1)
+
+    async def lead():
+        if client is not None:
+            client.charge()
+        return await scheduler.run(
+            name, weight, lambda: fetch_with_fallback(video_id, language, kind, max_retries)
+        )
+
+    while True:
+        try:
+            return await inflight.do((video_id, language, kind), lead)
+        except QuotaExceeded as e:
+            # The flight we joined was refused for its leader's quota, not
+            # ours: try again, leading a flight of our own if need be
+            if client is not None and e.client == client.name:
+                raise
+
+
+def fetch_stats():
+    """Return fetch engine counters"""
+    return {
+        'singleflight': inflight.stats(),
+        'scheduler': scheduler.stats(),
+        'rate_limiter': limiter.stats(),
+        'circuit_breaker': breaker.stats(),
+        'search_index': get_search_index().stats()
+    }
@@ -0,0 +1,11 @@
+"""Short, single-line descriptions of fetch errors for API responses"""
+
+
+def summarize_error(error):
+    """The error's stated cause, or else the first line of its message
+
+    The transcript library's messages run to a paragraph of advice; job
+    items, export checkpoints and fallback notes only need the cause.
+    """
+    lines = [line for line in str(getattr(error, 'cause', None) or error).splitlines() if line.strip()]
+    return lines[0].strip() if lines else type(error).__name__
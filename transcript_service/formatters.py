@@ -0,0 +1,177 @@
+"""Transcript output formats: SRT, WebVTT, plain text and columnar JSON
+
+Each format writes snippets straight into a text buffer that is flushed
+as byte chunks, so no per-snippet dicts or whole-body intermediates are
+built. Rendered output reuses the StreamingResponse path of every entry
+point.
+"""
+import io
+import json
+
+from .streaming import STREAM_CHUNK_SIZE, StreamingResponse
+
+MIMETYPES = {
+    'srt': 'application/x-subrip; charset=utf-8',
+    'vtt': 'text/vtt; charset=utf-8',
+    'text': 'text/plain; charset=utf-8',
+    'columnar': 'application/json',
+}
+
+# Accept header media types mapped onto formats
+ACCEPT_FORMATS = {
+    'application/x-subrip': 'srt',
+    'text/srt': 'srt',
+    'text/vtt': 'vtt',
+    'text/plain': 'text',
+}
+
+
+class FormatError(ValueError):
+    """Raised for an unknown format or a bad format option"""
+
+
+def snippet_dicts(snippets):
+    """The default JSON form of snippets: one text/start/duration dict each"""
+    return [
+        {'text': snippet.text, 'start': snippet.start, 'duration': snippet.duration}
+        for snippet in snippets
+    ]
+
+
+def negotiate_format(args, accept=None):
+    """Pick the output format from ?format= or the Accept header
+
+    Returns None for the default JSON response.
+    """
+    pause = args.get('paragraph_pause')
+    if pause is not None:
+        try:
+            if float(pause) <= 0:
+                raise ValueError
+        except ValueError:
+            raise FormatError('paragraph_pause must be a positive number of seconds')
+
+    fmt = args.get('format')
+    if fmt:
+        fmt = fmt.lower()
+        if fmt == 'json':
+            return None
+        if fmt not in MIMETYPES:
+            raise FormatError(f'Unknown format "{fmt}"; use one of json, {", ".join(MIMETYPES)}')
+        return fmt
+
+    for media_range in (accept or '').split(','):
+        media_type = media_range.split(';')[0].strip().lower()
+        if media_type in ACCEPT_FORMATS:
+            return ACCEPT_FORMATS[media_type]
+        if media_type in ('application/json', '*/*'):
+            return None
+    return None
+
+
+def _timestamp(seconds, separator):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return '%02d:%02d:%02d%s%03d' % (hours, minutes, secs, separator, millis)
+
+
+def _escape_vtt(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _write_srt(out, snippets, options):
+    for index, snippet in enumerate(snippets, 1):
+        out.write('%d\n%s --> %s\n%s\n\n' % (
+            index,
+            _timestamp(snippet.start, ','),
+            _timestamp(snippet.start + snippet.duration, ','),
+            snippet.text
+        ))
+        yield
+
+
+def _write_vtt(out, snippets, options):
+    out.write('WEBVTT\n\n')
+    for snippet in snippets:
+        out.write('%s --> %s\n%s\n\n' % (
+            _timestamp(snippet.start, '.'),
+            _timestamp(snippet.start + snippet.duration, '.'),
+            _escape_vtt(snippet.text)
+        ))
+        yield
+
+
+def _write_text(out, snippets, options):
+    # Optionally start a new paragraph wherever the speaker pauses
+    pause = options.get('paragraph_pause')
+    previous_end = None
+    for snippet in snippets:
+        if previous_end is not None:
+            if pause is not None and snippet.start - previous_end >= pause:
+                out.write('\n\n')
+            else:
+                out.write(' ')
+        out.write(snippet.text)
+        previous_end = snippet.start + snippet.duration
+        yield
+    out.write('\n')
+
+
+def _write_column(out, name, values, dumps):
+    out.write(', "%s": [' % name)
+    first = True
+    for value in values:
+        if not first:
+            out.write(', ')
+        out.write(dumps(value))
+        first = False
+        yield
+    out.write(']')
+
+
+def _write_columnar(out, snippets, options):
+    # Parallel arrays instead of one object per snippet
+    dumps = json.dumps
+    out.write('{"video_id": %s, "total_entries": %d' % (dumps(options['video_id']), len(snippets)))
+    yield from _write_column(out, 'text', (snippet.text for snippet in snippets), dumps)
+    yield from _write_column(out, 'start', (snippet.start for snippet in snippets), dumps)
+    yield from _write_column(out, 'duration', (snippet.duration for snippet in snippets), dumps)
+    out.write('}')
+
+
+WRITERS = {
+    'srt': _write_srt,
+    'vtt': _write_vtt,
+    'text': _write_text,
+    'columnar': _write_columnar,
+}
+
+
+def _render_chunks(writer, snippets, options, chunk_size):
+    out = io.StringIO()
+    written = 0
+    for _ in writer(out, snippets, options):
+        written += 1
+        if written % chunk_size == 0:
+            yield out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue().encode()
+
+
+def render_transcript(fmt, video_id, transcript, args, chunk_size=STREAM_CHUNK_SIZE):
+    """Render a fetched transcript in the given format as a streamed response"""
+    snippets = transcript.snippets
+    options = {'video_id': video_id}
+    if args.get('paragraph_pause') is not None:
+        options['paragraph_pause'] = float(args.get('paragraph_pause'))
+    return StreamingResponse(
+        _render_chunks(WRITERS[fmt], snippets, options, chunk_size),
+        content_type=MIMETYPES[fmt],
+        headers={
+            'X-Video-Id': video_id,
+            'X-Total-Entries': str(len(snippets))
+        }
+    )
@@ -0,0 +1,120 @@
+"""Pooled keep-alive HTTP sessions for YouTube calls
+
+Every exit of the egress pool (see ``egress.py``) owns one session built
+here, so connections are reused per proxy.
+"""
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import count_upstream_response
+
+# Distinct hosts kept in the pool manager, and keep-alive connections per host
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 4))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 32))
+# Applied to every call that does not set its own timeout, including the
+# transcript library's, which sets none
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 15))
+
+# Point all youtube.com traffic at another server, e.g. the local fake in
+# benchmarks/fake_youtube.py
+YOUTUBE_BASE_URL = os.environ.get('YOUTUBE_BASE_URL', '').rstrip('/')
+YOUTUBE_ORIGIN = 'https://www.youtube.com'
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """Gives requests sent without a timeout a default one
+
+    A proxy that accepts connections and never answers then raises
+    Timeout, so the egress pool cools the exit down, instead of holding
+    a fetch thread forever.
+    """
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class _RedirectAdapter(_TimeoutAdapter):
+    """Rewrites youtube.com URLs onto YOUTUBE_BASE_URL before sending"""
+
+    def __init__(self, base_url, timeout, **kwargs):
+        self.base_url = base_url
+        super().__init__(timeout, **kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = self.base_url + request.url[len(YOUTUBE_ORIGIN):]
+        return super().send(request, **kwargs)
+
+
+def build_session(proxy=None, user_agent=None, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+    """A keep-alive session, optionally going out through proxy
+
+    timeout is the (connect, read) default for calls that set none.
+    """
+    session = requests.Session()
+    adapter = _TimeoutAdapter(
+        timeout,
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        # Never block a request waiting for a free pooled connection; an
+        # overflow connection is opened and discarded instead
+        pool_block=False
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if YOUTUBE_BASE_URL:
+        session.mount(YOUTUBE_ORIGIN, _RedirectAdapter(
+            YOUTUBE_BASE_URL,
+            timeout,
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE
+        ))
+    if proxy:
+        # Both schemes: with YOUTUBE_BASE_URL set, youtube.com requests
+        # leave as plain http
+        session.proxies = {'http': proxy, 'https': proxy}
+    if user_agent:
+        session.headers['User-Agent'] = user_agent
+    session.hooks['response'].append(count_upstream_response)
+    return session
+
+
+def connection_stats():
+    """Report how many requests reused an existing pooled connection"""
+    from .egress import get_pool
+
+    connections = 0
+    requests_sent = 0
+    seen = set()
+    for session in get_pool().sessions():
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            # Proxied connections live in the adapter's proxy managers
+            managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+            for manager in managers:
+                pools = manager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    connections += pool.num_connections
+                    requests_sent += pool.num_requests
+
+    reused = max(requests_sent - connections, 0)
+    return {
+        'requests': requests_sent,
+        'connections_opened': connections,
+        'connections_reused': reused,
+        'reuse_ratio': round(reused / requests_sent, 3) if requests_sent else 0.0,
+        'pool_maxsize': HTTP_POOL_MAXSIZE
+    }
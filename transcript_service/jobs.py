@@ -0,0 +1,646 @@
+"""Background prefetch jobs for playlists, channels and video lists
+
+``POST /jobs`` only records the job in a SQLite queue next to the
+transcript cache and returns. A small pool of worker threads expands
+playlist and channel sources into video IDs, then fetches each video
+through the normal cache + fetch engine path, so ingesting a playlist
+never holds a web request open and still warms the cache.
+
+Every state change is written to the queue, so after a restart the
+workers pick up where they stopped. A worker holds each item or source
+it is working on under a lease that it keeps renewing; work whose lease
+has run out, because its process died, is taken up again by any worker,
+while work another live process holds is left alone. Several processes
+may therefore run workers on the same queue file.
+Sources are listed one at a time; a playlist or channel that cannot be
+listed is recorded against the job and the other sources carry on.
+Workers pause ``JOBS_DELAY`` seconds between fetches on top of the
+upstream rate limiter, and wait out the circuit breaker instead of
+failing items or listings while YouTube is blocking.
+
+    python -m transcript_service.jobs    # run workers without the web app
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from .cache import CACHE_DIR
+from .errors import summarize_error
+from .metrics import registry
+
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', os.path.join(CACHE_DIR, 'jobs.sqlite3'))
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 2))
+# Politeness: pause per worker between two fetches, in seconds
+JOBS_DELAY = float(os.environ.get('JOBS_DELAY', 1.0))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 3))
+JOBS_MAX_VIDEOS = int(os.environ.get('JOBS_MAX_VIDEOS', 5000))
+# Listing pages read per playlist or channel: the first page plus
+# continuations of about 100 playlist entries (30 channel videos) each
+JOBS_MAX_LISTING_PAGES = int(os.environ.get('JOBS_MAX_LISTING_PAGES', 100))
+# Seconds a worker's claim on an item or source lasts without renewal
+JOBS_LEASE_SECONDS = float(os.environ.get('JOBS_LEASE_SECONDS', 120))
+# Start the workers when the queue is first used by the web process
+JOBS_AUTOSTART = os.environ.get('JOBS_AUTOSTART', '1') not in ('0', 'false', 'no')
+
+POLL_SECONDS = 5
+FAILURES_REPORTED = 50
+
+PENDING = 'pending'
+EXPANDING = 'expanding'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_PLAYLIST_ID = re.compile(r'^[\w-]{10,}$')
+_PLAYLIST_URL = re.compile(r'[?&]list=([\w-]+)')
+_CHANNEL_URL = re.compile(r'youtube\.com/(channel/[\w-]+|@[\w.-]+|c/[\w.-]+|user/[\w.-]+)')
+_CHANNEL_ID = re.compile(r'^(UC[\w-]{22}|@[\w.-]+)$')
+# Video entries of a playlist page or a channel's videos tab
+_LISTED_VIDEO = re.compile(
+    r'"(?:playlistVideoRenderer|videoRenderer|gridVideoRenderer)":\{"videoId":"([\w-]{11})"'
+)
+# The token of the "load more" item ending a page of entries
+_CONTINUATION = re.compile(r'"continuationItemRenderer":\{.{0,1000}?"continuationCommand":\{"token":"([^"]+)"')
+_INNERTUBE_API_KEY = re.compile(r'"INNERTUBE_API_KEY":\s*"([^"]+)"')
+_INNERTUBE_CLIENT_VERSION = re.compile(r'"INNERTUBE_CLIENT_VERSION":\s*"([^"]+)"')
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS jobs ('
+    'id TEXT PRIMARY KEY, sources TEXT, status TEXT, total INTEGER DEFAULT 0, error TEXT, '
+    'created_at REAL, started_at REAL, finished_at REAL, expander TEXT, lease_until REAL)',
+    'CREATE TABLE IF NOT EXISTS items ('
+    'job TEXT, idx INTEGER, video_id TEXT, status TEXT, attempts INTEGER DEFAULT 0, '
+    'error TEXT, finished_at REAL, owner TEXT, lease_until REAL, PRIMARY KEY (job, idx)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS items_status ON items (status, job, idx)',
+    'CREATE TABLE IF NOT EXISTS source_errors ('
+    'job TEXT, kind TEXT, value TEXT, error TEXT, PRIMARY KEY (job, kind, value)) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS listings ('
+    'job TEXT, kind TEXT, value TEXT, listed INTEGER, truncated INTEGER, '
+    'PRIMARY KEY (job, kind, value)) WITHOUT ROWID',
+)
+
+# Columns added since the first queue files were written
+_LEASE_COLUMNS = {
+    'jobs': (('expander', 'TEXT'), ('lease_until', 'REAL')),
+    'items': (('owner', 'TEXT'), ('lease_until', 'REAL')),
+}
+
+registry.describe('transcript_job_items_total', 'counter', 'Prefetch job videos processed, by outcome')
+
+
+class JobError(ValueError):
+    """Raised for a malformed job request or an unknown job"""
+
+
+def parse_playlist(value):
+    """Playlist ID from a playlist URL or a bare ID"""
+    match = _PLAYLIST_URL.search(value)
+    if match:
+        return match.group(1)
+    if _PLAYLIST_ID.match(value):
+        return value
+    raise JobError(f'Not a playlist URL or ID: {value}')
+
+
+def parse_channel(value):
+    """Channel path (channel/UC..., @handle, c/name or user/name) from a URL, ID or handle"""
+    match = _CHANNEL_URL.search(value)
+    if match:
+        return match.group(1)
+    if _CHANNEL_ID.match(value):
+        return value if value.startswith('@') else f'channel/{value}'
+    raise JobError(f'Not a channel URL, ID or @handle: {value}')
+
+
+def parse_job_request(payload, extract_video_id):
+    """Validate a POST /jobs body; returns the list of sources to expand
+
+    Sources are ('video', id), ('playlist', id) or ('channel', path).
+    """
+    if not isinstance(payload, dict):
+        raise JobError('Body must be a JSON object with "playlist", "channel" and/or "video_ids"')
+
+    sources = []
+    for key, parse in (('playlist', parse_playlist), ('channel', parse_channel)):
+        values = payload.get(key) or []
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise JobError(f'"{key}" must be a string or a list of strings')
+        sources.extend((key, parse(value.strip())) for value in values)
+
+    video_ids = payload.get('video_ids') or []
+    if not isinstance(video_ids, list) or not all(isinstance(item, str) for item in video_ids):
+        raise JobError('"video_ids" must be a list of strings')
+    for item in video_ids:
+        video_id = extract_video_id(item.strip())
+        if not video_id:
+            raise JobError(f'Invalid YouTube URL or video ID: {item}')
+        sources.append(('video', video_id))
+
+    if not sources:
+        raise JobError('Body must name at least one "playlist", "channel" or "video_ids" entry')
+    if len(video_ids) > JOBS_MAX_VIDEOS:
+        raise JobError(f'Too many videos in one job (max {JOBS_MAX_VIDEOS})')
+    return sources
+
+
+def list_videos(kind, value, max_pages=JOBS_MAX_LISTING_PAGES):
+    """Video IDs listed on a playlist or a channel's videos tab
+
+    The page YouTube renders holds the first entries (about 100 of a
+    playlist, 30 of a channel); the rest are read page by page from the
+    InnerTube browse endpoint, following each page's continuation token.
+    Returns (video_ids, truncated): truncated is True when max_pages or
+    JOBS_MAX_VIDEOS stopped the listing with more entries left.
+    """
+    from youtube_transcript_api import IpBlocked
+    from .engine import call_upstream
+    from .http_client import YOUTUBE_ORIGIN
+
+    if kind == 'playlist':
+        url = f'{YOUTUBE_ORIGIN}/playlist?list={value}'
+    else:
+        url = f'{YOUTUBE_ORIGIN}/{value}/videos'
+
+    def check(response):
+        if response.status_code == 429:
+            raise IpBlocked(value)
+        if response.status_code != 200:
+            raise JobError(f'YouTube answered {response.status_code} for {kind} {value}')
+        return response.text
+
+    def get_page(session):
+        return check(session.get(url, headers={'Accept-Language': 'en-US,en;q=0.5'}, timeout=15))
+
+    def get_continuation(session, token, api_key, client_version):
+        return check(session.post(
+            f'{YOUTUBE_ORIGIN}/youtubei/v1/browse',
+            params={'key': api_key, 'prettyPrint': 'false'} if api_key else {'prettyPrint': 'false'},
+            json={
+                'context': {'client': {'clientName': 'WEB', 'clientVersion': client_version, 'hl': 'en'}},
+                'continuation': token
+            },
+            timeout=15
+        ))
+
+    page = call_upstream('listing', value, get_page)
+    api_key = _INNERTUBE_API_KEY.search(page)
+    api_key = api_key.group(1) if api_key else None
+    client_version = _INNERTUBE_CLIENT_VERSION.search(page)
+    client_version = client_version.group(1) if client_version else '2.20240101.00.00'
+
+    # Entries repeat (thumbnails, menus); keep the first of each, in order
+    video_ids = dict.fromkeys(_LISTED_VIDEO.findall(page))
+    token = _CONTINUATION.search(page)
+    pages = 1
+    while token and pages < max_pages and len(video_ids) < JOBS_MAX_VIDEOS:
+        page = call_upstream('listing', value, get_continuation, token.group(1), api_key, client_version)
+        video_ids.update(dict.fromkeys(_LISTED_VIDEO.findall(page)))
+        token = _CONTINUATION.search(page)
+        pages += 1
+    return list(video_ids), token is not None
+
+
+def has_unfinished_jobs(path=JOBS_DB_PATH):
+    """Whether the queue file holds jobs that are neither done nor failed"""
+    if not os.path.exists(path):
+        return False
+    try:
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=5)
+        try:
+            row = db.execute(
+                'SELECT 1 FROM jobs WHERE status IN (?, ?) LIMIT 1', (PENDING, RUNNING)
+            ).fetchone()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return False
+    return row is not None
+
+
+class JobQueue:
+    """Persistent queue of prefetch jobs and the workers that drain it"""
+
+    def __init__(self, fetch, path=JOBS_DB_PATH, workers=JOBS_WORKERS, delay=JOBS_DELAY,
+                 max_attempts=JOBS_MAX_ATTEMPTS, expand=list_videos, lease=JOBS_LEASE_SECONDS):
+        self.fetch = fetch
+        self.expand = expand
+        self.workers = workers
+        self.delay = delay
+        self.max_attempts = max_attempts
+        self.lease = lease
+        # Tags this queue's leases apart from other processes' on the same file
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lease_thread = None
+        self._db = self._open(path)
+
+    def _open(self, path):
+        # Like the cache, fall back to memory on a read-only disk; jobs then
+        # do not survive a restart
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+        except (sqlite3.Error, OSError):
+            db = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+        for statement in _SCHEMA:
+            db.execute(statement)
+        for table, columns in _LEASE_COLUMNS.items():
+            existing = {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+            for name, kind in columns:
+                if name not in existing:
+                    db.execute(f'ALTER TABLE {table} ADD COLUMN {name} {kind}')
+        return db
+
+    def start(self):
+        """Start the worker threads, and the one renewing their leases (once)"""
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'jobs-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._lease_thread = threading.Thread(target=self._renew_leases, name='jobs-leases', daemon=True)
+            self._lease_thread.start()
+
+    def _renew_leases(self):
+        while not self._stop.wait(self.lease / 3):
+            until = time.time() + self.lease
+            with self._lock:
+                self._db.execute(
+                    'UPDATE items SET lease_until = ? WHERE owner = ? AND status = ?', (until, self.owner, RUNNING)
+                )
+                self._db.execute('UPDATE jobs SET lease_until = ? WHERE expander = ?', (until, self.owner))
+
+    def stop(self):
+        """Ask the workers to stop once they finish their current video"""
+        self._stop.set()
+        self._wake.set()
+
+    def wait(self, timeout=None):
+        """Block until stop() is called or timeout passes; True once stopped"""
+        return self._stop.wait(timeout)
+
+    def close(self, timeout=None):
+        """Stop the workers, wait for them and close the database
+
+        The database stays open if a worker is still busy after timeout.
+        """
+        self.stop()
+        threads = list(self._threads)
+        if self._lease_thread is not None:
+            threads.append(self._lease_thread)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        if not any(thread.is_alive() for thread in threads):
+            with self._lock:
+                self._db.close()
+
+    def submit(self, sources):
+        """Queue a job; playlists and channels are expanded by the workers"""
+        job_id = uuid.uuid4().hex[:16]
+        videos = [value for kind, value in sources if kind == 'video']
+        # Playlists and channels still to be listed; '[]' once expanded
+        to_expand = [[kind, value] for kind, value in sources if kind != 'video']
+        now = time.time()
+        with self._lock:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute(
+                    'INSERT INTO jobs (id, sources, status, created_at) VALUES (?, ?, ?, ?)',
+                    (job_id, json.dumps(to_expand), PENDING, now)
+                )
+                self._add_items(job_id, videos)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        self._wake.set()
+        return job_id
+
+    def _add_items(self, job_id, video_ids):
+        """Queue the new videos among video_ids; False if JOBS_MAX_VIDEOS left some out"""
+        db = self._db
+        (count,) = db.execute('SELECT COUNT(*) FROM items WHERE job = ?', (job_id,)).fetchone()
+        seen = {row[0] for row in db.execute('SELECT video_id FROM items WHERE job = ?', (job_id,))}
+        rows = []
+        complete = True
+        for video_id in dict.fromkeys(video_ids):
+            if video_id in seen:
+                continue
+            if count + len(rows) >= JOBS_MAX_VIDEOS:
+                complete = False
+                break
+            rows.append((job_id, count + len(rows), video_id, PENDING))
+        db.executemany('INSERT INTO items (job, idx, video_id, status) VALUES (?, ?, ?, ?)', rows)
+        db.execute('UPDATE jobs SET total = total + ? WHERE id = ?', (len(rows), job_id))
+        return complete
+
+    def _work(self):
+        while not self._stop.is_set():
+            if self._expand_next() or self._fetch_next():
+                self._stop.wait(self.delay)
+                continue
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+
+    def _expand_next(self):
+        from .upstream import UpstreamUnavailable
+
+        now = time.time()
+        with self._lock:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                # A source whose expander's lease ran out is up for grabs
+                row = db.execute(
+                    "SELECT id, sources FROM jobs WHERE sources != '[]' "
+                    'AND (expander IS NULL OR lease_until IS NULL OR lease_until < ?) '
+                    'AND status IN (?, ?) ORDER BY created_at LIMIT 1', (now, PENDING, RUNNING)
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        'UPDATE jobs SET status = ?, expander = ?, lease_until = ?, '
+                        'started_at = COALESCE(started_at, ?) WHERE id = ?',
+                        (RUNNING, self.owner, now + self.lease, now, row[0])
+                    )
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        if row is None:
+            return False
+        job_id, sources = row
+
+        # One source per turn, so each listing is saved (or its error
+        # recorded) before the next is tried
+        (kind, value), *rest = json.loads(sources)
+        videos = []
+        truncated = False
+        error = None
+        try:
+            videos, truncated = self.expand(kind, value)
+        except UpstreamUnavailable as e:
+            # YouTube is blocking us: leave the source queued and wait
+            with self._lock:
+                self._db.execute(
+                    'UPDATE jobs SET expander = NULL, lease_until = NULL WHERE id = ? AND expander = ?',
+                    (job_id, self.owner)
+                )
+            self._stop.wait(e.retry_after)
+            return False
+        except Exception as e:
+            error = f'Could not list videos: {summarize_error(e)}'
+
+        with self._lock:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                updated = db.execute(
+                    'UPDATE jobs SET sources = ?, expander = NULL, lease_until = NULL WHERE id = ? AND expander = ?',
+                    (json.dumps(rest), job_id, self.owner)
+                ).rowcount
+                # Our lease ran out and another worker took the source over
+                if not updated:
+                    db.execute('ROLLBACK')
+                    return True
+                if error is None:
+                    truncated = not self._add_items(job_id, videos) or truncated
+                    db.execute(
+                        'INSERT OR REPLACE INTO listings (job, kind, value, listed, truncated) VALUES (?, ?, ?, ?, ?)',
+                        (job_id, kind, value, len(videos), truncated)
+                    )
+                else:
+                    db.execute(
+                        'INSERT OR REPLACE INTO source_errors (job, kind, value, error) VALUES (?, ?, ?, ?)',
+                        (job_id, kind, value, error)
+                    )
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        self._wake.set()
+        # A source may list nothing new, leaving nothing to fetch
+        self._finish_job_if_drained(job_id)
+        return True
+
+    def _claim(self):
+        # Oldest job first, in playlist order; an item whose worker's lease
+        # ran out counts as pending
+        now = time.time()
+        with self._lock:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute(
+                    'SELECT i.job, i.idx, i.video_id, i.attempts FROM items i JOIN jobs j ON j.id = i.job '
+                    'WHERE i.status = ? OR (i.status = ? AND (i.lease_until IS NULL OR i.lease_until < ?)) '
+                    'ORDER BY j.created_at, i.idx LIMIT 1',
+                    (PENDING, RUNNING, now)
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        'UPDATE items SET status = ?, attempts = attempts + 1, owner = ?, lease_until = ? '
+                        'WHERE job = ? AND idx = ?',
+                        (RUNNING, self.owner, now + self.lease, row[0], row[1])
+                    )
+                    db.execute(
+                        'UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) '
+                        'WHERE id = ? AND status IN (?, ?)',
+                        (RUNNING, now, row[0], PENDING, RUNNING)
+                    )
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return row
+
+    def _fetch_next(self):
+        from .upstream import UpstreamUnavailable
+
+        item = self._claim()
+        if item is None:
+            return False
+        job_id, idx, video_id, attempts = item
+        try:
+            self.fetch(video_id)
+        except UpstreamUnavailable as e:
+            # YouTube is blocking us: put the item back and wait it out
+            # rather than counting an attempt against it
+            self._update_item(job_id, idx, PENDING, None, attempts)
+            self._stop.wait(e.retry_after)
+            return False
+        except Exception as e:
+            from .cache import TranscriptUnavailable, is_negative
+            permanent = isinstance(e, TranscriptUnavailable) or is_negative(e)
+            if permanent or attempts + 1 >= self.max_attempts:
+                outcome = FAILED
+                updated = self._update_item(job_id, idx, FAILED, summarize_error(e))
+            else:
+                outcome = 'retried'
+                updated = self._update_item(job_id, idx, PENDING, summarize_error(e))
+        else:
+            outcome = DONE
+            updated = self._update_item(job_id, idx, DONE, None)
+        # Not counted if the lease ran out and the item went to another worker
+        if updated:
+            registry.inc('transcript_job_items_total', (('outcome', outcome),))
+            self._finish_job_if_drained(job_id)
+        return True
+
+    def _update_item(self, job_id, idx, status, error, attempts=None):
+        """Record the outcome of a claimed item; False if this worker no longer holds it"""
+        with self._lock:
+            if attempts is not None:
+                cursor = self._db.execute(
+                    'UPDATE items SET status = ?, attempts = ?, owner = NULL, lease_until = NULL '
+                    'WHERE job = ? AND idx = ? AND owner = ? AND status = ?',
+                    (status, attempts, job_id, idx, self.owner, RUNNING)
+                )
+            else:
+                cursor = self._db.execute(
+                    'UPDATE items SET status = ?, error = ?, finished_at = ?, owner = NULL, lease_until = NULL '
+                    'WHERE job = ? AND idx = ? AND owner = ? AND status = ?',
+                    (status, error, time.time() if status in (DONE, FAILED) else None,
+                     job_id, idx, self.owner, RUNNING)
+                )
+            return cursor.rowcount > 0
+
+    def _finish_job_if_drained(self, job_id):
+        with self._lock:
+            (open_items,) = self._db.execute(
+                'SELECT COUNT(*) FROM items WHERE job = ? AND status IN (?, ?)', (job_id, PENDING, RUNNING)
+            ).fetchone()
+            (sources,) = self._db.execute('SELECT sources FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if not open_items and sources == '[]':
+            self._finish_job(job_id)
+
+    def _finish_job(self, job_id):
+        # A job whose sources could not be listed fails unless something
+        # else in it was fetched; either way the listing errors are kept
+        with self._lock:
+            (listing_errors,) = self._db.execute(
+                'SELECT COUNT(*) FROM source_errors WHERE job = ?', (job_id,)
+            ).fetchone()
+            (done,) = self._db.execute(
+                'SELECT COUNT(*) FROM items WHERE job = ? AND status = ?', (job_id, DONE)
+            ).fetchone()
+            error = None
+            if listing_errors:
+                error = f'Could not list videos for {listing_errors} source(s)'
+            self._db.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                (FAILED if error and not done else DONE, error, time.time(), job_id)
+            )
+
+    def status(self, job_id):
+        """Progress, failures and throughput of one job"""
+        with self._lock:
+            job = self._db.execute(
+                'SELECT status, sources, total, error, created_at, started_at, finished_at '
+                'FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+            if job is None:
+                raise JobError(f'Unknown job: {job_id}')
+            counts = dict(self._db.execute(
+                'SELECT status, COUNT(*) FROM items WHERE job = ? GROUP BY status', (job_id,)
+            ).fetchall())
+            failures = self._db.execute(
+                'SELECT video_id, error FROM items WHERE job = ? AND status = ? ORDER BY idx LIMIT ?',
+                (job_id, FAILED, FAILURES_REPORTED)
+            ).fetchall()
+            source_errors = self._db.execute(
+                'SELECT kind, value, error FROM source_errors WHERE job = ? ORDER BY kind, value',
+                (job_id,)
+            ).fetchall()
+            listings = self._db.execute(
+                'SELECT kind, value, listed, truncated FROM listings WHERE job = ? ORDER BY kind, value',
+                (job_id,)
+            ).fetchall()
+
+        status, sources, total, error, created_at, started_at, finished_at = job
+        sources = json.loads(sources)
+        if sources and status in (PENDING, RUNNING):
+            status = EXPANDING
+        done = counts.get(DONE, 0)
+        failed = counts.get(FAILED, 0)
+        elapsed = ((finished_at or time.time()) - started_at) if started_at else 0.0
+        rate = (done + failed) / elapsed if elapsed > 0 else None
+        remaining = counts.get(PENDING, 0) + counts.get(RUNNING, 0)
+
+        result = {
+            'job_id': job_id,
+            'status': status,
+            'expanding': sources,
+            'total': total,
+            'done': done,
+            'failed': failed,
+            'pending': counts.get(PENDING, 0),
+            'running': counts.get(RUNNING, 0),
+            'progress': round((done + failed) / total, 4) if total else 0.0,
+            'videos_per_minute': round(rate * 60, 2) if rate else None,
+            'eta_seconds': round(remaining / rate, 1) if rate and remaining else None,
+            'elapsed_seconds': round(elapsed, 3),
+            'created_at': created_at,
+            'finished_at': finished_at,
+            'failures': [{'video_id': video_id, 'error': message} for video_id, message in failures]
+        }
+        if listings:
+            result['listings'] = [
+                {'source': kind, 'value': value, 'listed': listed, 'truncated': bool(truncated)}
+                for kind, value, listed, truncated in listings
+            ]
+            result['truncated'] = any(truncated for *_, truncated in listings)
+        if source_errors:
+            result['source_errors'] = [
+                {'source': kind, 'value': value, 'error': message}
+                for kind, value, message in source_errors
+            ]
+        if error:
+            result['error'] = error
+        return result
+
+    def stats(self):
+        """Queue-wide item counts"""
+        with self._lock:
+            counts = dict(self._db.execute('SELECT status, COUNT(*) FROM items GROUP BY status').fetchall())
+            (jobs,) = self._db.execute('SELECT COUNT(*) FROM jobs').fetchone()
+        return {
+            'jobs': jobs,
+            'items': {status: counts.get(status, 0) for status in (PENDING, RUNNING, DONE, FAILED)},
+            'workers': len(self._threads)
+        }
+
+
+def main():
+    """Run the job workers in the foreground"""
+    import signal
+    from .routes import get_cached_transcript
+
+    queue = JobQueue(get_cached_transcript)
+    signal.signal(signal.SIGTERM, lambda *args: queue.stop())
+    queue.start()
+    print(f'Processing jobs from {JOBS_DB_PATH} with {queue.workers} workers')
+    try:
+        while not queue.wait(60):
+            print(json.dumps(queue.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Per-request phase timings and process-wide metrics
+
+Each request gets a ``RequestTimer`` held in a context variable, so spans
+recorded anywhere on its path (including fetch engine tasks, which copy
+the caller's context) add to the same timer. Timers become the
+``Server-Timing`` response header; every span and counter is also
+aggregated process-wide and rendered as Prometheus text on ``/metrics``.
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from .streaming import StreamingResponse
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Histogram buckets in seconds, from cache hits up to long retry chains
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_timer = contextvars.ContextVar('request_timer', default=None)
+# Per-request counter of upstream HTTP responses, set by the endpoints
+_upstream_counter = contextvars.ContextVar('upstream_counter', default=None)
+
+
+class RequestTimer:
+    """Accumulated span durations of one request"""
+    __slots__ = ('started', 'spans', '_lock')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            total, count = self.spans.get(phase, (0.0, 0))
+            self.spans[phase] = (total + seconds, count + 1)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value; repeated spans are summed"""
+        with self._lock:
+            spans = list(self.spans.items())
+        parts = []
+        for phase, (total, count) in spans:
+            part = '%s;dur=%.1f' % (phase, total * 1000)
+            if count > 1:
+                part += ';desc="%d calls"' % count
+            parts.append(part)
+        parts.append('total;dur=%.1f' % (self.elapsed() * 1000))
+        return ', '.join(parts)
+
+
+class UpstreamCounter:
+    """Number of upstream requests made on behalf of one response"""
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Registry:
+    """Labelled counters and histograms, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, help_text = self._help[name]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), (counts, total, count) in histograms:
+            header(name)
+            for bound, bucket in zip(BUCKETS, counts):
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {bucket}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return lines
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in labels
+    )
+
+
+registry = Registry()
+registry.describe('transcript_requests_total', 'counter', 'Responses sent, by path and status')
+registry.describe('transcript_request_seconds', 'histogram', 'Time to produce a response, by path')
+registry.describe('transcript_phase_seconds', 'histogram', 'Time spent in each request phase')
+registry.describe('transcript_method_attempts_total', 'counter', 'Fetch method attempts, by method and outcome')
+registry.describe('transcript_blocks_detected_total', 'counter', 'Upstream responses recognised as blocking, by method')
+
+
+def start_timing():
+    """Start timing the request running in the current context"""
+    timer = RequestTimer()
+    _timer.set(timer)
+    return timer
+
+
+def count_upstream_requests():
+    """Start counting upstream requests made from the current context"""
+    counter = UpstreamCounter()
+    _upstream_counter.set(counter)
+    return counter
+
+
+def count_upstream_response(response, *args, **kwargs):
+    """requests response hook: count one upstream response for the current request"""
+    counter = _upstream_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+
+def current_timer():
+    return _timer.get()
+
+
+def record_span(phase, seconds):
+    timer = _timer.get()
+    if timer is not None:
+        timer.add(phase, seconds)
+    registry.observe('transcript_phase_seconds', (('phase', phase),), seconds)
+
+
+@contextmanager
+def span(phase):
+    """Time a block as one span of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(phase, time.perf_counter() - started)
+
+
+def timed(phase):
+    """Decorator: time every call of a function as a span"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_attempt(method, outcome):
+    """Count one fetch method attempt: outcome is success, blocked or error"""
+    registry.inc('transcript_method_attempts_total', (('method', method), ('outcome', outcome)))
+    if outcome == 'blocked':
+        registry.inc('transcript_blocks_detected_total', (('method', method),))
+
+
+def finish_request(path, status, timer=None):
+    """Count a response and return its Server-Timing header value"""
+    timer = timer or _timer.get()
+    if status == 404:
+        # Keep label cardinality bounded for unknown paths
+        path = 'unmatched'
+    registry.inc('transcript_requests_total', (('path', path), ('status', status)))
+    if timer is None:
+        return None
+    registry.observe('transcript_request_seconds', (('path', path),), timer.elapsed())
+    return timer.server_timing()
+
+
+class Labelled(dict):
+    """Stats keyed by a label value, such as a client name, rather than by
+    part of a metric name; flattened into one labelled sample per key
+    """
+
+    def __init__(self, label, items=()):
+        super().__init__(items)
+        self.label = label
+
+
+def _flatten(prefix, value, lines, labels=()):
+    if isinstance(value, Labelled):
+        for key, item in value.items():
+            _flatten(prefix, item, lines, labels + ((value.label, key),))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f'{prefix}_{key}', item, lines, labels)
+    elif isinstance(value, bool):
+        lines.append(f'{prefix}{_labels(labels)} {int(value)}')
+    elif isinstance(value, (int, float)):
+        lines.append(f'{prefix}{_labels(labels)} {value}')
+    elif isinstance(value, str):
+        # Enumerated states (e.g. the breaker) become a labelled 1
+        lines.append(f'{prefix}{_labels(labels + (("value", value),))} 1')
+
+
+def render_metrics(gauges=None):
+    """Prometheus text exposition of the registry plus component stats
+
+    gauges maps a metric prefix to a (possibly nested) stats dict such as
+    ``fetch_stats()``; numeric leaves become untyped samples.
+    """
+    lines = registry.render()
+    for prefix, stats in (gauges or {}).items():
+        _flatten(prefix, stats, lines)
+    return StreamingResponse(
+        iter(['\n'.join(lines).encode() + b'\n']),
+        content_type=PROMETHEUS_MIMETYPE
+    )
@@ -0,0 +1,101 @@
+"""Time-range slicing and cursor pagination for transcript responses"""
+import base64
+import math
+import os
+
+PAGE_MAX_LIMIT = int(os.environ.get('PAGE_MAX_LIMIT', 5000))
+
+
+class RangeError(ValueError):
+    """Raised for malformed from/to/cursor/limit parameters"""
+
+
+class Window:
+    """Requested time range and page of a transcript"""
+    __slots__ = ('start', 'end', 'offset', 'limit')
+
+    def __init__(self, start=None, end=None, offset=0, limit=None):
+        self.start = start
+        self.end = end
+        self.offset = offset
+        self.limit = limit
+
+
+def encode_cursor(index):
+    """Opaque cursor pointing at a snippet index"""
+    return base64.urlsafe_b64encode(f'i:{index}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        prefix, index = raw.split(':', 1)
+        if prefix != 'i' or int(index) < 0:
+            raise ValueError
+        return int(index)
+    except ValueError:
+        raise RangeError('Invalid cursor')
+
+
+def _seconds(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise RangeError(f'{name} must be a number of seconds')
+    # float() also takes nan and inf, which no window can be built from
+    if not math.isfinite(seconds):
+        raise RangeError(f'{name} must be a number of seconds')
+    if seconds < 0:
+        raise RangeError(f'{name} must not be negative')
+    return seconds
+
+
+def parse_window(args):
+    """Read from/to/cursor/limit; returns None when no window was requested"""
+    start = _seconds(args, 'from')
+    end = _seconds(args, 'to')
+    if start is not None and end is not None and end < start:
+        raise RangeError('to must not be before from')
+
+    offset = 0
+    if args.get('cursor'):
+        offset = decode_cursor(args.get('cursor'))
+
+    limit = None
+    if args.get('limit') is not None:
+        try:
+            limit = int(args.get('limit'))
+        except ValueError:
+            raise RangeError('limit must be an integer')
+        if not 1 <= limit <= PAGE_MAX_LIMIT:
+            raise RangeError(f'limit must be between 1 and {PAGE_MAX_LIMIT}')
+
+    if start is None and end is None and not offset and limit is None:
+        return None
+    return Window(start, end, offset, limit)
+
+
+def apply_window(transcript, window):
+    """Slice a CompactTranscript to a window; returns (slice, next_cursor)
+
+    Costs O(log n) to locate the range plus O(k) to serialize the k
+    snippets returned; nothing outside the window is touched.
+    """
+    if window is None:
+        return transcript, None
+    lo, hi = transcript.window(window.start, window.end)
+    # The cursor is an absolute snippet index inside the same window
+    lo = min(max(lo, window.offset), hi)
+    page_end = hi if window.limit is None else min(hi, lo + window.limit)
+    next_cursor = encode_cursor(page_end) if page_end < hi else None
+    return transcript.slice(lo, page_end), next_cursor
+
+
+def with_cursor(response, next_cursor):
+    """Attach the next page cursor to a StreamingResponse as a header"""
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
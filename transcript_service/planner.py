@@ -0,0 +1,69 @@
+"""List-then-select fetch planning
+
+A video's caption tracks are listed once (one watch page + one player
+request) and the listing is cached, so choosing a track is an in-memory
+decision instead of a chain of upstream attempts.
+"""
+import os
+import threading
+import time
+
+TRACK_LIST_TTL = int(os.environ.get('TRACK_LIST_TTL', 10 * 60))
+TRACK_LIST_MAX_ENTRIES = int(os.environ.get('TRACK_LIST_MAX_ENTRIES', 1024))
+
+
+class TrackListCache:
+    """Short-lived cache of each video's available caption tracks"""
+
+    def __init__(self, ttl=TRACK_LIST_TTL, max_entries=TRACK_LIST_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, video_id):
+        """Return the cached track listing for video_id, or None"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        return None
+
+    def store(self, video_id, transcript_list):
+        """Remember a freshly fetched track listing"""
+        with self._lock:
+            if video_id not in self._entries and len(self._entries) >= self.max_entries:
+                # Drop the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[video_id] = (time.time() + self.ttl, transcript_list)
+
+
+def select_track(transcript_list, language='en', kind='any'):
+    """Pick the best track for a language preference, without any network calls
+
+    Manually created tracks win over generated ones. An exact language code
+    match wins over a regional variant (``en`` before ``en-GB``). Failing
+    that, a translatable track is translated into the language, and as a
+    last resort any track of the requested kind is returned.
+    """
+    tracks = [
+        track for track in transcript_list
+        if kind == 'any' or track.is_generated == (kind == 'generated')
+    ]
+    # Stable sort keeps YouTube's own order within each group
+    tracks.sort(key=lambda track: track.is_generated)
+
+    for track in tracks:
+        if track.language_code == language:
+            return track
+    for track in tracks:
+        if track.language_code.split('-')[0] == language:
+            return track
+    for track in tracks:
+        if track.is_translatable and any(
+            translation.language_code == language
+            for translation in track.translation_languages
+        ):
+            return track.translate(language)
+    return tracks[0] if tracks else None
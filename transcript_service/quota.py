@@ -0,0 +1,190 @@
+"""API keys and per-client quotas on upstream fetches
+
+Every request is attributed to a client: the configured API key it
+presents in ``X-API-Key`` (or the ``api_key`` parameter), or the shared
+anonymous client. Each client has a token bucket that is charged only
+when a request needs YouTube; cache hits are never throttled. An empty
+bucket raises ``QuotaExceeded``, which the routes turn into a 429 with
+``Retry-After``.
+
+A client's weight scales both its bucket and its share of fetch slots in
+the fair scheduler (``scheduler.py``). Work with no client, such as
+prefetch jobs and stale refreshes, is not charged and is scheduled as
+the background client.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+
+from .metrics import registry
+
+# Comma-separated name:key[:weight] entries
+API_KEYS = os.environ.get('API_KEYS', '')
+# Reject requests without a key instead of serving them as anonymous
+API_KEYS_REQUIRED = os.environ.get('API_KEYS_REQUIRED', '0') == '1'
+# Upstream fetches per second, and bucket size, per unit of weight; a
+# rate of 0 turns quotas off
+QUOTA_RATE = float(os.environ.get('QUOTA_RATE', 2))
+QUOTA_BURST = float(os.environ.get('QUOTA_BURST', 30))
+QUOTA_ANONYMOUS_WEIGHT = float(os.environ.get('QUOTA_ANONYMOUS_WEIGHT', 1))
+
+ANONYMOUS = 'anonymous'
+BACKGROUND = 'background'
+
+_client = contextvars.ContextVar('api_client', default=None)
+
+registry.describe('transcript_client_fetches_total', 'counter', 'Upstream fetches per API client, allowed or throttled by its quota')
+
+
+class UnknownApiKey(Exception):
+    """Raised for a request with an API key that is not configured, or
+    with none while keys are required"""
+
+
+class QuotaExceeded(Exception):
+    """Raised instead of fetching when the client's quota is used up"""
+
+    def __init__(self, client, retry_after):
+        self.client = client
+        self.retry_after = max(math.ceil(retry_after), 1)
+        super().__init__(
+            f'Upstream fetch quota for {client} exhausted; retry in {self.retry_after}s '
+            '(cached transcripts are still served)'
+        )
+
+
+class Client:
+    """One API client: its token bucket and usage counters"""
+
+    def __init__(self, name, weight, rate=QUOTA_RATE, burst=QUOTA_BURST):
+        self.name = name
+        self.weight = weight
+        self.rate = rate * weight
+        self.burst = burst * weight
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'fetches': 0, 'throttled': 0}
+
+    def count_request(self):
+        with self._lock:
+            self._stats['requests'] += 1
+
+    def charge(self, cost=1):
+        """Take cost tokens for an upstream fetch or raise QuotaExceeded"""
+        with self._lock:
+            if self.rate <= 0:
+                self._stats['fetches'] += 1
+                return
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < cost:
+                self._stats['throttled'] += 1
+                retry_after = (cost - self._tokens) / self.rate
+            else:
+                self._tokens -= cost
+                self._stats['fetches'] += 1
+                retry_after = None
+        if retry_after is not None:
+            registry.inc('transcript_client_fetches_total', (('client', self.name), ('outcome', 'throttled')))
+            raise QuotaExceeded(self.name, retry_after)
+        registry.inc('transcript_client_fetches_total', (('client', self.name), ('outcome', 'allowed')))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            if self.rate > 0:
+                now = time.monotonic()
+                stats['tokens'] = round(min(self.burst, self._tokens + (now - self._updated) * self.rate), 3)
+        stats['weight'] = self.weight
+        stats['rate'] = self.rate
+        stats['burst'] = self.burst
+        return stats
+
+
+def parse_api_keys(value):
+    """{key: (name, weight)} from an API_KEYS value"""
+    keys = {}
+    for entry in value.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split(':')
+        if len(parts) not in (2, 3) or not parts[0] or not parts[1]:
+            raise ValueError(f'API_KEYS entries look like name:key[:weight], got {entry!r}')
+        weight = float(parts[2]) if len(parts) == 3 else 1.0
+        if weight <= 0:
+            raise ValueError(f'API key weight must be positive, got {entry!r}')
+        keys[parts[1]] = (parts[0], weight)
+    return keys
+
+
+class Quotas:
+    """The configured clients, looked up by API key"""
+
+    def __init__(self, api_keys=API_KEYS, required=API_KEYS_REQUIRED):
+        self.required = required
+        self._by_key = {}
+        self.clients = {}
+        for key, (name, weight) in parse_api_keys(api_keys).items():
+            client = self.clients.get(name)
+            if client is None:
+                client = self.clients[name] = Client(name, weight)
+            self._by_key[key] = client
+        self.anonymous = Client(ANONYMOUS, QUOTA_ANONYMOUS_WEIGHT)
+
+    def identify(self, api_key):
+        """The client for an API key (None for no key) or raise UnknownApiKey"""
+        if not api_key:
+            if self.required:
+                raise UnknownApiKey('An API key is required (X-API-Key header or api_key parameter)')
+            return self.anonymous
+        client = self._by_key.get(api_key)
+        if client is None:
+            raise UnknownApiKey('Unknown API key')
+        return client
+
+    def stats(self):
+        clients = {name: client.stats() for name, client in self.clients.items()}
+        clients[ANONYMOUS] = self.anonymous.stats()
+        return {'required': self.required, 'clients': clients}
+
+
+_quotas = None
+_quotas_lock = threading.Lock()
+
+
+def get_quotas():
+    """Return the process-wide client table, built from API_KEYS on first use"""
+    global _quotas
+    if _quotas is None:
+        with _quotas_lock:
+            if _quotas is None:
+                _quotas = Quotas()
+    return _quotas
+
+
+def identify(request):
+    """Attribute the current context's work to the request's client"""
+    client = get_quotas().identify(request.header('X-API-Key') or request.args.get('api_key'))
+    client.count_request()
+    _client.set(client)
+    return client
+
+
+def is_private():
+    """Whether responses in the current context must stay out of shared caches
+
+    True once keys are required or the request presented one: a CDN must
+    not hand a key holder's response to callers without a key.
+    """
+    client = _client.get()
+    return get_quotas().required or (client is not None and client.name != ANONYMOUS)
+
+
+def current_client():
+    """The client the current context is working for, or None for background work"""
+    return _client.get()
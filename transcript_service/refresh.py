@@ -0,0 +1,135 @@
+"""Background refresh of stale cache entries, hottest first
+
+Every cache lookup bumps the key's access frequency, an exponentially
+decaying count with a half-life of ``REFRESH_HALF_LIFE`` seconds. A stale
+hit schedules the key for refresh; a bounded set of worker threads always
+takes the pending key with the highest current frequency, so videos that
+are asked for most are brought back to fresh first and nobody waits on
+YouTube for them. When the pending set is full, the coldest key makes
+way or the new one is dropped.
+"""
+import os
+import threading
+import time
+
+REFRESH_WORKERS = int(os.environ.get('REFRESH_WORKERS', 2))
+REFRESH_MAX_PENDING = int(os.environ.get('REFRESH_MAX_PENDING', 256))
+REFRESH_HALF_LIFE = float(os.environ.get('REFRESH_HALF_LIFE', 3600))
+# A key whose refresh failed is not retried for this long
+REFRESH_RETRY_AFTER = float(os.environ.get('REFRESH_RETRY_AFTER', 60))
+# Keys whose access frequency is remembered
+REFRESH_TRACKED_KEYS = int(os.environ.get('REFRESH_TRACKED_KEYS', 10000))
+
+
+class Refresher:
+    """Frequency-prioritized queue of cache refreshes and its workers"""
+
+    def __init__(self, workers=REFRESH_WORKERS, max_pending=REFRESH_MAX_PENDING,
+                 half_life=REFRESH_HALF_LIFE, retry_after=REFRESH_RETRY_AFTER,
+                 tracked_keys=REFRESH_TRACKED_KEYS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.half_life = half_life
+        self.retry_after = retry_after
+        self.tracked_keys = tracked_keys
+        self._frequency = {}
+        self._pending = {}
+        self._running = set()
+        self._failed_until = {}
+        self._threads = []
+        self._cond = threading.Condition()
+        self._stats = {'scheduled': 0, 'refreshed': 0, 'failed': 0, 'dropped': 0}
+
+    def _decayed(self, key, now):
+        score, last = self._frequency.get(key, (0.0, now))
+        return score * 0.5 ** ((now - last) / self.half_life)
+
+    def touch(self, key):
+        """Count one access to key"""
+        now = time.monotonic()
+        with self._cond:
+            self._frequency[key] = (self._decayed(key, now) + 1, now)
+            if len(self._frequency) > self.tracked_keys:
+                self._forget_coldest(now)
+
+    def _forget_coldest(self, now):
+        # Keep the hotter half; rare enough that a full sort is fine
+        ranked = sorted(self._frequency, key=lambda k: self._decayed(k, now), reverse=True)
+        for key in ranked[self.tracked_keys // 2:]:
+            if key not in self._pending:
+                del self._frequency[key]
+
+    def frequency(self, key):
+        with self._cond:
+            return self._decayed(key, time.monotonic())
+
+    def schedule(self, key, refresh):
+        """Queue refresh() for key unless it is already queued, running or
+        recently failed; returns whether it was queued
+        """
+        now = time.monotonic()
+        with self._cond:
+            if key in self._pending or key in self._running:
+                return False
+            if self._failed_until.get(key, 0) > now:
+                return False
+            self._failed_until.pop(key, None)
+            if len(self._pending) >= self.max_pending:
+                coldest = min(self._pending, key=lambda k: self._decayed(k, now))
+                if self._decayed(coldest, now) >= self._decayed(key, now):
+                    self._stats['dropped'] += 1
+                    return False
+                del self._pending[coldest]
+                self._stats['dropped'] += 1
+            self._pending[key] = refresh
+            self._stats['scheduled'] += 1
+            self._start()
+            self._cond.notify()
+        return True
+
+    def _start(self):
+        # Workers start with the first stale hit, not with the process
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'cache-refresh-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            now = time.monotonic()
+            key = max(self._pending, key=lambda k: self._decayed(k, now))
+            refresh = self._pending.pop(key)
+            self._running.add(key)
+        return key, refresh
+
+    def _work(self):
+        while True:
+            key, refresh = self._next()
+            try:
+                refresh()
+                outcome = 'refreshed'
+            except Exception:
+                outcome = 'failed'
+            with self._cond:
+                self._running.discard(key)
+                self._stats[outcome] += 1
+                if outcome == 'failed':
+                    self._failed_until[key] = time.monotonic() + self.retry_after
+                    if len(self._failed_until) > self.max_pending:
+                        now = time.monotonic()
+                        self._failed_until = {
+                            k: until for k, until in self._failed_until.items() if until > now
+                        }
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+            stats['running'] = len(self._running)
+            stats['tracked_keys'] = len(self._frequency)
+        stats['workers'] = self.workers
+        return stats
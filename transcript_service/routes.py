@@ -0,0 +1,785 @@
+"""Request handling shared by every entry point
+
+Handlers are plain functions of a ``Request`` and return the body, a
+``(body, status)`` or ``(body, status, headers)`` tuple, or a
+``StreamingResponse``. The Vercel handler class (api/index.py), the Flask
+app (app.py) and the ASGI app (asgi.py) only translate their own request
+objects into a ``Request`` and the result back into a response.
+
+Modules that pull in youtube_transcript_api, requests or asyncio are
+imported on first use, so a serverless cold start that serves a cache
+hit, a stats endpoint or the docs never loads them.
+"""
+import json
+import re
+import threading
+
+from .conditional import (
+    EncodedBody,
+    cache_headers,
+    cached_body,
+    compress_chunks,
+    encode,
+    encode_and_remember,
+    is_not_modified,
+    negotiate_encoding,
+    not_modified_response,
+    transcript_etag,
+)
+from .errors import summarize_error
+from .formatters import FormatError, negotiate_format, render_transcript, snippet_dicts
+from .metrics import count_upstream_requests, span, timed
+from .paging import RangeError, apply_window, parse_window, with_cursor
+from .streaming import StreamingResponse, stream_transcript, wants_stream
+
+_VIDEO_ID_PATTERNS = (
+    re.compile(r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?#]+)'),
+    re.compile(r'youtube\.com\/v\/([^&\n?#]+)'),
+)
+
+# Request headers browsers may send cross-origin, and response headers
+# their scripts may read; shared by every entry point
+CORS_ALLOW_HEADERS = ('Content-Type', 'X-API-Key', 'If-None-Match')
+CORS_EXPOSE_HEADERS = ('Retry-After', 'ETag', 'X-Next-Cursor', 'X-Stale-For', 'X-Cache-Status')
+
+_cache = None
+_cache_lock = threading.Lock()
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+class Request:
+    """The parts of an HTTP request the handlers look at"""
+    __slots__ = ('method', 'path', 'args', 'headers', 'body')
+
+    def __init__(self, method, path, args=None, headers=None, body=b''):
+        self.method = method
+        self.path = path
+        self.args = args if args is not None else {}
+        # Header lookups are case-insensitive whatever the adapter passes in
+        self.headers = {name.lower(): value for name, value in (headers or {}).items()}
+        self.body = body
+
+    def header(self, name):
+        return self.headers.get(name.lower())
+
+    def json(self):
+        """Decoded JSON body, or None when it is empty or malformed"""
+        try:
+            return json.loads(self.body or b'null')
+        except ValueError:
+            return None
+
+
+@timed('extract')
+def extract_video_id(url_or_id):
+    """Extract video ID from YouTube URL or use the ID directly"""
+    if 'youtube.com' in url_or_id or 'youtu.be' in url_or_id:
+        # Handle different YouTube URL formats
+        for pattern in _VIDEO_ID_PATTERNS:
+            match = pattern.search(url_or_id)
+            if match:
+                return match.group(1)
+        return None
+    else:
+        # Assume it's already a video ID
+        return url_or_id
+
+
+def get_cache():
+    """Return the process-wide transcript cache, opening it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from .cache import TranscriptCache
+                _cache = TranscriptCache()
+    return _cache
+
+
+def get_jobs():
+    """Return the process-wide prefetch job queue, starting its workers on first use"""
+    global _jobs
+    if _jobs is None:
+        with _jobs_lock:
+            if _jobs is None:
+                from .jobs import JOBS_AUTOSTART, JobQueue
+                _jobs = JobQueue(get_cached_transcript)
+                if JOBS_AUTOSTART:
+                    _jobs.start()
+    return _jobs
+
+
+def resume_jobs():
+    """Start the job workers at process start when the queue has unfinished work
+
+    Otherwise jobs interrupted by a restart would sit idle until someone
+    next used a /jobs endpoint. Called by the server entry points once
+    they are serving, never at import; serverless functions cannot run
+    the workers.
+    """
+    from .jobs import JOBS_AUTOSTART, has_unfinished_jobs
+    if JOBS_AUTOSTART and has_unfinished_jobs():
+        get_jobs()
+
+
+def get_transcript_with_free_methods(video_id, language='en', kind='any', max_retries=None):
+    """List the video's tracks once and fetch the best one (sync adapter over the fetch engine)"""
+    from .engine import FETCH_MAX_RETRIES, engine, fetch_transcript
+    return engine.run(fetch_transcript(video_id, language, kind, FETCH_MAX_RETRIES if max_retries is None else max_retries))
+
+
+def get_cached_transcript(video_id, language='en', kind='any'):
+    """Serve a transcript from the cache, falling back to the free methods"""
+    from .cache import make_key
+    return get_cache().get_or_fetch(
+        make_key(video_id, language, kind),
+        lambda: get_transcript_with_free_methods(video_id, language, kind)
+    )
+
+
+async def get_cached_transcript_async(video_id, language='en', kind='any'):
+    """Async variant of get_cached_transcript for the ASGI entry point"""
+    from .cache import make_key
+    from .engine import engine, fetch_transcript
+    return await get_cache().aget_or_fetch(
+        make_key(video_id, language, kind),
+        lambda: engine.arun(fetch_transcript(video_id, language, kind))
+    )
+
+
+def upstream_unavailable_response(e):
+    """Body, status and headers for a fail-fast 503 while the circuit breaker is open"""
+    return {
+        'error': str(e),
+        'retry_after': e.retry_after
+    }, 503, {'Retry-After': str(e.retry_after)}
+
+
+def quota_exceeded_response(e):
+    """Body, status and headers for a 429 when the client's fetch quota is used up"""
+    return {
+        'error': str(e),
+        'client': e.client,
+        'retry_after': e.retry_after
+    }, 429, {'Retry-After': str(e.retry_after)}
+
+
+def _fail_fast_response(error):
+    # Only the fetch engine raises UpstreamUnavailable and QuotaExceeded,
+    # so by the time one is caught the modules are loaded anyway
+    from .quota import QuotaExceeded
+    from .upstream import UpstreamUnavailable
+    if isinstance(error, UpstreamUnavailable):
+        return upstream_unavailable_response(error)
+    if isinstance(error, QuotaExceeded):
+        return quota_exceeded_response(error)
+    return None
+
+
+def _plan_transcript(request, text_only):
+    # Validate everything before any upstream work; returns an error
+    # response or (video_id, output_format, window)
+    usage_path = '/transcript/text' if text_only else '/transcript'
+    video_id_or_url = request.args.get('video_id')
+
+    if not video_id_or_url:
+        return {
+            'error': 'Missing video_id parameter',
+            'usage': f'GET {usage_path}?video_id=YOUR_VIDEO_ID_OR_URL'
+        }, 400
+
+    # Extract video ID from URL or use directly
+    video_id = extract_video_id(video_id_or_url)
+
+    if not video_id:
+        return {
+            'error': 'Invalid YouTube URL or video ID'
+        }, 400
+
+    # Pick the output format before doing any upstream work
+    try:
+        output_format = negotiate_format(request.args, request.header('Accept'))
+    except FormatError as e:
+        return {'error': str(e)}, 400
+
+    # Validate the time window / page before doing any upstream work
+    try:
+        window = parse_window(request.args)
+    except RangeError as e:
+        return {'error': str(e)}, 400
+
+    return video_id, output_format, window
+
+
+def _transcript_response(request, video_id, output_format, window, transcript, upstream, text_only,
+                         freshness):
+    streamed = not output_format and wants_stream(request.args, request.header('Accept'))
+    etag = transcript_etag(transcript, request, output_format or ('ndjson' if streamed else 'json'))
+    from .quota import is_private
+    private = is_private()
+    headers = cache_headers(etag, freshness.stale_for, private)
+
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, freshness.stale_for, private)
+
+    # Only bodies served from the cache are byte-for-byte repeatable: a
+    # fetch reports its upstream_requests
+    reusable = not output_format and not streamed and upstream.count == 0
+    encoding = negotiate_encoding(request.header('Accept-Encoding'))
+    if reusable:
+        body = cached_body(transcript, etag, encoding)
+        if body is not None:
+            return body, 200, headers
+
+    full_transcript = transcript
+    transcript, next_cursor = apply_window(transcript, window)
+
+    if output_format:
+        response = render_transcript(output_format, video_id, transcript, request.args)
+        response.headers.update(headers)
+        return with_cursor(response, next_cursor)
+
+    if streamed:
+        response = stream_transcript(video_id, transcript, upstream.count, text_only=text_only)
+        response.headers.update(headers)
+        return with_cursor(response, next_cursor)
+
+    with span('serialize'):
+        if text_only:
+            # Combine all text
+            result = {
+                'video_id': video_id,
+                'text': ' '.join([snippet.text for snippet in transcript.snippets]),
+                'upstream_requests': upstream.count
+            }
+        else:
+            # Format the response
+            formatted_transcript = snippet_dicts(transcript.snippets)
+            result = {
+                'video_id': video_id,
+                'transcript': formatted_transcript,
+                'total_entries': len(formatted_transcript),
+                'upstream_requests': upstream.count
+            }
+        if next_cursor:
+            result['next_cursor'] = next_cursor
+
+        if reusable:
+            return encode_and_remember(full_transcript, etag, encoding, result), 200, headers
+
+    return result, 200, headers
+
+
+def _fetch_failed_response(video_id, error, upstream):
+    # The engine already fell back to the watch page route
+    fallback_error = getattr(error, 'fallback_error', None)
+    if fallback_error is not None:
+        web_result = {'message': f'Watch page fallback failed: {summarize_error(fallback_error)}'}
+    else:
+        web_result = {'message': 'Watch page fallback not attempted'}
+    return {
+        'error': f'Failed to get transcript: {str(error)}',
+        'note': 'YouTube blocks requests from serverless functions (Vercel, Netlify, etc.)',
+        'free_solutions': [
+            'Deploy to Railway/Render (free tier with real IP)',
+            'Deploy to a VPS ($5/month)',
+            'Use GitHub Actions as free server',
+            'Use RapidAPI free tier',
+            'Check if video has transcripts in browser first'
+        ],
+        'web_scraping_result': web_result,
+        'video_url': f'https://www.youtube.com/watch?v={video_id}',
+        'upstream_requests': upstream.count
+    }, 500
+
+
+def transcript_handler(request, text_only=False):
+    """Handler for /transcript (and /transcript/text with text_only)"""
+    plan = _plan_transcript(request, text_only)
+    if len(plan) == 2:
+        # (body, status) for a request that failed validation
+        return plan
+    video_id, output_format, window = plan
+    from .cache import watch_freshness
+    upstream = count_upstream_requests()
+    freshness = watch_freshness()
+
+    try:
+        # Try the cache first, then the free methods
+        transcript = get_cached_transcript(video_id)
+    except Exception as e:
+        # Fail fast while YouTube is blocking us instead of piling on
+        failed = _fail_fast_response(e)
+        if failed:
+            return failed
+        return _fetch_failed_response(video_id, e, upstream)
+
+    return _transcript_response(
+        request, video_id, output_format, window, transcript, upstream, text_only, freshness
+    )
+
+
+def transcript_text_handler(request):
+    """Handler for /transcript/text"""
+    return transcript_handler(request, text_only=True)
+
+
+async def transcript_handler_async(request, text_only=False):
+    """transcript_handler for the ASGI app: the fetch is awaited on the engine,
+    serialization and compression run on a worker thread
+    """
+    import asyncio
+
+    plan = _plan_transcript(request, text_only)
+    if len(plan) == 2:
+        # (body, status) for a request that failed validation
+        return plan
+    video_id, output_format, window = plan
+    from .cache import watch_freshness
+    upstream = count_upstream_requests()
+    freshness = watch_freshness()
+
+    try:
+        # Try the cache first, then the planned fetch on the fetch engine
+        transcript = await get_cached_transcript_async(video_id)
+    except Exception as e:
+        # Fail fast while YouTube is blocking us instead of piling on
+        failed = _fail_fast_response(e)
+        if failed:
+            return failed
+        return _fetch_failed_response(video_id, e, upstream)
+
+    return await asyncio.to_thread(
+        _transcript_response,
+        request, video_id, output_format, window, transcript, upstream, text_only, freshness
+    )
+
+
+async def transcript_text_handler_async(request):
+    return await transcript_handler_async(request, text_only=True)
+
+
+def batch_handler(request):
+    """Handler for /transcripts/batch"""
+    from .batch import BatchError, parse_batch_request, run_batch
+
+    try:
+        items = parse_batch_request(request.json())
+    except BatchError as e:
+        return {
+            'error': str(e),
+            'usage': 'POST /transcripts/batch with {"video_ids": ["ID_OR_URL", ...]}'
+        }, 400
+
+    result = run_batch(items, extract_video_id, get_cached_transcript)
+    # Nothing served and every video refused by the client's quota: the
+    # whole batch is throttled
+    errors = result['errors']
+    if not result['results'] and errors and all(error.get('status') == 429 for error in errors):
+        retry_after = min(error['retry_after'] for error in errors)
+        return result, 429, {'Retry-After': str(retry_after)}
+    return result
+
+
+def search_handler(request):
+    """Handler for /search"""
+    from .search import SearchError, get_search_index, parse_search_request, search_response
+
+    try:
+        clauses, limit = parse_search_request(request.args)
+    except SearchError as e:
+        return {
+            'error': str(e),
+            'usage': 'GET /search?q=WORDS or "A PHRASE"'
+        }, 400
+
+    return search_response(request.args.get('q'), get_search_index().search(clauses, limit=limit))
+
+
+def _plan_transcript_search(request):
+    from .search import SearchError, parse_search_request
+
+    video_id_or_url = request.args.get('video_id')
+
+    if not video_id_or_url:
+        return {
+            'error': 'Missing video_id parameter',
+            'usage': 'GET /transcript/search?video_id=YOUR_VIDEO_ID_OR_URL&q=WORDS'
+        }, 400
+
+    video_id = extract_video_id(video_id_or_url)
+
+    if not video_id:
+        return {
+            'error': 'Invalid YouTube URL or video ID'
+        }, 400
+
+    try:
+        clauses, limit = parse_search_request(request.args)
+    except SearchError as e:
+        return {'error': str(e)}, 400
+
+    return video_id, clauses, limit
+
+
+def _transcript_search_failed(video_id, error):
+    return _fail_fast_response(error) or ({
+        'error': f'Failed to get transcript: {str(error)}',
+        'video_id': video_id
+    }, 500)
+
+
+def transcript_search_handler(request):
+    """Handler for /transcript/search"""
+    from .search import get_search_index, search_response
+
+    plan = _plan_transcript_search(request)
+    if len(plan) == 2:
+        return plan
+    video_id, clauses, limit = plan
+    index = get_search_index()
+    upstream = count_upstream_requests()
+
+    try:
+        if not index.contains(video_id):
+            transcript = get_cached_transcript(video_id)
+            if upstream.count:
+                # The fetch engine queued it for indexing; wait for that
+                index.flush()
+            else:
+                # Cache hits never reach the fetch engine, so index them here
+                index.add(transcript)
+    except Exception as e:
+        return _transcript_search_failed(video_id, e)
+
+    return search_response(request.args.get('q'), index.search(clauses, video_id, limit), video_id)
+
+
+async def transcript_search_handler_async(request):
+    """transcript_search_handler for the ASGI app"""
+    import asyncio
+    from .search import get_search_index, search_response
+
+    plan = _plan_transcript_search(request)
+    if len(plan) == 2:
+        return plan
+    video_id, clauses, limit = plan
+    index = get_search_index()
+    upstream = count_upstream_requests()
+
+    try:
+        if not await asyncio.to_thread(index.contains, video_id):
+            transcript = await get_cached_transcript_async(video_id)
+            if upstream.count:
+                # The fetch engine queued it for indexing; wait for that
+                await asyncio.to_thread(index.flush)
+            else:
+                # Cache hits never reach the fetch engine, so index them here
+                await asyncio.to_thread(index.add, transcript)
+    except Exception as e:
+        return _transcript_search_failed(video_id, e)
+
+    results = await asyncio.to_thread(index.search, clauses, video_id, limit)
+    return search_response(request.args.get('q'), results, video_id)
+
+
+def jobs_handler(request):
+    """Handler for POST /jobs"""
+    from .jobs import JobError, parse_job_request
+
+    try:
+        sources = parse_job_request(request.json(), extract_video_id)
+    except JobError as e:
+        return {
+            'error': str(e),
+            'usage': 'POST /jobs with {"playlist": URL_OR_ID, "channel": URL_OR_HANDLE, "video_ids": [...]}'
+        }, 400
+
+    job_id = get_jobs().submit(sources)
+    return {
+        'job_id': job_id,
+        'status_url': f'/jobs/{job_id}'
+    }, 202, {'Location': f'/jobs/{job_id}'}
+
+
+def job_status_handler(request):
+    """Handler for GET /jobs/<id>"""
+    from .jobs import JobError
+
+    try:
+        return get_jobs().status(request.path[len('/jobs/'):])
+    except JobError as e:
+        return {'error': str(e)}, 404
+
+
+def jobs_stats_handler(request):
+    """Handler for GET /jobs"""
+    return get_jobs().stats()
+
+
+def cache_stats_handler(request):
+    """Handler for /cache/stats"""
+    return get_cache().stats()
+
+
+def http_stats_handler(request):
+    """Handler for /http/stats"""
+    from .http_client import connection_stats
+    return connection_stats()
+
+
+def egress_stats_handler(request):
+    """Handler for /egress/stats"""
+    from .egress import get_pool
+    return get_pool().stats()
+
+
+def quota_stats_handler(request):
+    """Handler for /quota/stats"""
+    from .quota import get_quotas
+    return get_quotas().stats()
+
+
+def fetch_stats_handler(request):
+    """Handler for /fetch/stats"""
+    from .engine import fetch_stats
+    return fetch_stats()
+
+
+def metrics_handler(request):
+    """Handler for /metrics"""
+    from .engine import fetch_stats
+    from .http_client import connection_stats
+    from .metrics import render_metrics
+    return render_metrics({
+        'transcript_cache': get_cache().stats(),
+        'transcript_fetch': fetch_stats(),
+        'transcript_http': connection_stats()
+    })
+
+
+API_DOCS = {
+    'message': 'YouTube Transcript API (Free Version)',
+    'endpoints': {
+        '/transcript': {
+            'method': 'GET',
+            'params': 'video_id (YouTube video ID or URL)',
+            'description': 'Get transcript with timing information'
+        },
+        '/transcript/text': {
+            'method': 'GET',
+            'params': 'video_id (YouTube video ID or URL)',
+            'description': 'Get transcript as plain text'
+        },
+        '/transcripts/batch': {
+            'method': 'POST',
+            'body': '{"video_ids": [YouTube video IDs or URLs]}',
+            'description': 'Get transcripts for many videos concurrently'
+        },
+        '/search': {
+            'method': 'GET',
+            'params': 'q (words and "quoted phrases"), limit',
+            'description': 'Search all transcripts fetched so far'
+        },
+        '/transcript/search': {
+            'method': 'GET',
+            'params': 'video_id (YouTube video ID or URL), q, limit',
+            'description': "Search one video's transcript"
+        },
+        '/jobs': {
+            'method': 'POST',
+            'body': '{"playlist": URL or ID, "channel": URL, ID or @handle, "video_ids": [...]}',
+            'description': 'Queue a background prefetch of whole playlists or channels into the cache'
+        },
+        '/jobs/<job_id>': {
+            'method': 'GET',
+            'description': 'Progress, failures and throughput of a prefetch job'
+        },
+        '/cache/stats': {
+            'method': 'GET',
+            'description': 'Transcript cache hit/miss/eviction counters'
+        },
+        '/http/stats': {
+            'method': 'GET',
+            'description': 'Pooled HTTP connection reuse counters'
+        },
+        '/fetch/stats': {
+            'method': 'GET',
+            'description': 'Fetch engine counters, including coalesced requests'
+        },
+        '/egress/stats': {
+            'method': 'GET',
+            'description': 'Health score, latency, blocks and cooldown of each egress proxy'
+        },
+        '/quota/stats': {
+            'method': 'GET',
+            'description': 'Requests, upstream fetches and throttled fetches per API key'
+        },
+        '/metrics': {
+            'method': 'GET',
+            'description': 'Prometheus metrics: request phase timings, fetch method outcomes, cache and engine counters'
+        }
+    },
+    'examples': {
+        'by_video_id': '/transcript?video_id=dQw4w9WgXcQ',
+        'by_url': '/transcript?video_id=https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    },
+    'note': 'Due to YouTube blocking serverless function IPs, this API may not work reliably.',
+    'free_alternatives': [
+        'Deploy to Railway/Render (free tier)',
+        'Use RapidAPI free tier',
+        'Deploy to VPS ($5/month)',
+        'Use GitHub Actions as free server'
+    ]
+}
+
+
+def home_handler(request):
+    """Handler for / (API documentation)"""
+    return API_DOCS
+
+
+ROUTES = {
+    ('GET', '/transcript'): transcript_handler,
+    ('GET', '/transcript/text'): transcript_text_handler,
+    ('POST', '/transcripts/batch'): batch_handler,
+    ('GET', '/search'): search_handler,
+    ('GET', '/transcript/search'): transcript_search_handler,
+    ('GET', '/cache/stats'): cache_stats_handler,
+    ('GET', '/http/stats'): http_stats_handler,
+    ('GET', '/fetch/stats'): fetch_stats_handler,
+    ('GET', '/egress/stats'): egress_stats_handler,
+    ('GET', '/quota/stats'): quota_stats_handler,
+    ('GET', '/metrics'): metrics_handler,
+    ('POST', '/jobs'): jobs_handler,
+    ('GET', '/jobs'): jobs_stats_handler,
+    ('GET', '/'): home_handler,
+}
+
+# Paths ending in an ID, matched by prefix
+PREFIX_ROUTES = {
+    ('GET', '/jobs/'): job_status_handler,
+}
+
+# Endpoints that await upstream work on the fetch engine under ASGI
+ASYNC_ROUTES = {
+    ('GET', '/transcript'): transcript_handler_async,
+    ('GET', '/transcript/text'): transcript_text_handler_async,
+    ('GET', '/transcript/search'): transcript_search_handler_async,
+}
+
+_PATHS = {path for _, path in ROUTES}
+_PREFIXES = {prefix for _, prefix in PREFIX_ROUTES}
+
+
+def _prefix(path):
+    for prefix in _PREFIXES:
+        if path.startswith(prefix) and len(path) > len(prefix):
+            return prefix
+    return None
+
+
+def route_name(path):
+    """Path with any trailing ID replaced, for bounded metric labels"""
+    prefix = _prefix(path)
+    return prefix + '<id>' if prefix else path
+
+
+def _find(request):
+    handler = ROUTES.get((request.method, request.path))
+    if handler is None:
+        prefix = _prefix(request.path)
+        if prefix:
+            handler = PREFIX_ROUTES.get((request.method, prefix))
+    return handler
+
+
+def _unrouted(request):
+    if request.path in _PATHS or _prefix(request.path):
+        return {'error': 'Method not allowed'}, 405
+    return {'error': 'Not found'}, 404
+
+
+def _identify(request):
+    # Attribute the request to its API client; an error response for a
+    # key that is not configured
+    from .quota import UnknownApiKey, identify
+    try:
+        identify(request)
+    except UnknownApiKey as e:
+        return {'error': str(e)}, 401
+    return None
+
+
+def dispatch(request):
+    """Route a Request to its handler"""
+    handler = _find(request)
+    if handler is None:
+        return _unrouted(request)
+    rejected = _identify(request)
+    if rejected:
+        return rejected
+    return handler(request)
+
+
+async def dispatch_async(request):
+    """Route a Request from an event loop; blocking handlers run on a thread"""
+    import asyncio
+
+    handler = _find(request)
+    if handler is None:
+        return _unrouted(request)
+    rejected = _identify(request)
+    if rejected:
+        return rejected
+    key = (request.method, request.path)
+    if key in ASYNC_ROUTES:
+        return await ASYNC_ROUTES[key](request)
+    return await asyncio.to_thread(handler, request)
+
+
+def split_response(response):
+    """(body, status, headers) for a handler result that is not streamed"""
+    if isinstance(response, tuple):
+        if len(response) == 3:
+            return response
+        body, status = response
+        return body, status, {}
+    return response, 200, {}
+
+
+def render(response, request):
+    """Final (status, headers, body) of a handler result
+
+    body is bytes, or an iterator of byte chunks for a streamed response.
+    JSON is serialized here and bodies are compressed as the client's
+    Accept-Encoding allows; headers include Content-Type and, for bytes,
+    Content-Length.
+    """
+    encoding = negotiate_encoding(request.header('Accept-Encoding'))
+
+    if isinstance(response, StreamingResponse):
+        headers = dict(response.headers)
+        headers['Content-Type'] = response.content_type
+        chunks = response.chunks
+        if encoding:
+            chunks = compress_chunks(chunks, encoding)
+            headers['Content-Encoding'] = encoding
+        headers.setdefault('Vary', 'Accept-Encoding')
+        return 200, headers, chunks
+
+    data, status, headers = split_response(response)
+    headers = dict(headers)
+    if status == 304:
+        return status, headers, b''
+
+    if not isinstance(data, EncodedBody):
+        with span('serialize'):
+            data = encode(json.dumps(data).encode(), encoding)
+    headers['Content-Type'] = data.content_type
+    if data.encoding:
+        headers['Content-Encoding'] = data.encoding
+    headers.setdefault('Vary', 'Accept-Encoding')
+    headers['Content-Length'] = str(len(data.body))
+    return status, headers, data.body
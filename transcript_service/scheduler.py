@@ -0,0 +1,103 @@
+"""Weighted fair sharing of upstream fetch slots between clients"""
+import asyncio
+import os
+from collections import deque
+
+from .metrics import Labelled
+
+# Fetches allowed to work on YouTube at once; the rest queue per client
+FAIR_FETCH_SLOTS = int(os.environ.get('FAIR_FETCH_SLOTS', 8))
+
+
+class FairScheduler:
+    """Bound concurrent fetches and hand free slots out by weighted round-robin
+
+    While every slot is busy, each client's fetches wait in a queue of
+    their own. A freed slot goes to the next client in smooth weighted
+    round-robin order, so a client flooding the service with cache misses
+    gets its weighted share of YouTube capacity rather than all of it.
+
+    Like SingleFlight, must only be used from the fetch engine's loop.
+    """
+
+    def __init__(self, slots=FAIR_FETCH_SLOTS):
+        self.slots = slots
+        self._active = 0
+        self._queues = {}
+        self._weights = {}
+        self._current = {}
+        self._stats = {'admitted': 0, 'queued': 0}
+        self._granted = {}
+
+    async def run(self, client, weight, make_coro):
+        """Await make_coro() once the client has been given a slot"""
+        if self._active < self.slots and not self._queues:
+            self._active += 1
+        else:
+            await self._wait(client, weight)
+        self._stats['admitted'] += 1
+        self._granted[client] = self._granted.get(client, 0) + 1
+        try:
+            return await make_coro()
+        finally:
+            self._release()
+
+    async def _wait(self, client, weight):
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(client)
+        if queue is None:
+            queue = self._queues[client] = deque()
+            self._current[client] = 0
+        queue.append(waiter)
+        self._weights[client] = weight
+        self._stats['queued'] += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Handed a slot just as the wait was cancelled: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    def _pick(self):
+        # Smooth weighted round-robin (as in nginx): every waiting client
+        # gains its weight, the leader is served and pays back the total
+        total = 0
+        best = None
+        for client in self._queues:
+            self._current[client] += self._weights[client]
+            total += self._weights[client]
+            if best is None or self._current[client] > self._current[best]:
+                best = client
+        self._current[best] -= total
+        return best
+
+    def _release(self):
+        # The slot passes straight to the next waiter, if any
+        while self._queues:
+            client = self._pick()
+            queue = self._queues[client]
+            waiter = queue.popleft()
+            if not queue:
+                del self._queues[client]
+                del self._current[client]
+            if not waiter.cancelled():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self):
+        # Client names are label values in /metrics, never part of a name
+        clients = Labelled('client')
+        for client, admitted in self._granted.items():
+            clients[client] = {'admitted': admitted, 'waiting': 0}
+        for client, queue in self._queues.items():
+            clients.setdefault(client, {'admitted': 0})['waiting'] = len(queue)
+        return {
+            'slots': self.slots,
+            'active': self._active,
+            'waiting': sum(len(queue) for queue in self._queues.values()),
+            'admitted': self._stats['admitted'],
+            'queued': self._stats['queued'],
+            'clients': clients
+        }
@@ -0,0 +1,277 @@
+"""Full-text search over fetched transcripts
+
+A positional inverted index kept in SQLite next to the transcript cache.
+Every transcript the fetch engine retrieves is queued for indexing on a
+single writer thread, so fetches never wait on it. Term positions run
+across the whole transcript, which lets a quoted phrase match even when
+it spans two snippets; the match is reported at the snippet it starts in.
+
+Only SQLite's page cache is held in memory, and the number of indexed
+videos is capped: the oldest indexed ones are dropped first.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import CACHE_DIR
+
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH', os.path.join(CACHE_DIR, 'search.sqlite3'))
+SEARCH_INDEX_MAX_VIDEOS = int(os.environ.get('SEARCH_INDEX_MAX_VIDEOS', 5000))
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 500))
+SEARCH_DEFAULT_RESULTS = 50
+# SQLite page cache per connection, in KiB
+SEARCH_CACHE_KIB = int(os.environ.get('SEARCH_CACHE_KIB', 4096))
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+_CLAUSE = re.compile(r'"([^"]*)"|(\S+)')
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS documents ('
+    'id INTEGER PRIMARY KEY, video_id TEXT, language_code TEXT, language TEXT, '
+    'is_generated INTEGER, indexed_at REAL, UNIQUE (video_id, language_code))',
+    'CREATE TABLE IF NOT EXISTS snippets ('
+    'doc INTEGER, idx INTEGER, start REAL, duration REAL, text TEXT, '
+    'PRIMARY KEY (doc, idx)) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS postings ('
+    'term TEXT, doc INTEGER, position INTEGER, idx INTEGER, '
+    'PRIMARY KEY (term, doc, position)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc)',
+)
+
+
+class SearchError(ValueError):
+    """Raised for a missing or malformed search query"""
+
+
+def tokenize(text):
+    """Lowercased word tokens of text"""
+    return [token.lower() for token in _TOKEN.findall(text)]
+
+
+def parse_query(query):
+    """Split a query into clauses; each clause is a tuple of terms
+
+    A quoted phrase is one clause, every other word is its own clause, and
+    a snippet matches when all clauses match.
+    """
+    clauses = []
+    for phrase, word in _CLAUSE.findall(query or ''):
+        terms = tuple(tokenize(phrase if phrase else word))
+        if terms:
+            clauses.append(terms)
+    if not clauses:
+        raise SearchError('q must contain at least one word')
+    return clauses
+
+
+def parse_search_request(args):
+    """Read q and limit from request args; returns (clauses, limit)"""
+    clauses = parse_query(args.get('q'))
+    limit = SEARCH_DEFAULT_RESULTS
+    if args.get('limit') is not None:
+        try:
+            limit = int(args.get('limit'))
+        except ValueError:
+            raise SearchError('limit must be an integer')
+        if not 1 <= limit <= SEARCH_MAX_RESULTS:
+            raise SearchError(f'limit must be between 1 and {SEARCH_MAX_RESULTS}')
+    return clauses, limit
+
+
+class SearchIndex:
+    """Positional inverted index of transcript snippets, stored in SQLite"""
+
+    def __init__(self, path=SEARCH_INDEX_PATH, max_videos=SEARCH_INDEX_MAX_VIDEOS):
+        self.max_videos = max_videos
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search-index')
+        self._pending = 0
+        self._stats = {'indexed': 0, 'evicted': 0, 'queries': 0, 'errors': 0}
+        self._db = self._open(path)
+
+    def _open(self, path):
+        # Like the cache, fall back to memory when the disk is read-only;
+        # the video cap still bounds it
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+        except (sqlite3.Error, OSError):
+            db = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+        db.execute(f'PRAGMA cache_size=-{SEARCH_CACHE_KIB}')
+        for statement in _SCHEMA:
+            db.execute(statement)
+        return db
+
+    def add_later(self, transcript):
+        """Queue a transcript for indexing on the writer thread"""
+        with self._lock:
+            self._pending += 1
+        self._writer.submit(self._add_queued, transcript)
+
+    def flush(self):
+        """Wait until every transcript queued so far has been indexed"""
+        # The writer is a single thread working in order
+        self._writer.submit(lambda: None).result()
+
+    def _add_queued(self, transcript):
+        try:
+            self.add(transcript)
+        except sqlite3.Error:
+            with self._lock:
+                self._stats['errors'] += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def contains(self, video_id):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT 1 FROM documents WHERE video_id = ? LIMIT 1', (video_id,)
+            ).fetchone()
+        return row is not None
+
+    def add(self, transcript):
+        """Index (or re-index) a CompactTranscript"""
+        rows = []
+        postings = []
+        position = 0
+        for idx, snippet in enumerate(transcript.snippets):
+            rows.append((idx, snippet.start, snippet.duration, snippet.text))
+            for term in tokenize(snippet.text):
+                postings.append((term, position, idx))
+                position += 1
+
+        with self._lock:
+            db = self._db
+            db.execute('BEGIN')
+            try:
+                self._delete(transcript.video_id, transcript.language_code)
+                doc = db.execute(
+                    'INSERT INTO documents (video_id, language_code, language, is_generated, indexed_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (transcript.video_id, transcript.language_code, transcript.language,
+                     int(transcript.is_generated), time.time())
+                ).lastrowid
+                db.executemany(
+                    'INSERT INTO snippets VALUES (?, ?, ?, ?, ?)',
+                    ((doc,) + row for row in rows)
+                )
+                db.executemany(
+                    'INSERT INTO postings VALUES (?, ?, ?, ?)',
+                    ((term, doc, position, idx) for term, position, idx in postings)
+                )
+                self._evict()
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            self._stats['indexed'] += 1
+
+    def _delete(self, video_id, language_code, doc=None):
+        db = self._db
+        if doc is None:
+            row = db.execute(
+                'SELECT id FROM documents WHERE video_id = ? AND language_code = ?',
+                (video_id, language_code)
+            ).fetchone()
+            if row is None:
+                return
+            doc = row[0]
+        db.execute('DELETE FROM postings WHERE doc = ?', (doc,))
+        db.execute('DELETE FROM snippets WHERE doc = ?', (doc,))
+        db.execute('DELETE FROM documents WHERE id = ?', (doc,))
+
+    def _evict(self):
+        # Drop the least recently indexed videos beyond the cap
+        (count,) = self._db.execute('SELECT COUNT(*) FROM documents').fetchone()
+        if count <= self.max_videos:
+            return
+        for (doc,) in self._db.execute(
+            'SELECT id FROM documents ORDER BY indexed_at LIMIT ?', (count - self.max_videos,)
+        ).fetchall():
+            self._delete(None, None, doc)
+            self._stats['evicted'] += 1
+
+    def search(self, clauses, video_id=None, limit=SEARCH_DEFAULT_RESULTS):
+        """Snippets matching every clause, most recently indexed videos first"""
+        # One compound query: SQLite intersects the clauses and applies the
+        # limit itself, so common terms never materialize in Python
+        selects = []
+        params = []
+        for clause in clauses:
+            sql, clause_params = self._clause_sql(clause, video_id)
+            selects.append(sql)
+            params.extend(clause_params)
+        sql = ' INTERSECT '.join(selects) + ' ORDER BY 1 DESC, 2 LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            self._stats['queries'] += 1
+            return self._results(self._db.execute(sql, params).fetchall())
+
+    def _clause_sql(self, clause, video_id):
+        # A phrase is a chain of self-joins on consecutive positions
+        joins = ''.join(
+            f' JOIN postings p{i} ON p{i}.term = ? AND p{i}.doc = p0.doc'
+            f' AND p{i}.position = p0.position + {i}'
+            for i in range(1, len(clause))
+        )
+        sql = f'SELECT DISTINCT p0.doc, p0.idx FROM postings p0{joins} WHERE p0.term = ?'
+        params = list(clause[1:]) + [clause[0]]
+        if video_id is not None:
+            sql += ' AND p0.doc IN (SELECT id FROM documents WHERE video_id = ?)'
+            params.append(video_id)
+        return sql, params
+
+    def _results(self, matches):
+        results = []
+        for doc, idx in matches:
+            video_id, language_code, start, duration, text = self._db.execute(
+                'SELECT d.video_id, d.language_code, s.start, s.duration, s.text '
+                'FROM snippets s JOIN documents d ON d.id = s.doc WHERE s.doc = ? AND s.idx = ?',
+                (doc, idx)
+            ).fetchone()
+            results.append({
+                'video_id': video_id,
+                'language_code': language_code,
+                'text': text,
+                'start': start,
+                'duration': duration
+            })
+        return results
+
+    def stats(self):
+        """Return index size and activity counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+            stats['videos'] = self._db.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        stats['max_videos'] = self.max_videos
+        return stats
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Return the process-wide search index, opening it on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex()
+    return _index
+
+
+def search_response(query, results, video_id=None):
+    """JSON body shared by the search endpoints"""
+    response = {'query': query}
+    if video_id is not None:
+        response['video_id'] = video_id
+    response['results'] = results
+    response['total_results'] = len(results)
+    return response
@@ -0,0 +1,46 @@
+"""Request coalescing for concurrent fetches of the same video"""
+import asyncio
+
+
+class SingleFlight:
+    """Share one in-flight coroutine among concurrent callers with the same key
+
+    Must only be used from a single event loop (the fetch engine's), which
+    is what makes the bookkeeping safe without locks.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._stats = {
+            'calls': 0,
+            'fetches': 0,
+            'coalesced': 0,
+        }
+
+    async def do(self, key, make_coro):
+        """Await the in-flight call for key, starting make_coro() if there is none"""
+        self._stats['calls'] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats['fetches'] += 1
+            task = asyncio.ensure_future(make_coro())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._stats['coalesced'] += 1
+        # Shield so one caller timing out or disconnecting does not cancel
+        # the fetch the other callers are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """Return call/fetch/coalesced counters"""
+        stats = dict(self._stats)
+        stats['in_flight'] = len(self._inflight)
+        return stats
@@ -0,0 +1,57 @@
+"""Streaming NDJSON responses for long transcripts
+
+Snippets are encoded one line at a time and flushed in fixed-size chunks,
+so serialization memory stays bounded however long the transcript is.
+"""
+import json
+import os
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 256))
+
+
+class StreamingResponse:
+    """A response body produced lazily, chunk by chunk"""
+    __slots__ = ('chunks', 'content_type', 'headers')
+
+    def __init__(self, chunks, content_type=NDJSON_MIMETYPE, headers=None):
+        self.chunks = chunks
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+def wants_stream(args, accept=None):
+    """Whether the client asked for a streamed NDJSON response"""
+    if (args.get('stream') or '').lower() in ('1', 'true', 'yes'):
+        return True
+    return NDJSON_MIMETYPE in (accept or '')
+
+
+def iter_ndjson(snippets, text_only=False, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield snippets as NDJSON lines, batched into byte chunks"""
+    dumps = json.dumps
+    lines = []
+    for snippet in snippets:
+        if text_only:
+            lines.append('{"text": %s}\n' % dumps(snippet.text))
+        else:
+            lines.append('{"text": %s, "start": %s, "duration": %s}\n' % (
+                dumps(snippet.text), dumps(snippet.start), dumps(snippet.duration)
+            ))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines).encode()
+            lines = []
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def stream_transcript(video_id, transcript, upstream_requests=None, text_only=False):
+    """Build a streaming NDJSON response for a fetched transcript"""
+    snippets = transcript.snippets
+    headers = {
+        'X-Video-Id': video_id,
+        'X-Total-Entries': str(len(snippets))
+    }
+    if upstream_requests is not None:
+        headers['X-Upstream-Requests'] = str(upstream_requests)
+    return StreamingResponse(iter_ndjson(snippets, text_only), headers=headers)
@@ -0,0 +1,191 @@
+"""Protection for the upstream YouTube capacity
+
+An adaptive token bucket paces outbound calls and slows down as the recent
+block rate rises; a circuit breaker stops calling YouTube altogether after
+repeated blocks, then probes with a single half-open request before
+letting traffic through again. Both are driven from the fetch engine loop.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+from youtube_transcript_api import RequestBlocked, YouTubeRequestFailed
+
+UPSTREAM_RATE = float(os.environ.get('UPSTREAM_RATE', 5))
+UPSTREAM_MIN_RATE = float(os.environ.get('UPSTREAM_MIN_RATE', 0.2))
+UPSTREAM_BURST = float(os.environ.get('UPSTREAM_BURST', 10))
+UPSTREAM_WINDOW = float(os.environ.get('UPSTREAM_WINDOW', 60))
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 3))
+BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 30))
+BREAKER_MAX_OPEN_SECONDS = float(os.environ.get('BREAKER_MAX_OPEN_SECONDS', 600))
+BREAKER_HALF_OPEN_PROBES = int(os.environ.get('BREAKER_HALF_OPEN_PROBES', 1))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling YouTube while the circuit breaker is open"""
+
+    def __init__(self, retry_after):
+        self.retry_after = max(int(retry_after + 0.999), 1)
+        super().__init__(
+            f'YouTube is currently blocking this server; retry in {self.retry_after}s'
+        )
+
+
+def is_blocked(error):
+    """Whether an upstream error means YouTube is blocking or throttling us"""
+    if isinstance(error, RequestBlocked):
+        return True
+    return isinstance(error, YouTubeRequestFailed) and '429' in str(error)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate follows the recent block rate"""
+
+    def __init__(self, max_rate=UPSTREAM_RATE, min_rate=UPSTREAM_MIN_RATE,
+                 burst=UPSTREAM_BURST, window=UPSTREAM_WINDOW):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.window = window
+        self.rate = max_rate
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._outcomes = deque()
+        self._waits = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, cost=1):
+        """Wait until cost tokens are available and take them"""
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return
+            self._waits += 1
+            await asyncio.sleep((cost - self._tokens) / self.rate)
+
+    def record(self, blocked):
+        """Record an upstream outcome and re-derive the allowed rate"""
+        now = time.monotonic()
+        self._outcomes.append((now, blocked))
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+        self._refill(now)
+        # Squared so a few blocks already halve the pace
+        healthy = 1 - self.block_rate()
+        self.rate = max(self.min_rate, self.max_rate * healthy * healthy)
+
+    def block_rate(self):
+        """Fraction of upstream calls in the window that were blocked"""
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, blocked in self._outcomes if blocked) / len(self._outcomes)
+
+    def stats(self):
+        return {
+            'rate': round(self.rate, 3),
+            'max_rate': self.max_rate,
+            'tokens': round(self._tokens, 3),
+            'recent_calls': len(self._outcomes),
+            'recent_block_rate': round(self.block_rate(), 3),
+            'waits': self._waits
+        }
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated blocks -> half-open probe -> closed"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 open_seconds=BREAKER_OPEN_SECONDS, max_open_seconds=BREAKER_MAX_OPEN_SECONDS,
+                 half_open_probes=BREAKER_HALF_OPEN_PROBES):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._failures = 0
+        self._open_for = open_seconds
+        self._open_until = 0.0
+        self._probes = 0
+        # Bumped on every state change; an outcome is only counted against
+        # the state its call was admitted in
+        self._generation = 0
+        self._stats = {'trips': 0, 'rejected': 0}
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through"""
+        return max(self._open_until - time.monotonic(), 0)
+
+    def is_open(self):
+        return self.state == OPEN and self.retry_after() > 0
+
+    def before_call(self):
+        """Admit an upstream call or raise UpstreamUnavailable
+
+        Returns the generation to hand back to after_call.
+        """
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                self._stats['rejected'] += 1
+                raise UpstreamUnavailable(self.retry_after())
+            self._set_state(HALF_OPEN)
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self._stats['rejected'] += 1
+                raise UpstreamUnavailable(1)
+            self._probes += 1
+        return self._generation
+
+    def after_call(self, generation, blocked):
+        """Record the outcome of an admitted call; None means it never finished
+
+        A call admitted before the last state change finished late: it
+        neither holds a probe slot nor says anything about the current state.
+        """
+        if generation != self._generation:
+            return
+        if self.state == HALF_OPEN:
+            self._probes -= 1
+        if blocked is None:
+            return
+        if not blocked:
+            # Any answer that is not a block proves YouTube is serving us again
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+            self._failures = 0
+            self._open_for = self.open_seconds
+            return
+        self._failures += 1
+        if self.state == HALF_OPEN:
+            # Failed probe: stay open longer each time
+            self._trip(min(self._open_for * 2, self.max_open_seconds))
+        elif self.state == CLOSED and self._failures >= self.failure_threshold:
+            self._trip(self.open_seconds)
+
+    def _set_state(self, state):
+        self.state = state
+        self._generation += 1
+
+    def _trip(self, open_for):
+        self._set_state(OPEN)
+        self._open_for = open_for
+        self._open_until = time.monotonic() + open_for
+        self._stats['trips'] += 1
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['state'] = self.state
+        stats['consecutive_blocks'] = self._failures
+        stats['retry_after'] = round(self.retry_after(), 1) if self.state == OPEN else 0
+        return stats
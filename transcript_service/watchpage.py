@@ -0,0 +1,220 @@
+"""Caption tracks straight from the watch page
+
+A second fetch route, independent of the library's innertube player
+request: the watch page is streamed, its embedded player response is
+scanned for ``"captionTracks"`` as the bytes arrive, and the download is
+abandoned as soon as the track list has been read, typically well before
+the multi-megabyte page ends. The chosen track's timedtext XML is then
+fetched directly.
+
+Caption URLs on the web player increasingly require a proof-of-origin
+token (``&exp=xpe``), which this route cannot produce; such tracks raise
+``PoTokenRequired`` like the library does.
+"""
+import html
+import json
+import os
+import re
+
+from .compact import CompactTranscript
+from .http_client import YOUTUBE_ORIGIN
+from .metrics import registry
+
+WATCH_PAGE_CHUNK_SIZE = int(os.environ.get('WATCH_PAGE_CHUNK_SIZE', 16 * 1024))
+# Give up on pages that never show a player response
+WATCH_PAGE_MAX_BYTES = int(os.environ.get('WATCH_PAGE_MAX_BYTES', 4 * 1024 * 1024))
+
+BROWSER_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
+)
+
+_TRACKS_MARKER = b'"captionTracks":'
+_PLAYER_MARKER = b'ytInitialPlayerResponse = {'
+# JSON inside a script never contains a raw "</script>", so this ends the
+# player response
+_PLAYER_END = b';</script>'
+_RECAPTCHA = b'class="g-recaptcha"'
+_TAIL = max(len(_TRACKS_MARKER), len(_PLAYER_MARKER), len(_RECAPTCHA)) - 1
+
+_TAGS = re.compile(r'<[^>]*>')
+
+registry.describe('transcript_watch_page_bytes_total', 'counter', 'Watch page bytes read, and bytes skipped by stopping early')
+
+
+class WatchPageError(Exception):
+    """Raised when the watch page holds no usable player response"""
+
+
+class CaptionTrackScanner:
+    """Incremental search for the caption track list in a watch page
+
+    Feed the page in chunks of bytes; ``feed`` returns True once there is
+    an answer: ``tracks`` is the list of track dicts (empty when the player
+    response has no captions) or ``blocked`` is set for a bot check page.
+    Scanning works on bytes, so chunks may split UTF-8 sequences anywhere.
+    """
+
+    def __init__(self):
+        self.tracks = None
+        self.blocked = False
+        self.in_player = False
+        self._tail = b''
+        self._array = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        if self.tracks is not None or self.blocked:
+            return True
+        if self._array is not None:
+            return self._scan(chunk)
+
+        data = self._tail + chunk
+        if _RECAPTCHA in data:
+            self.blocked = True
+            return True
+        index = data.find(_TRACKS_MARKER)
+        if index >= 0:
+            self._array = bytearray()
+            return self._scan(data[index + len(_TRACKS_MARKER):])
+
+        if not self.in_player:
+            start = data.find(_PLAYER_MARKER)
+            if start >= 0:
+                self.in_player = True
+                # Nothing before the player response may match its end
+                data = data[start:]
+        if self.in_player and _PLAYER_END in data:
+            # The whole player response went by without caption tracks
+            self.tracks = []
+            return True
+        self._tail = data[-_TAIL:]
+        return False
+
+    def _scan(self, data):
+        # Bracket matching that skips over JSON strings; only the bytes of
+        # the track array itself go through this loop
+        depth = self._depth
+        in_string = self._in_string
+        escaped = self._escaped
+        for index, byte in enumerate(data):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif byte == 0x5C:  # backslash
+                    escaped = True
+                elif byte == 0x22:  # quote
+                    in_string = False
+            elif byte == 0x22:
+                in_string = True
+            elif byte == 0x5B:  # [
+                depth += 1
+            elif byte == 0x5D:  # ]
+                depth -= 1
+                if depth == 0:
+                    self._array += data[:index + 1]
+                    self.tracks = json.loads(bytes(self._array).strip())
+                    return True
+        self._array += data
+        self._depth, self._in_string, self._escaped = depth, in_string, escaped
+        return False
+
+
+def _track_name(track):
+    name = track.get('name') or {}
+    if 'simpleText' in name:
+        return name['simpleText']
+    return ''.join(run.get('text', '') for run in name.get('runs', ()))
+
+
+class WatchPageTrack:
+    """A caption track listed on the watch page, shaped for ``select_track``
+
+    Translations would need the player's translation language list, which
+    comes after the track list and is not read.
+    """
+    is_translatable = False
+    translation_languages = ()
+
+    def __init__(self, video_id, track):
+        self.video_id = video_id
+        self.url = track['baseUrl']
+        self.language = _track_name(track)
+        self.language_code = track.get('languageCode', '')
+        self.is_generated = track.get('kind') == 'asr'
+
+    def __repr__(self):
+        return f'{self.language_code} ("{self.language}")'
+
+
+def fetch_caption_tracks(session, video_id, timeout=10):
+    """Stream the watch page until its caption tracks are known"""
+    from youtube_transcript_api import IpBlocked, RequestBlocked, TranscriptsDisabled
+
+    headers = {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+    }
+    if session.headers.get('User-Agent', '').startswith('python-requests'):
+        # Egress exits without a configured user agent
+        headers['User-Agent'] = BROWSER_USER_AGENT
+
+    scanner = CaptionTrackScanner()
+    read = 0
+    with session.get(f'{YOUTUBE_ORIGIN}/watch?v={video_id}', headers=headers,
+                     timeout=timeout, stream=True) as response:
+        if response.status_code == 429:
+            raise IpBlocked(video_id)
+        if response.status_code != 200:
+            raise WatchPageError(f'Watch page answered {response.status_code}')
+        for chunk in response.iter_content(WATCH_PAGE_CHUNK_SIZE):
+            read += len(chunk)
+            if scanner.feed(chunk) or read >= WATCH_PAGE_MAX_BYTES:
+                break
+        # Bytes off the wire, before any gzip decoding
+        received = response.raw.tell()
+        length = response.headers.get('Content-Length', '')
+
+    registry.inc('transcript_watch_page_bytes_total', (('part', 'read'),), received)
+    if length.isdigit() and int(length) > received:
+        registry.inc('transcript_watch_page_bytes_total', (('part', 'skipped'),), int(length) - received)
+
+    if scanner.blocked:
+        raise RequestBlocked(video_id)
+    if scanner.tracks is None:
+        if scanner.in_player:
+            raise WatchPageError('Watch page player response was cut off')
+        # Consent interstitials and error pages have no player response
+        raise WatchPageError('Watch page has no player response')
+    if not scanner.tracks:
+        raise TranscriptsDisabled(video_id)
+    return [WatchPageTrack(video_id, track) for track in scanner.tracks]
+
+
+def fetch_track(session, track, timeout=10):
+    """Download and parse one watch page track's timedtext XML"""
+    from defusedxml import ElementTree
+    from youtube_transcript_api import IpBlocked, PoTokenRequired
+
+    if '&exp=xpe' in track.url:
+        raise PoTokenRequired(track.video_id)
+    response = session.get(track.url.replace('&fmt=srv3', ''), timeout=timeout)
+    if response.status_code == 429:
+        raise IpBlocked(track.video_id)
+    if response.status_code != 200 or not response.content:
+        raise WatchPageError(f'Caption track answered {response.status_code}')
+
+    snippets = []
+    for element in ElementTree.fromstring(response.content):
+        if element.text is None:
+            continue
+        snippets.append((
+            _TAGS.sub('', html.unescape(element.text)),
+            float(element.attrib['start']),
+            float(element.attrib.get('dur', '0.0'))
+        ))
+    return CompactTranscript(
+        track.video_id, track.language, track.language_code, track.is_generated, snippets
+    )